@@ -0,0 +1,163 @@
+import hashlib
+import os
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from fastapi import Request, Response
+
+from app.api.resources.status import Status
+
+# How long clients may reuse a response for a model that has failed or completed without revalidating it
+TERMINAL_MAX_AGE = int(os.getenv('TERMINAL_MAX_AGE', 3600))
+
+
+@dataclass(slots=True)
+class CachedResponse:
+    etag: str
+    body: bytes
+    media_type: str
+    # The Content-Encoding of the body (None if it isn't compressed), and the request headers it depends on
+    encoding: str | None = None
+    vary: str | None = None
+
+
+@dataclass
+class ResponseCache:
+    """An LRU cache of the encoded responses for models that have failed or completed.
+
+    Such models never change again, so their responses can be reused until the model is deleted. The cache holds at
+    most ``max_models`` models, and evicts the least recently used models once their responses exceed ``max_bytes``.
+    """
+    max_models: int = 1024
+    max_bytes: int = 64 * 2 ** 20
+    # Every response for a model (e.g. the model itself, and pages of its results) is cached under the model's ID
+    _models: OrderedDict[str, dict[str, CachedResponse]] = field(default_factory=OrderedDict, init=False)
+    _bytes: int = field(default=0, init=False)
+
+    @classmethod
+    def from_env(cls) -> 'ResponseCache':
+        """Configure a cache using the RESPONSE_CACHE_MODELS and RESPONSE_CACHE_BYTES environment variables."""
+        return cls(max_models=int(os.getenv('RESPONSE_CACHE_MODELS', 1024)),
+                   max_bytes=int(os.getenv('RESPONSE_CACHE_BYTES', 64 * 2 ** 20)))
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def get(self, model_id: str, variant: str) -> CachedResponse | None:
+        if (responses := self._models.get(model_id)) is None or (response := responses.get(variant)) is None:
+            return None
+        self._models.move_to_end(model_id)
+        return response
+
+    def put(self, model_id: str, variant: str, response: CachedResponse) -> None:
+        if len(response.body) > self.max_bytes:
+            return
+        responses = self._models.setdefault(model_id, {})
+        self._models.move_to_end(model_id)
+        if (previous := responses.get(variant)) is not None:
+            self._bytes -= len(previous.body)
+        responses[variant] = response
+        self._bytes += len(response.body)
+        while len(self._models) > self.max_models or self._bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self) -> None:
+        _, responses = self._models.popitem(last=False)
+        self._bytes -= sum(len(response.body) for response in responses.values())
+
+    def invalidate(self, model_id: str) -> None:
+        """Drop every cached response for a model, e.g. once it has been deleted."""
+        if (responses := self._models.pop(model_id, None)) is not None:
+            self._bytes -= sum(len(response.body) for response in responses.values())
+
+    def clear(self) -> None:
+        self._models.clear()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+
+def make_etag(version: int, variant: str) -> str:
+    """Builds a strong ETag for a representation of a model's results.
+
+    The version of a model's entry changes whenever the model or its results change, and the variant distinguishes
+    between different representations of the same resource (e.g. different pages of results).
+    """
+    return f'"{version:x}-{zlib.crc32(variant.encode()):08x}"'
+
+
+def content_etag(body: bytes, variant: str) -> str:
+    """Builds a strong ETag for a representation of a model from its content.
+
+    A model's entry also changes when its results are stored, which doesn't change the model's representation, so the
+    model's ETag is built from the body rather than from the version of its entry.
+    """
+    return f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}-{zlib.crc32(variant.encode()):08x}"'
+
+
+def request_variant(request: Request, media_type: str, include_query: bool = True, encoding: str | None = None) -> str:
+    """Identifies the representation requested, so that each page, format and encoding of a resource is cached
+    separately.
+
+    Query parameters which don't change the representation (e.g. how long to wait) should not be included.
+    """
+    variant = f'{request.url.path}?{request.url.query}|{media_type}' if include_query else \
+        f'{request.url.path}|{media_type}'
+    return variant if encoding is None else f'{variant}|{encoding}'
+
+
+def cache_headers(status: Status, etag: str) -> dict[str, str]:
+    # Models which can still change must be revalidated on every use, but terminal ones can be reused for a while
+    if status.is_terminal:
+        return terminal_cache_headers(etag)
+    return {
+        'ETag': etag,
+        'Cache-Control': 'no-cache'
+    }
+
+
+def terminal_cache_headers(etag: str) -> dict[str, str]:
+    return {
+        'ETag': etag,
+        'Cache-Control': f'max-age={TERMINAL_MAX_AGE}'
+    }
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match header matches the current ETag."""
+    if (header := request.headers.get('If-None-Match')) is None:
+        return False
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    tags = {tag.strip().removeprefix('W/') for tag in header.split(',')}
+    return '*' in tags or etag in tags
+
+
+def not_modified_response(headers: dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
+
+
+def cached_response(request: Request, cached: CachedResponse) -> Response:
+    """Sends a cached response for a terminal model, or a 304 if the client already has it."""
+    headers = terminal_cache_headers(cached.etag)
+    if cached.vary is not None:
+        headers['Vary'] = cached.vary
+    if is_not_modified(request, cached.etag):
+        return not_modified_response(headers)
+    if cached.encoding is not None:
+        headers['Content-Encoding'] = cached.encoding
+    return Response(content=cached.body, media_type=cached.media_type, headers=headers)
+
+
+async def serve_cached(request: Request, model_id: str, variant: str) -> Response | None:
+    """Returns the cached response for a terminal model if there is one, otherwise None."""
+    response_cache: ResponseCache = request.app.state.response_cache
+    if (cached := response_cache.get(model_id, variant)) is None:
+        return None
+    # The model may have been deleted by another worker, which can't invalidate this worker's cache
+    if not await request.app.state.model_store.aio.contains(model_id):
+        response_cache.invalidate(model_id)
+        return None
+    return cached_response(request, cached)
@@ -0,0 +1,96 @@
+import importlib.util
+import os
+import zlib
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from typing import Any
+
+from app.api.negotiation import parse_accept
+
+# Every encoding the API can compress with, in order of preference. Brotli is only used if it is installed.
+ENCODINGS = ('br', 'gzip')
+# zlib writes the gzip format with this window size
+_GZIP_WBITS = 31
+
+
+def _available(encoding: str) -> bool:
+    return encoding != 'br' or importlib.util.find_spec('brotli') is not None
+
+
+class _BrotliStream:
+    """Gives a brotli compressor the same interface as a zlib one."""
+
+    def __init__(self, quality: int) -> None:
+        import brotli
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+
+@dataclass(frozen=True)
+class CompressionPolicy:
+    """Which encodings response bodies may be compressed with, in order of preference, and the smallest body worth
+    compressing. Smaller bodies are sent as they are, as compressing them saves less than it costs."""
+    encodings: tuple[str, ...] = tuple(encoding for encoding in ENCODINGS if _available(encoding))
+    min_size: int = 1024
+    gzip_level: int = 6
+    brotli_quality: int = 5
+
+    @classmethod
+    def from_env(cls) -> 'CompressionPolicy':
+        """Configure compression using the RESPONSE_COMPRESSION (a comma separated list of encodings in order of
+        preference, or off), COMPRESSION_MIN_BYTES, GZIP_LEVEL and BROTLI_QUALITY environment variables."""
+        if (names := os.getenv('RESPONSE_COMPRESSION')) is None:
+            encodings = cls.encodings
+        elif names.strip().lower() in ('', '0', 'off', 'none'):
+            encodings = ()
+        else:
+            encodings = tuple(name.strip().lower() for name in names.split(','))
+            if unknown := [name for name in encodings if name not in ENCODINGS]:
+                raise ValueError(f'Unknown response compression {", ".join(unknown)}, expected some of '
+                                 f'{", ".join(ENCODINGS)}')
+            # Brotli may be asked for everywhere, and used wherever it is installed
+            encodings = tuple(name for name in encodings if _available(name))
+        return cls(encodings=encodings,
+                   min_size=int(os.getenv('COMPRESSION_MIN_BYTES', cls.min_size)),
+                   gzip_level=int(os.getenv('GZIP_LEVEL', cls.gzip_level)),
+                   brotli_quality=int(os.getenv('BROTLI_QUALITY', cls.brotli_quality)))
+
+    def negotiate(self, accept_encoding: str | None) -> str | None:
+        """The encoding to use for a request with the given Accept-Encoding header, or None to use no encoding.
+
+        The encoding with the highest quality is used, and when the client has no preference between them the
+        encoding that comes first in ``encodings`` is used.
+        """
+        accepted = parse_accept(accept_encoding)
+        wildcard = accepted.get('*', 0.0)
+        chosen, best = None, 0.0
+        for encoding in self.encodings:
+            if (quality := accepted.get(encoding, wildcard)) > best:
+                chosen, best = encoding, quality
+        return chosen
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == 'br':
+            import brotli
+            return brotli.compress(body, quality=self.brotli_quality)
+        compressor = zlib.compressobj(self.gzip_level, wbits=_GZIP_WBITS)
+        return compressor.compress(body) + compressor.flush()
+
+    def compressor(self, encoding: str) -> Any:
+        """A compressor for a stream, with ``compress`` and ``flush`` methods like those of zlib's compressors."""
+        if encoding == 'br':
+            return _BrotliStream(self.brotli_quality)
+        return zlib.compressobj(self.gzip_level, wbits=_GZIP_WBITS)
+
+    async def compress_stream(self, chunks: AsyncIterator[bytes], encoding: str) -> AsyncIterator[bytes]:
+        """Compresses a streamed body, sending the compressed data as the compressor produces it."""
+        compressor = self.compressor(encoding)
+        async for chunk in chunks:
+            if data := compressor.compress(chunk):
+                yield data
+        yield compressor.flush()
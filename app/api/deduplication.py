@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from app.api.resources.model_config import ModelConfig
+from app.store.backends import StoreBackend
+
+
+def _hash(value: str) -> str:
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+def config_fingerprint(config: ModelConfig) -> str:
+    """A hash of a model config, which is the same for every equivalent config.
+
+    The API key is replaced by its own hash, so that only clients using the same key share models, without the key
+    itself being kept.
+    """
+    data = config.model_dump(mode='json')
+    data['data_api_key'] = _hash(data['data_api_key'])
+    return _hash(json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False))
+
+
+class IdempotencyKeyReused(Exception):
+    """Raised when an idempotency key is used again with a different config."""
+
+
+@dataclass(slots=True, eq=False)
+class Claim:
+    """A model being created, or recently created, for a fingerprint."""
+    model_id: str
+    fingerprint: str
+    # Set once the request which created the model has either stored and queued it, or given up on it
+    settled: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+@dataclass
+class ModelRequests:
+    """Remembers which model was created for each config fingerprint and idempotency key.
+
+    A request with the same config as one made in the last ``window`` seconds is given the model created by that
+    request rather than a new one, and a request with an idempotency key that was used in the last ``key_ttl`` seconds
+    gets the model created by the first request with that key. Each map holds at most ``max_entries`` entries.
+    Creating a model happens entirely on the event loop, so claiming a fingerprint needs no locking.
+
+    When the store's backend is shared between workers, idempotency keys are claimed in the backend instead, so that a
+    retry which reaches another worker still gets the model created by the first request.
+    """
+    window: float = 300.0
+    key_ttl: float = 86400.0
+    max_entries: int = 100_000
+    # Claims by fingerprint and by idempotency key, each with when it expires, in order of expiry
+    _fingerprints: OrderedDict[str, tuple[float, Claim]] = field(default_factory=OrderedDict, init=False)
+    _keys: OrderedDict[str, tuple[float, Claim]] = field(default_factory=OrderedDict, init=False)
+
+    @classmethod
+    def from_env(cls) -> 'ModelRequests':
+        """Configure using the MODEL_DEDUP_WINDOW (0 turns off deduplication of identical configs),
+        IDEMPOTENCY_KEY_TTL and MODEL_DEDUP_ENTRIES environment variables."""
+        return cls(window=float(os.getenv('MODEL_DEDUP_WINDOW', 300)),
+                   key_ttl=float(os.getenv('IDEMPOTENCY_KEY_TTL', 86400)),
+                   max_entries=int(os.getenv('MODEL_DEDUP_ENTRIES', 100_000)))
+
+    @staticmethod
+    def _get(claims: OrderedDict[str, tuple[float, Claim]], key: str, now: float) -> Claim | None:
+        # Every claim in a map lives as long as the others, so the oldest claims are the first to expire
+        while claims and next(iter(claims.values()))[0] <= now:
+            claims.popitem(last=False)
+        return None if (entry := claims.get(key)) is None else entry[1]
+
+    def _put(self, claims: OrderedDict[str, tuple[float, Claim]], key: str, claim: Claim, expires: float) -> None:
+        claims.pop(key, None)
+        claims[key] = (expires, claim)
+        while len(claims) > self.max_entries:
+            claims.popitem(last=False)
+
+    def claim(self, fingerprint: str, model_id: str, idempotency_key: str | None = None) -> tuple[Claim, bool]:
+        """Returns the claim of an existing model for the fingerprint or idempotency key, or else claims them for
+        ``model_id``. The boolean is True if the claim is new, and the caller must create the model and then settle it.
+
+        Raises IdempotencyKeyReused if the idempotency key was used with a different fingerprint.
+        """
+        now = time.monotonic()
+        if idempotency_key is not None and (claim := self._get(self._keys, idempotency_key, now)) is not None:
+            if claim.fingerprint != fingerprint:
+                raise IdempotencyKeyReused()
+            return claim, False
+        if self.window > 0 and (claim := self._get(self._fingerprints, fingerprint, now)) is not None:
+            is_new = False
+        else:
+            claim, is_new = Claim(model_id, fingerprint), True
+            if self.window > 0:
+                self._put(self._fingerprints, fingerprint, claim, now + self.window)
+        if idempotency_key is not None:
+            self._put(self._keys, idempotency_key, claim, now + self.key_ttl)
+        return claim, is_new
+
+    def release(self, claim: Claim) -> None:
+        """Forget a claim whose model could not be created, or no longer exists."""
+        if (entry := self._fingerprints.get(claim.fingerprint)) is not None and entry[1] is claim:
+            del self._fingerprints[claim.fingerprint]
+        # Claims are rarely released, so it's cheaper to search the keys than to index them by claim
+        for key in [key for key, (_, other) in self._keys.items() if other is claim]:
+            del self._keys[key]
+
+    async def claim_shared_key(self, backend: StoreBackend, key: str, fingerprint: str,
+                               model_id: str) -> tuple[str, str]:
+        """Claims an idempotency key in a shared backend, returning the fingerprint and model ID of the claim which
+        holds it."""
+        if backend.blocking:
+            return await asyncio.to_thread(backend.claim_key, key, fingerprint, model_id, self.key_ttl)
+        return backend.claim_key(key, fingerprint, model_id, self.key_ttl)
+
+    async def release_shared_key(self, backend: StoreBackend, key: str, model_id: str) -> None:
+        if backend.blocking:
+            await asyncio.to_thread(backend.release_key, key, model_id)
+        else:
+            backend.release_key(key, model_id)
+
+    def clear(self) -> None:
+        self._fingerprints.clear()
+        self._keys.clear()
+
+    def __len__(self) -> int:
+        return len(self._fingerprints)
+
+
+def scoped_key(config: ModelConfig, idempotency_key: str | None) -> str | None:
+    """Idempotency keys are chosen by clients, so they are scoped to the API key to keep clients apart."""
+    return None if idempotency_key is None else f'{_hash(config.data_api_key)}:{idempotency_key}'
@@ -0,0 +1,27 @@
+from app.api.errors.error_response import Error, error_response
+from app.api.errors.errors import (BatchItemError, ClusterNotFound, DataSourceUnreachable, IdempotencyKeyMismatch,
+                                   InvalidBatchSize, InvalidCursor, InvalidModelConfig, InvalidModelId, InvalidWait,
+                                   ModelNotFound, ModelNotRefreshable, RateLimited, ResultsNotAvailable, ServerBusy,
+                                   TrainingFailed, TrainingQueueFull, TrainingUnavailable)
+
+__all__ = [
+    'BatchItemError',
+    'ClusterNotFound',
+    'DataSourceUnreachable',
+    'Error',
+    'IdempotencyKeyMismatch',
+    'InvalidBatchSize',
+    'InvalidCursor',
+    'InvalidModelConfig',
+    'InvalidModelId',
+    'InvalidWait',
+    'ModelNotFound',
+    'ModelNotRefreshable',
+    'RateLimited',
+    'ResultsNotAvailable',
+    'ServerBusy',
+    'TrainingFailed',
+    'TrainingQueueFull',
+    'TrainingUnavailable',
+    'error_response'
+]
@@ -1,5 +1,7 @@
 from abc import ABC
 
+from fastapi.responses import Response
+
 
 class Error(ABC):
     code: str
@@ -13,3 +15,8 @@ class Error(ABC):
         }
 
 
+def error_response(*errors: Error, headers: dict[str, str] | None = None) -> Response:
+    """Builds an Error response from one or more errors. The status code is taken from the first error."""
+    from app.api.serializers import json_response
+    return json_response({'errors': [error.json() for error in errors]}, headers=headers,
+                         status_code=errors[0].status_code)
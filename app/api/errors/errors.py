@@ -0,0 +1,143 @@
+from app.api.errors.error_response import Error
+
+
+class ModelNotFound(Error):
+    code = 'model_not_found'
+    status_code = 404
+
+    def __init__(self, model_id: str) -> None:
+        self.message = f'No model with the ID {model_id} exists. Check the ID is correct and that it was not deleted.'
+
+
+class ResultsNotAvailable(Error):
+    code = 'results_not_available'
+    status_code = 400
+
+    def __init__(self, model_id: str, status: str) -> None:
+        self.message = (f'The model {model_id} is {status}. Results are only available once a model has completed, '
+                        f'check the status of the model and try again later.')
+
+
+class ModelNotRefreshable(Error):
+    code = 'model_not_refreshable'
+    status_code = 400
+
+    def __init__(self, model_id: str, reason: str) -> None:
+        self.message = f'The model {model_id} cannot be refreshed, {reason}. Create a new model instead.'
+
+
+class DataSourceUnreachable(Error):
+    code = 'data_source_unreachable'
+    status_code = 400
+
+    def __init__(self, data_source: str) -> None:
+        self.message = f'The data source {data_source} could not be reached. Check the URL and try again.'
+
+
+class TrainingQueueFull(Error):
+    code = 'training_queue_full'
+    status_code = 429
+
+    def __init__(self) -> None:
+        self.message = 'Too many models are waiting to be trained. Wait for some models to complete and try again.'
+
+
+class RateLimited(Error):
+    code = 'rate_limited'
+    status_code = 429
+
+    def __init__(self, kind: str, retry_after: int) -> None:
+        self.message = (f'Too many {kind} requests have been made from this address. Wait {retry_after} seconds '
+                        f'before trying again.')
+
+
+class ServerBusy(Error):
+    code = 'server_busy'
+    status_code = 429
+
+    def __init__(self) -> None:
+        self.message = 'The service is handling too many requests at once. Wait a moment and try again.'
+
+
+class TrainingUnavailable(Error):
+    code = 'training_unavailable'
+    status_code = 503
+
+    def __init__(self) -> None:
+        self.message = 'The service is shutting down and is not accepting new models. Try again shortly.'
+
+
+class TrainingFailed(Error):
+    code = 'training_failed'
+    status_code = 500
+
+    def __init__(self, reason: str) -> None:
+        self.message = f'The model could not be built: {reason}'
+
+
+class ClusterNotFound(Error):
+    code = 'cluster_not_found'
+    status_code = 404
+
+    def __init__(self, model_id: str, cluster: int) -> None:
+        self.message = f'The model {model_id} has no cluster labelled {cluster}. Check the label and try again.'
+
+
+class InvalidCursor(Error):
+    code = 'invalid_cursor'
+    status_code = 400
+
+    def __init__(self) -> None:
+        self.message = ('The cursor is not valid. Only pass back a cursor returned by a previous request, or omit '
+                        'it to start from the first page.')
+
+
+class InvalidWait(Error):
+    code = 'invalid_wait'
+    status_code = 400
+
+    def __init__(self, maximum: float) -> None:
+        self.message = (f'The wait must be a duration of at most {maximum:g} seconds, such as 30s or 500ms. Omit it to '
+                        f'get the current state of the model immediately.')
+
+
+class InvalidBatchSize(Error):
+    code = 'invalid_batch_size'
+    status_code = 400
+
+    def __init__(self, maximum: int) -> None:
+        self.message = f'A batch must contain between 1 and {maximum} models. Split larger batches and try again.'
+
+
+class InvalidModelConfig(Error):
+    code = 'invalid_model_config'
+    status_code = 400
+
+    def __init__(self, reason: str) -> None:
+        self.message = f'The model config is not valid: {reason}'
+
+
+class IdempotencyKeyMismatch(Error):
+    code = 'idempotency_key_mismatch'
+    status_code = 422
+
+    def __init__(self) -> None:
+        self.message = ('The Idempotency-Key was already used with a different config. Use a new key for each new '
+                        'model, and the same key only when retrying a request.')
+
+
+class InvalidModelId(Error):
+    code = 'invalid_model_id'
+    status_code = 400
+
+    def __init__(self, model_id: str) -> None:
+        self.message = f'{model_id!r} is not a valid model ID. Model IDs are UUIDs, check the ID and try again.'
+
+
+class BatchItemError(Error):
+    """The error for a single item of a batch request, which says which item it is for."""
+
+    def __init__(self, index: int, error: Error) -> None:
+        self.code = error.code
+        self.status_code = error.status_code
+        self.message = f'Item {index}: {error.message}'
@@ -0,0 +1,83 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.metrics import REQUEST_DURATION, REQUESTS, REQUESTS_IN_FLIGHT, RESPONSE_SIZE, CounterSeries, HistogramSeries
+
+# Clients can send any method, so other methods share a label rather than each adding their own series
+_METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'CONNECT', 'TRACE'})
+
+
+class _RouteSeries:
+    """The series for one route, looked up once so that recording a request doesn't need to find them again."""
+    __slots__ = ('method', 'route', 'duration', 'size', 'statuses')
+
+    def __init__(self, method: str, route: str) -> None:
+        self.method, self.route = method, route
+        self.duration: HistogramSeries = REQUEST_DURATION.labels(method, route)
+        self.size: HistogramSeries = RESPONSE_SIZE.labels(method, route)
+        self.statuses: dict[int, CounterSeries] = {}
+
+    def record(self, status: int, duration: float, size: int) -> None:
+        self.duration.observe(duration)
+        self.size.observe(size)
+        if (requests := self.statuses.get(status)) is None:
+            requests = self.statuses[status] = REQUESTS.labels(self.method, self.route, str(status))
+        requests.inc()
+
+
+class _ResponseTracker:
+    """Wraps send to note the status code and the size of the response body."""
+    __slots__ = ('send', 'status', 'size')
+
+    def __init__(self, send: Send) -> None:
+        self.send = send
+        # If the app fails before it starts a response, the server responds with a 500
+        self.status = 500
+        self.size = 0
+
+    async def __call__(self, message: Message) -> None:
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+        elif message['type'] == 'http.response.body':
+            self.size += len(message.get('body', b''))
+        await self.send(message)
+
+
+class MetricsMiddleware:
+    """Records the latency, status code and response size of every HTTP request, labelled by the matched route.
+
+    This is a plain ASGI middleware rather than a BaseHTTPMiddleware, so it doesn't add a task per request and streamed
+    responses are timed until their last chunk is sent. Routes are labelled with their path template (e.g.
+    /models/{model_id}) rather than the requested path, so there is one set of series per route, and methods other than
+    the standard ones are labelled as other.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        # Keyed on the method and then on the path template of the matched route
+        self._routes: dict[str, dict[str, _RouteSeries]] = {}
+        self._in_flight = REQUESTS_IN_FLIGHT.labels()
+
+    def _series(self, scope: Scope) -> _RouteSeries:
+        method = scope['method'] if scope['method'] in _METHODS else 'other'
+        route = 'unmatched' if (matched := scope.get('route')) is None else matched.path
+        if (routes := self._routes.get(method)) is None:
+            routes = self._routes[method] = {}
+        if (series := routes.get(route)) is None:
+            series = routes[route] = _RouteSeries(method, route)
+        return series
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        tracker = _ResponseTracker(send)
+        self._in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, tracker)
+        finally:
+            # The router adds the matched route to the scope
+            self._series(scope).record(tracker.status, time.perf_counter() - start, tracker.size)
+            self._in_flight.dec()
@@ -0,0 +1,23 @@
+def parse_accept(header: str | None) -> dict[str, float]:
+    """Parses an Accept style header into a mapping of each value to its quality."""
+    accepted: dict[str, float] = {}
+    for part in (header or '').split(','):
+        value, *params = (piece.strip() for piece in part.split(';'))
+        if not value:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, raw_quality = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(raw_quality)
+                except ValueError:
+                    quality = 0.0
+        accepted[value.lower()] = quality
+    return accepted
+
+
+def accepts(header: str | None, media_type: str) -> bool:
+    """Whether the client explicitly asked for ``media_type``. Wildcards don't count, so this is only used to opt in
+    to alternative representations."""
+    return parse_accept(header).get(media_type, 0.0) > 0
@@ -0,0 +1,15 @@
+import uuid
+
+from fastapi import Request, Response
+
+from app.api.errors import ModelNotFound, error_response
+
+
+async def delete_model(model_id: uuid.UUID, request: Request) -> Response:
+    model_id = str(model_id)
+    request.app.state.response_cache.invalidate(model_id)
+    try:
+        await request.app.state.model_store.aio.delete(model_id)
+    except KeyError:
+        return error_response(ModelNotFound(model_id))
+    return Response(status_code=204)
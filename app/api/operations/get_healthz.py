@@ -0,0 +1,5 @@
+from fastapi import Response
+
+
+async def healthz() -> Response:
+    return Response(status_code=204)
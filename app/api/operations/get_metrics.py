@@ -0,0 +1,36 @@
+from fastapi import Request, Response
+
+from app.metrics import CONTENT_TYPE, Counter, Gauge, Metric, registry, render
+
+
+async def _state_metrics(request: Request) -> list[Metric]:
+    """Metrics describing the current state of the app, which are read when they are requested."""
+    model_store = request.app.state.model_store
+    models = Gauge('model_store_models', 'Models in the store.', labels=('status',))
+    for status, count in (await model_store.aio.status_counts()).items():
+        models.labels(status.value).set(count)
+    metrics: list[Metric] = [models]
+    for name, value in (await model_store.aio.backend_metrics()).items():
+        if name == 'models':
+            continue
+        # Backends report running totals as names ending in _total
+        kind = Counter if name.endswith('_total') else Gauge
+        metric = kind(f'model_store_{name}', 'Reported by the model store backend.')
+        metric.labels().inc(value)
+        metrics.append(metric)
+
+    response_cache = request.app.state.response_cache
+    cached_models = Gauge('response_cache_models', 'Models with cached responses.')
+    cached_models.labels().set(len(response_cache))
+    cached_bytes = Gauge('response_cache_bytes', 'Size of the cached responses.')
+    cached_bytes.labels().set(response_cache.nbytes)
+    metrics += [cached_models, cached_bytes]
+    if (scheduler := request.app.state.scheduler) is not None:
+        training = Gauge('training_in_flight', 'Models queued or being trained.')
+        training.labels().set(scheduler.in_flight)
+        metrics.append(training)
+    return metrics
+
+
+async def get_metrics(request: Request) -> Response:
+    return Response(content=render([*registry, *await _state_metrics(request)]), media_type=CONTENT_TYPE)
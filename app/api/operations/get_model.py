@@ -0,0 +1,53 @@
+import asyncio
+import uuid
+
+from fastapi import Query, Request, Response
+
+from app.api.caching import (CachedResponse, cache_headers, content_etag, is_not_modified, not_modified_response,
+                             request_variant, serve_cached)
+from app.api.errors import InvalidWait, ModelNotFound, error_response
+from app.api.serializers import JSONBytesResponse, encode_model
+from app.api.resources import Model
+from app.api.waiting import MAX_WAIT, parse_wait
+
+
+def _should_wait(request: Request, model: Model, variant: str) -> bool:
+    # With an ETag, wait until the client's copy is out of date, otherwise wait until the model can't change any more
+    if 'If-None-Match' in request.headers:
+        return is_not_modified(request, content_etag(encode_model(model), variant))
+    return not model.status.is_terminal
+
+
+async def get_model(model_id: uuid.UUID, request: Request,
+                    wait: str | None = Query(None, description='Hold the request until the model changes from the '
+                                                               'version in If-None-Match, or until it has failed or '
+                                                               'completed, for at most this long (e.g. 30s)')
+                    ) -> Response:
+    model_id = str(model_id)
+    try:
+        timeout = 0.0 if wait is None else parse_wait(wait)
+    except ValueError:
+        return error_response(InvalidWait(MAX_WAIT))
+    variant = request_variant(request, JSONBytesResponse.media_type, include_query=False)
+    # Cached models have failed or completed, so there is never any point in waiting for them to change
+    if (response := await serve_cached(request, model_id, variant)) is not None:
+        return response
+    model_store = request.app.state.model_store
+    try:
+        (model, _), version = await model_store.aio.versioned(model_id)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while _should_wait(request, model, variant) and (remaining := deadline - loop.time()) > 0:
+            (model, _), version = await model_store.aio.wait_for_change(model_id, version, remaining)
+    except KeyError:
+        return error_response(ModelNotFound(model_id))
+    body = encode_model(model)
+    etag = content_etag(body, variant)
+    headers = cache_headers(model.status, etag)
+    if is_not_modified(request, etag):
+        return not_modified_response(headers)
+    # Failed and completed models never change, so their response can be reused until they are deleted
+    if model.status.is_terminal:
+        request.app.state.response_cache.put(model_id, variant,
+                                             CachedResponse(etag, body, JSONBytesResponse.media_type))
+    return JSONBytesResponse(content=body, headers=headers, status_code=200)
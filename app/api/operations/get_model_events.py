@@ -0,0 +1,55 @@
+import uuid
+from collections.abc import AsyncIterator
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+from app.api.errors import ModelNotFound, error_response
+from app.api.resources import Model
+from app.api.serializers import encode_model
+from app.store import ModelStore
+
+# How often to send a comment on an idle stream, so that proxies don't close the connection
+HEARTBEAT_INTERVAL = 15.0
+
+
+def _event(event: str, data: bytes, event_id: int | None = None) -> bytes:
+    message = f'event: {event}\n'.encode() + b'data: ' + data + b'\n'
+    if event_id is not None:
+        message += f'id: {event_id}\n'.encode()
+    return message + b'\n'
+
+
+async def _events(model_store: ModelStore, model_id: str, model: Model, version: int,
+                  last_event_id: str | None) -> AsyncIterator[bytes]:
+    # A reconnecting client which has already seen the current version doesn't need it again
+    if last_event_id != str(version):
+        yield _event('status', encode_model(model), version)
+    while not model.status.is_terminal:
+        try:
+            (model, _), latest_version = await model_store.aio.wait_for_change(model_id, version, HEARTBEAT_INTERVAL)
+        except KeyError:
+            yield _event('deleted', b'{"id":"' + model_id.encode() + b'"}')
+            return
+        if latest_version == version:
+            yield b': keep-alive\n\n'
+            continue
+        version = latest_version
+        yield _event('status', encode_model(model), version)
+
+
+async def get_model_events(model_id: uuid.UUID, request: Request) -> Response:
+    """Streams the status of a model as server-sent events until the model fails, completes or is deleted."""
+    model_id = str(model_id)
+    model_store = request.app.state.model_store
+    try:
+        (model, _), version = await model_store.aio.versioned(model_id)
+    except KeyError:
+        return error_response(ModelNotFound(model_id))
+    headers = {
+        'Cache-Control': 'no-cache',
+        # Stop reverse proxies from buffering the events
+        'X-Accel-Buffering': 'no'
+    }
+    return StreamingResponse(_events(model_store, model_id, model, version, request.headers.get('Last-Event-ID')),
+                             media_type='text/event-stream', headers=headers)
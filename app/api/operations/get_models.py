@@ -0,0 +1,80 @@
+import uuid
+from datetime import datetime
+from typing import Any
+
+from fastapi import Query, Request, Response
+
+from app.api.errors import (BatchItemError, Error, InvalidBatchSize, InvalidCursor, InvalidModelId, ModelNotFound,
+                            error_response)
+from app.api.operations.post_models_batch import MAX_BATCH_SIZE
+from app.api.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor
+from app.api.resources import Status
+from app.api.serializers import json_response
+from app.store.backends.base import ListingKey, listing_key
+
+
+def _parse_ids(values: list[str]) -> tuple[list[str], list[Error]]:
+    # IDs may be given as repeated parameters, as a comma separated list, or both
+    ids, errors = [], []
+    for index, value in enumerate(part.strip() for value in values for part in value.split(',') if part.strip()):
+        try:
+            ids.append(str(uuid.UUID(value)))
+        except ValueError:
+            errors.append(BatchItemError(index, InvalidModelId(value)))
+    return list(dict.fromkeys(ids)), errors
+
+
+def _decode_listing_cursor(cursor: str | None) -> ListingKey | None:
+    if cursor is None:
+        return None
+    created_at, model_id = decode_cursor(cursor, parts=2)
+    return int(created_at), str(uuid.UUID(model_id))
+
+
+async def _get_many(request: Request, ids: list[str], status: list[Status] | None) -> Response:
+    model_ids, errors = _parse_ids(ids)
+    if errors:
+        return error_response(*errors)
+    if len(model_ids) > MAX_BATCH_SIZE:
+        return error_response(InvalidBatchSize(MAX_BATCH_SIZE))
+    entries = await request.app.state.model_store.aio.get_many(model_ids)
+    models, missing = [], []
+    for model_id in model_ids:
+        if (entry := entries.get(model_id)) is None:
+            missing.append(ModelNotFound(model_id))
+        elif not status or entry[0].status in status:
+            models.append(entry[0].json())
+    body: dict[str, Any] = {'models': models}
+    if missing:
+        body['errors'] = [error.json() for error in missing]
+    return json_response(body)
+
+
+async def get_models(request: Request,
+                     ids: list[str] = Query([], description='The IDs of the models to return, repeated or comma '
+                                                            'separated'),
+                     status: list[Status] | None = Query(None, description='Only return models with these statuses'),
+                     created_after: datetime | None = Query(None, description='Only list models created after this '
+                                                                              'time'),
+                     limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE,
+                                        description='The number of models to list'),
+                     cursor: str | None = Query(None, description='The next_cursor returned by the previous page')
+                     ) -> Response:
+    """Returns the given models, or when no IDs are given lists every model from oldest to newest.
+
+    Given IDs are fetched with a single lookup in the store, and IDs that don't exist are reported in the errors of a
+    successful response rather than failing the whole request. Listings use the store's indexes, so each page costs
+    the same however many models are stored.
+    """
+    if ids:
+        return await _get_many(request, ids, status)
+    try:
+        after = _decode_listing_cursor(cursor)
+    except ValueError:
+        return error_response(InvalidCursor())
+    # Fetch one extra model to find out whether there is another page
+    models = await request.app.state.model_store.aio.list_models(status, created_after, after, limit + 1)
+    body: dict[str, Any] = {'models': [model.json() for model in models[:limit]]}
+    if len(models) > limit:
+        body['next_cursor'] = encode_cursor(*listing_key(models[limit - 1]))
+    return json_response(body)
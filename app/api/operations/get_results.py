@@ -0,0 +1,115 @@
+import time
+import uuid
+from collections.abc import AsyncIterator, Iterable
+from typing import Any
+
+from fastapi import Query, Request
+from fastapi.responses import Response, StreamingResponse
+
+from app.api.caching import (CachedResponse, is_not_modified, make_etag, not_modified_response, request_variant,
+                             serve_cached, terminal_cache_headers)
+from app.api.compression import CompressionPolicy
+from app.api.errors import ClusterNotFound, InvalidCursor, ModelNotFound, ResultsNotAvailable, error_response
+from app.api.negotiation import accepts
+from app.api.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_offset, encode_cursor
+from app.api.serializers import (ClusterRange, JSONBytesResponse, dumps, encode_cluster, encode_results,
+                                 results_summary)
+from app.metrics import RESULTS_STAGE_DURATION
+from app.store.result_set import ResultSet
+
+NDJSON = 'application/x-ndjson'
+
+_STORE_STAGE = RESULTS_STAGE_DURATION.labels('store')
+_SERIALIZE_STAGE = RESULTS_STAGE_DURATION.labels('serialize')
+_COMPRESS_STAGE = RESULTS_STAGE_DURATION.labels('compress')
+
+
+async def _stream(results: ResultSet, clusters: Iterable[ClusterRange],
+                  next_cursor: str | None) -> AsyncIterator[bytes]:
+    # The first line describes the whole result set, and is followed by one line per cluster
+    header: dict[str, Any] = results_summary(results)
+    if next_cursor is not None:
+        header['next_cursor'] = next_cursor
+    yield dumps(header) + b'\n'
+    for cluster in clusters:
+        yield encode_cluster(results, *cluster) + b'\n'
+
+
+async def get_results(model_id: uuid.UUID, request: Request,
+                      cluster: int | None = Query(None, description='Only return the cluster with this label'),
+                      limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE,
+                                                description='The number of clusters, or members of the cluster, to '
+                                                            'return'),
+                      cursor: str | None = Query(None, description='The next_cursor returned by the previous page')
+                      ) -> Response:
+    model_id = str(model_id)
+    media_type = NDJSON if accepts(request.headers.get('Accept'), NDJSON) else JSONBytesResponse.media_type
+    compression: CompressionPolicy = request.app.state.compression
+    encoding = compression.negotiate(request.headers.get('Accept-Encoding'))
+    # Each encoding is a separate representation with its own ETag, so compressed bodies are cached compressed and are
+    # only compressed once
+    variant = request_variant(request, media_type, encoding=encoding)
+    # Streamed responses are never cached, as the point of streaming is to not hold the whole response in memory
+    if media_type != NDJSON and (response := await serve_cached(request, model_id, variant)) is not None:
+        return response
+    start = time.perf_counter()
+    try:
+        model, results, version = await request.app.state.model_store.aio.completed_results(model_id)
+    except KeyError:
+        return error_response(ModelNotFound(model_id))
+    _STORE_STAGE.observe(time.perf_counter() - start)
+    if results is None:
+        return error_response(ResultsNotAvailable(model_id, model.status.value))
+    etag = make_etag(version, variant)
+    headers = terminal_cache_headers(etag)
+    vary = 'Accept-Encoding' if compression.encodings else None
+    if vary is not None:
+        headers['Vary'] = vary
+    if is_not_modified(request, etag):
+        return not_modified_response(headers)
+
+    # Without any paging parameters every cluster is returned in full
+    next_cursor = None
+    # Clusters are referred to by their index and a range of their members, so that they can be encoded straight from
+    # the result set without building a ResultItem for each one
+    clusters: Iterable[ClusterRange] | None = None
+    if cluster is not None or limit is not None or cursor is not None:
+        try:
+            offset = decode_offset(cursor)
+        except ValueError:
+            return error_response(InvalidCursor())
+        stop = offset + (limit or DEFAULT_PAGE_SIZE)
+        if cluster is None:
+            # Page through the clusters
+            clusters = [(idx, 0, None) for idx in range(offset, min(stop, len(results)))]
+            remaining = stop < len(results)
+        else:
+            # Page through the members of a single cluster
+            if (index := results.index_of(cluster)) is None:
+                return error_response(ClusterNotFound(model_id, cluster))
+            clusters = [(index, offset, stop)]
+            remaining = stop < results.member_count(index)
+        if remaining:
+            next_cursor = encode_cursor(stop)
+
+    if media_type == NDJSON:
+        # Clusters are only serialised as they are sent, so large results are never held in memory at once
+        ranges = ((idx, 0, None) for idx in range(len(results))) if clusters is None else clusters
+        stream = _stream(results, ranges, next_cursor)
+        if encoding is not None:
+            # The size of a stream isn't known up front, so streams are always compressed
+            stream = compression.compress_stream(stream, encoding)
+            headers['Content-Encoding'] = encoding
+        return StreamingResponse(stream, media_type=NDJSON, headers=headers)
+    start = time.perf_counter()
+    body = encode_results(results, clusters, next_cursor)
+    _SERIALIZE_STAGE.observe(time.perf_counter() - start)
+    if encoding is not None and len(body) < compression.min_size:
+        encoding = None
+    if encoding is not None:
+        start = time.perf_counter()
+        body = compression.compress(body, encoding)
+        _COMPRESS_STAGE.observe(time.perf_counter() - start)
+        headers['Content-Encoding'] = encoding
+    request.app.state.response_cache.put(model_id, variant, CachedResponse(etag, body, media_type, encoding, vary))
+    return JSONBytesResponse(content=body, headers=headers, status_code=200)
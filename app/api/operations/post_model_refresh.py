@@ -0,0 +1,37 @@
+import uuid
+
+from fastapi import Body, Request, Response
+
+from app.api.errors import ModelNotFound, ModelNotRefreshable, error_response
+from app.api.operations.post_models import check_data_source, submit_models
+from app.api.resources import Model, ModelConfig, Status
+from app.api.serializers import JSONBytesResponse, encode_model
+from app.training.checkpoint import TrainingCheckpoint
+
+
+async def refresh_model(model_id: uuid.UUID, request: Request, config: ModelConfig = Body(embed=True)) -> Response:
+    """Creates a new model which carries on from a completed model, only reading the traces that arrived since it was
+    built."""
+    model_id = str(model_id)
+    model_store = request.app.state.model_store
+    try:
+        (source, results), _ = await model_store.aio.versioned(model_id)
+    except KeyError:
+        return error_response(ModelNotFound(model_id))
+    if source.status != Status.COMPLETED:
+        return error_response(ModelNotRefreshable(model_id, f'it is {source.status.value} and only completed models '
+                                                            f'can be refreshed'))
+    if results is None or results.checkpoint is None:
+        return error_response(ModelNotRefreshable(model_id, 'it was not trained from a data source'))
+    if TrainingCheckpoint.metadata(results.checkpoint)['data_source'] != str(config.data_source):
+        return error_response(ModelNotRefreshable(model_id, 'it was trained from a different data source'))
+    if (error := check_data_source(config)) is not None:
+        return error_response(error)
+    model = Model.new_model()
+    await model_store.aio.put(model)
+    if (response := await submit_models(request, [(model, config)], base=results)) is not None:
+        return response
+    headers = {
+        'Location': str(request.url_for('get_model', model_id=str(model.id)))
+    }
+    return JSONBytesResponse(content=encode_model(model), headers=headers, status_code=201)
@@ -1,6 +1,130 @@
-from fastapi import Request
-from fastapi.responses import JSONResponse
+from fastapi import Body, Header, Request, Response
 
+from app.api.deduplication import Claim, IdempotencyKeyReused, ModelRequests, config_fingerprint, scoped_key
+from app.api.errors import (DataSourceUnreachable, Error, IdempotencyKeyMismatch, TrainingQueueFull,
+                            TrainingUnavailable, error_response)
+from app.api.resources import Model, ModelConfig, Status
+from app.api.serializers import JSONBytesResponse, encode_model
+from app.store.result_set import ResultSet
+from app.training import SchedulerClosed, SchedulerFull
 
-async def create_model(config, request: Request) -> JSONResponse:  # FIXME: This should implement POST /models
-    return JSONResponse(content=None, headers={}, status_code=201)
+
+def check_data_source(config: ModelConfig) -> Error | None:
+    if 'airbus.com' in (data_source := str(config.data_source)):
+        return DataSourceUnreachable(data_source)
+    return None
+
+
+async def submit_models(request: Request, models: list[tuple[Model, ModelConfig]],
+                        base: ResultSet | None = None) -> Response | None:
+    """Queues new models for training. If they can't all be queued the models are removed, and an error is returned.
+
+    With ``base``, the single model carries on from those results rather than being trained from scratch.
+    """
+    model_store = request.app.state.model_store
+    # Without a scheduler (e.g. when the app's lifespan has not run) models stay pending until updated by hand
+    if (scheduler := request.app.state.scheduler) is None:
+        return None
+    configs = [(str(model.id), config.model_dump(mode='json')) for model, config in models]
+    try:
+        if base is None:
+            scheduler.submit_many(model_store, configs)
+        else:
+            [(model_id, config)] = configs
+            scheduler.submit_refresh(model_store, model_id, config, base)
+    except (SchedulerFull, SchedulerClosed) as exc:
+        await model_store.aio.delete_many([str(model.id) for model, _ in models])
+        error = TrainingQueueFull() if isinstance(exc, SchedulerFull) else TrainingUnavailable()
+        return error_response(error, headers={'Retry-After': '1'})
+    return None
+
+
+async def _existing_model(request: Request, claim: Claim, requests: ModelRequests) -> Model | None:
+    """Returns the model created for a claim, or None if it is gone or has failed and a new model should be made."""
+    await claim.settled.wait()
+    entry = await request.app.state.model_store.aio.get(claim.model_id)
+    if entry is None or entry[0].status == Status.FAILED:
+        requests.release(claim)
+        return None
+    return entry[0]
+
+
+def _model_response(request: Request, model: Model, status_code: int) -> Response:
+    headers = {
+        'Location': str(request.url_for('get_model', model_id=str(model.id)))
+    }
+    return JSONBytesResponse(content=encode_model(model), headers=headers, status_code=status_code)
+
+
+async def _create_with_shared_key(request: Request, config: ModelConfig, fingerprint: str, key: str) -> Response:
+    """Creates a model for a request with an idempotency key, claiming the key in the store's shared backend so that a
+    retry which reaches another worker gets the same model.
+
+    The model is stored before the key is claimed, so that whoever finds the claim can also find its model.
+    """
+    model_store = request.app.state.model_store
+    requests: ModelRequests = request.app.state.model_requests
+    backend = model_store.backend
+    while True:
+        model = Model.new_model()
+        model_id = str(model.id)
+        await model_store.aio.put(model)
+        try:
+            claimed_fingerprint, claimed_id = await requests.claim_shared_key(backend, key, fingerprint, model_id)
+        except BaseException:
+            await model_store.aio.delete(model_id)
+            raise
+        if claimed_id == model_id:
+            break
+        await model_store.aio.delete(model_id)
+        if claimed_fingerprint != fingerprint:
+            return error_response(IdempotencyKeyMismatch())
+        entry = await model_store.aio.get(claimed_id)
+        if entry is not None and entry[0].status != Status.FAILED:
+            return _model_response(request, entry[0], 200)
+        # The model created for the key is gone or has failed, so the key is claimed again for a new model
+        await requests.release_shared_key(backend, key, claimed_id)
+    try:
+        if (response := await submit_models(request, [(model, config)])) is not None:
+            await requests.release_shared_key(backend, key, model_id)
+            return response
+    except BaseException:
+        await requests.release_shared_key(backend, key, model_id)
+        raise
+    return _model_response(request, model, 201)
+
+
+async def create_model(request: Request, config: ModelConfig = Body(embed=True),
+                       idempotency_key: str | None = Header(None, description='Retries with the same key and config '
+                                                                              'return the model created by the first '
+                                                                              'request')) -> Response:
+    """Creates a model, unless the same config was recently used to create a model that has not failed, or the
+    idempotency key was used before. The existing model is returned instead, with a 200 status."""
+    if (error := check_data_source(config)) is not None:
+        return error_response(error)
+    requests = request.app.state.model_requests
+    fingerprint = config_fingerprint(config)
+    if (key := scoped_key(config, idempotency_key)) is not None and request.app.state.model_store.backend.shared:
+        return await _create_with_shared_key(request, config, fingerprint, key)
+    while True:
+        model = Model.new_model()
+        try:
+            claim, is_new = requests.claim(fingerprint, str(model.id), key)
+        except IdempotencyKeyReused:
+            return error_response(IdempotencyKeyMismatch())
+        if is_new:
+            break
+        # Identical requests which arrive while the model is being created wait for it, rather than making their own
+        if (existing := await _existing_model(request, claim, requests)) is not None:
+            return _model_response(request, existing, 200)
+    try:
+        await request.app.state.model_store.aio.put(model)
+        if (response := await submit_models(request, [(model, config)])) is not None:
+            requests.release(claim)
+            return response
+    except BaseException:
+        requests.release(claim)
+        raise
+    finally:
+        claim.settled.set()
+    return _model_response(request, model, 201)
@@ -0,0 +1,44 @@
+from typing import Any
+
+from fastapi import Body, Request, Response
+from pydantic import ValidationError
+
+from app.api.errors import BatchItemError, Error, InvalidBatchSize, InvalidModelConfig, error_response
+from app.api.operations.post_models import check_data_source, submit_models
+from app.api.resources import Model, ModelConfig
+from app.api.serializers import json_response
+
+MAX_BATCH_SIZE = 500
+
+
+def _describe(exc: ValidationError) -> str:
+    return '; '.join(f'{".".join(map(str, error["loc"])) or "config"}: {error["msg"]}' for error in exc.errors())
+
+
+async def create_models(request: Request, configs: list[dict[str, Any]] = Body(embed=True)) -> Response:
+    """Creates a model for each config with a single write to the store.
+
+    Batches are all or nothing: if any config is invalid no models are created, and an error is returned for every
+    invalid config.
+    """
+    if not 0 < len(configs) <= MAX_BATCH_SIZE:
+        return error_response(InvalidBatchSize(MAX_BATCH_SIZE))
+    models: list[tuple[Model, ModelConfig]] = []
+    errors: list[Error] = []
+    for index, raw_config in enumerate(configs):
+        try:
+            config = ModelConfig.model_validate(raw_config)
+        except ValidationError as exc:
+            errors.append(BatchItemError(index, InvalidModelConfig(_describe(exc))))
+            continue
+        if (error := check_data_source(config)) is not None:
+            errors.append(BatchItemError(index, error))
+        else:
+            models.append((Model.new_model(), config))
+    if errors:
+        return error_response(*errors)
+
+    await request.app.state.model_store.aio.put_many([model for model, _ in models])
+    if (response := await submit_models(request, models)) is not None:
+        return response
+    return json_response({'models': [model.json() for model, _ in models]}, status_code=201)
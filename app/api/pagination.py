@@ -0,0 +1,30 @@
+import base64
+
+# The largest page of clusters or members that can be requested, and the page size used when none is given
+MAX_PAGE_SIZE = 1000
+DEFAULT_PAGE_SIZE = 100
+
+
+def encode_cursor(*parts: str | int) -> str:
+    """Builds an opaque cursor which clients pass back to fetch the next page."""
+    return base64.urlsafe_b64encode(':'.join(str(part) for part in parts).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, parts: int = 1) -> list[str]:
+    """Splits a cursor built by ``encode_cursor`` back into its parts, raising a ValueError if it is malformed."""
+    try:
+        decoded = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode().split(':', parts - 1)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError('Malformed cursor') from exc
+    if len(decoded) != parts:
+        raise ValueError('Malformed cursor')
+    return decoded
+
+
+def decode_offset(cursor: str | None) -> int:
+    """Decodes a cursor holding a single offset, treating a missing cursor as the start."""
+    if cursor is None:
+        return 0
+    if (offset := int(decode_cursor(cursor)[0])) < 0:
+        raise ValueError('Malformed cursor')
+    return offset
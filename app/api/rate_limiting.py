@@ -0,0 +1,223 @@
+import asyncio
+import math
+import os
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.api.errors import Error, RateLimited, ServerBusy, error_response
+from app.metrics import REQUESTS_THROTTLED, CounterSeries
+from app.store.backends import StoreBackend
+
+# Health checks and metric scrapes are never limited, so that the API can still be watched while it is busy
+_EXEMPT = frozenset({'/healthz', '/metrics'})
+
+
+def request_kind(method: str, path: str) -> str | None:
+    """The kind of request, which decides the budget it is counted against, or None if it has no budget."""
+    parts = path.strip('/').split('/')
+    if parts[0] not in ('models', 'models:batch'):
+        return None
+    if method == 'POST':
+        # POST /models, POST /models:batch and POST /models/{model_id}:refresh all queue models for training
+        return 'create' if len(parts) == 1 or parts[1].endswith(':refresh') else None
+    if method != 'GET':
+        return None
+    return 'results' if len(parts) == 3 and parts[2] == 'results' else 'poll'
+
+
+def is_watch(method: str, path: str, query_string: bytes) -> bool:
+    """Whether a request watches a model, either as a stream of events or as a long poll with ``wait``.
+
+    Watches spend most of their time idle, waiting for the model to change, so they aren't counted with the other
+    requests in flight.
+    """
+    if method != 'GET':
+        return False
+    parts = path.strip('/').split('/')
+    if len(parts) == 3:
+        return parts[0] == 'models' and parts[2] == 'events'
+    return len(parts) == 2 and parts[0] == 'models' and any(parameter.startswith(b'wait=')
+                                                            for parameter in query_string.split(b'&'))
+
+
+def client_key(scope: Scope) -> str:
+    """Identifies the client making a request by its address.
+
+    Headers such as an API key are chosen by the client and nothing verifies them, so a client could send a new one with
+    every request to get a fresh budget each time, and to push other clients' buckets out of the limiter.
+    """
+    client = scope.get('client')
+    return f'address:{client[0] if client else "unknown"}'
+
+
+@dataclass(frozen=True)
+class Budget:
+    """How much of one kind of request the API accepts.
+
+    Each client has a token bucket holding up to ``burst`` tokens, which refills at ``rate`` tokens a second, and every
+    request takes a token. A rate of 0 means the requests are not rate limited. ``max_in_flight`` caps the number of
+    these requests a worker handles at once from all clients together, and 0 means there is no cap.
+    """
+    rate: float = 0.0
+    burst: float = 1.0
+    max_in_flight: int = 0
+
+    def __post_init__(self) -> None:
+        if self.rate < 0 or self.burst < 1 or self.max_in_flight < 0:
+            raise ValueError(f'A budget needs a rate of at least 0, a burst of at least 1 and a cap on requests in '
+                             f'flight of at least 0, not {self}')
+
+    @classmethod
+    def parse(cls, value: str, max_in_flight: int = 0) -> 'Budget':
+        """Parses a budget written as ``<rate>`` or ``<rate>,<burst>``, such as ``5,20`` for 5 requests a second
+        with bursts of up to 20. Without a burst, a client may make a second's worth of requests at once."""
+        rate, _, burst = value.partition(',')
+        return cls(rate=float(rate), burst=float(burst or max(float(rate), 1.0)), max_in_flight=max_in_flight)
+
+
+# The budget for each kind of request
+DEFAULT_BUDGETS = {
+    'create': Budget(rate=5.0, burst=50.0),
+    'poll': Budget(rate=100.0, burst=500.0),
+    'results': Budget(rate=20.0, burst=100.0, max_in_flight=64)
+}
+
+
+@dataclass
+class RateLimiter:
+    """Decides whether to admit each request, from its client's token bucket for the kind of request and from the
+    number of requests in flight.
+
+    When the store's backend is shared between workers, the buckets are kept by the backend so that a client's limits
+    hold however its requests are spread over the workers. Otherwise each worker keeps an LRU of at most
+    ``max_clients`` buckets, and a client whose bucket is evicted starts again with a full one. Either way admitting a
+    request looks up a single bucket. Requests in flight are counted by each worker, ``max_in_flight`` caps all the
+    requests a worker handles at once and each budget may cap its own kind of request. Watches are idle for most of
+    their time, so they only count towards their own cap of ``max_watches``.
+    """
+    budgets: dict[str, Budget] = field(default_factory=lambda: dict(DEFAULT_BUDGETS))
+    max_in_flight: int = 1024
+    max_watches: int = 10_000
+    max_clients: int = 100_000
+    enabled: bool = True
+    # The tokens in each bucket and when they were counted, in order of use
+    _buckets: OrderedDict[str, tuple[float, float]] = field(default_factory=OrderedDict, init=False, repr=False)
+    _in_flight: Counter[str | None] = field(default_factory=Counter, init=False, repr=False)
+    _total_in_flight: int = field(default=0, init=False, repr=False)
+    _watches: int = field(default=0, init=False, repr=False)
+
+    @classmethod
+    def from_env(cls) -> 'RateLimiter':
+        """Configure using the RATE_LIMITS (off turns off rate limits and caps), RATE_LIMIT_CREATE, RATE_LIMIT_POLL,
+        RATE_LIMIT_RESULTS (each a budget as read by Budget.parse), MAX_IN_FLIGHT, MAX_IN_FLIGHT_CREATE,
+        MAX_IN_FLIGHT_POLL, MAX_IN_FLIGHT_RESULTS, MAX_WATCHES and RATE_LIMIT_CLIENTS environment variables."""
+        budgets = {}
+        for kind, default in DEFAULT_BUDGETS.items():
+            max_in_flight = int(os.getenv(f'MAX_IN_FLIGHT_{kind.upper()}', default.max_in_flight))
+            if (value := os.getenv(f'RATE_LIMIT_{kind.upper()}')) is None:
+                budgets[kind] = Budget(default.rate, default.burst, max_in_flight)
+            else:
+                budgets[kind] = Budget.parse(value, max_in_flight)
+        return cls(budgets=budgets,
+                   max_in_flight=int(os.getenv('MAX_IN_FLIGHT', 1024)),
+                   max_watches=int(os.getenv('MAX_WATCHES', 10_000)),
+                   max_clients=int(os.getenv('RATE_LIMIT_CLIENTS', 100_000)),
+                   enabled=os.getenv('RATE_LIMITS', 'on').strip().lower() not in ('0', 'off', 'none', 'false'))
+
+    def _take_token(self, key: str, budget: Budget) -> float:
+        now = time.monotonic()
+        # Popping and adding the bucket again makes it the most recently used
+        tokens, updated = self._buckets.pop(key, (budget.burst, now))
+        tokens = min(budget.burst, tokens + (now - updated) * budget.rate)
+        wait = 0.0 if tokens >= 1 else (1 - tokens) / budget.rate
+        self._buckets[key] = (tokens - 1 if wait == 0 else tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+    async def take_token(self, key: str, budget: Budget, backend: StoreBackend) -> float:
+        """Take a token from a bucket, returning 0 if there was one or else how many seconds until there will be."""
+        if not backend.shared:
+            return self._take_token(key, budget)
+        if backend.blocking:
+            return await asyncio.to_thread(backend.take_token, key, budget.rate, budget.burst)
+        return backend.take_token(key, budget.rate, budget.burst)
+
+    def enter(self, kind: str | None, watch: bool = False) -> bool:
+        """Count a request as in flight, unless a cap has been reached. Returns whether the request was counted."""
+        if watch:
+            if self.max_watches and self._watches >= self.max_watches:
+                return False
+            self._watches += 1
+            return True
+        if self.max_in_flight and self._total_in_flight >= self.max_in_flight:
+            return False
+        budget = self.budgets.get(kind)
+        if budget is not None and budget.max_in_flight and self._in_flight[kind] >= budget.max_in_flight:
+            return False
+        self._total_in_flight += 1
+        self._in_flight[kind] += 1
+        return True
+
+    def leave(self, kind: str | None, watch: bool = False) -> None:
+        if watch:
+            self._watches -= 1
+            return
+        self._total_in_flight -= 1
+        self._in_flight[kind] -= 1
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RateLimitMiddleware:
+    """Rejects requests with a 429 once their client has used up its budget for that kind of request, or once the
+    worker is handling as many requests as it may.
+
+    The limiter is read from the app's state on every request, like the app's other per-process state. Like
+    MetricsMiddleware this is a plain ASGI middleware, and requests are classified by their method and path as they
+    haven't been routed yet.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._throttled: dict[tuple[str, str], CounterSeries] = {}
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send, kind: str | None, reason: str, error: Error,
+                      retry_after: int) -> None:
+        labels = (kind or 'other', reason)
+        if (throttled := self._throttled.get(labels)) is None:
+            throttled = self._throttled[labels] = REQUESTS_THROTTLED.labels(*labels)
+        throttled.inc()
+        response = error_response(error, headers={'Retry-After': str(retry_after)})
+        await response(scope, receive, send)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or scope['path'] in _EXEMPT:
+            await self.app(scope, receive, send)
+            return
+        limiter: RateLimiter = scope['app'].state.rate_limiter
+        if not limiter.enabled:
+            await self.app(scope, receive, send)
+            return
+        kind = request_kind(scope['method'], scope['path'])
+        watch = kind == 'poll' and is_watch(scope['method'], scope['path'], scope['query_string'])
+        if not limiter.enter(kind, watch):
+            await self._reject(scope, receive, send, kind, 'in_flight', ServerBusy(), 1)
+            return
+        try:
+            if (budget := limiter.budgets.get(kind)) is not None and budget.rate > 0:
+                backend = scope['app'].state.model_store.backend
+                if (wait := await limiter.take_token(f'{kind}:{client_key(scope)}', budget, backend)) > 0:
+                    retry_after = max(1, math.ceil(wait))
+                    await self._reject(scope, receive, send, kind, 'rate', RateLimited(kind, retry_after), retry_after)
+                    return
+            await self.app(scope, receive, send)
+        finally:
+            limiter.leave(kind, watch)
@@ -1,9 +1,11 @@
 from app.api.resources.results import ResultItem
 from app.api.resources.model import Model
+from app.api.resources.model_config import ModelConfig
 from app.api.resources.status import Status
 
 __all__ = [
     'Model',
+    'ModelConfig',
     'ResultItem',
     'Status'
 ]
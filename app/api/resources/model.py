@@ -1,9 +1,33 @@
-from dataclasses import dataclass
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any
 
+from app.api.resources.status import Status
 
-@dataclass
+
+@dataclass(frozen=True)
 class Model:
+    id: uuid.UUID
+    status: Status = Status.PENDING
+    errors: list[dict[str, str]] = field(default_factory=list)
+    # Used to order and filter listings of models, it is not part of a model's representation in the API
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+    @classmethod
+    def new_model(cls) -> 'Model':
+        return cls(id=uuid.uuid4())
+
+    def json(self) -> dict[str, Any]:
+        body: dict[str, Any] = {
+            'id': str(self.id),
+            'status': self.status.value
+        }
+        # The errors field is optional and typically empty unless the model has failed
+        if self.errors:
+            body['errors'] = self.errors
+        return body
+
     @classmethod
-    def new_model(cls):
-        # FIXME: This should return a new Model
-        pass
+    def from_json(cls, data: dict[str, Any]) -> 'Model':
+        return cls(id=uuid.UUID(data['id']), status=Status(data['status']), errors=list(data.get('errors', [])))
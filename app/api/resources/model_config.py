@@ -0,0 +1,16 @@
+from pydantic import BaseModel, ConfigDict, HttpUrl, field_validator
+
+
+class ModelConfig(BaseModel):
+    # The spec allows additional properties, which are kept so they can be passed on to the training job
+    model_config = ConfigDict(extra='allow')
+
+    data_source: HttpUrl
+    data_api_key: str
+
+    @field_validator('data_source')
+    @classmethod
+    def _check_host(cls, data_source: HttpUrl) -> HttpUrl:
+        if not data_source.host or '.' not in data_source.host:
+            raise ValueError('The data source must be a URL with a fully qualified domain name')
+        return data_source
@@ -1,6 +1,20 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Any
 
 
-@dataclass
-class ResultItem:  # FiXME: This should follow the schema for a ResultItem
-    pass
+@dataclass(slots=True)
+class ResultItem:
+    cluster: int
+    occurrences: int
+    members: list[str] = field(default_factory=list)
+
+    def json(self) -> dict[str, Any]:
+        return {
+            'cluster_label': self.cluster,
+            'occurrences': self.occurrences,
+            'members': self.members
+        }
+
+    @classmethod
+    def from_json(cls, data: dict[str, Any]) -> 'ResultItem':
+        return cls(cluster=data['cluster_label'], occurrences=data['occurrences'], members=list(data['members']))
@@ -1,5 +1,13 @@
 from enum import Enum
 
 
-class Status(Enum):  # FIXME: This should follow the schema for a Status
-    pass
+class Status(Enum):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+
+    @property
+    def is_terminal(self) -> bool:
+        """Whether the status is final, i.e. a model with this status can never change again."""
+        return self in (Status.COMPLETED, Status.FAILED)
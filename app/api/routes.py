@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+
+from app.api.operations.delete_model import delete_model
+from app.api.operations.get_healthz import healthz
+from app.api.operations.get_metrics import get_metrics
+from app.api.operations.get_model import get_model
+from app.api.operations.get_model_events import get_model_events
+from app.api.operations.get_models import get_models
+from app.api.operations.get_results import get_results
+from app.api.operations.post_model_refresh import refresh_model
+from app.api.operations.post_models import create_model
+from app.api.operations.post_models_batch import create_models
+
+router = APIRouter()
+router.add_api_route('/healthz', healthz, methods=['GET'], status_code=204, tags=['Health'])
+router.add_api_route('/metrics', get_metrics, methods=['GET'], tags=['Health'])
+router.add_api_route('/models', create_model, methods=['POST'], status_code=201)
+router.add_api_route('/models', get_models, methods=['GET'])
+router.add_api_route('/models:batch', create_models, methods=['POST'], status_code=201)
+router.add_api_route('/models/{model_id}', get_model, methods=['GET'])
+router.add_api_route('/models/{model_id}', delete_model, methods=['DELETE'], status_code=204)
+router.add_api_route('/models/{model_id}:refresh', refresh_model, methods=['POST'], status_code=201)
+router.add_api_route('/models/{model_id}/results', get_results, methods=['GET'])
+router.add_api_route('/models/{model_id}/events', get_model_events, methods=['GET'])
@@ -0,0 +1,120 @@
+import json
+import os
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+from typing import Any
+
+from fastapi.responses import Response
+
+from app.api.resources.model import Model
+from app.store.result_set import ResultSet
+
+
+class Serializer(ABC):
+    name: str
+
+    @abstractmethod
+    def dumps(self, content: Any) -> bytes:
+        ...
+
+
+class StdlibSerializer(Serializer):
+    name = 'stdlib'
+
+    def __init__(self) -> None:
+        self._encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    def dumps(self, content: Any) -> bytes:
+        return self._encoder.encode(content).encode()
+
+
+class OrjsonSerializer(Serializer):
+    name = 'orjson'
+
+    def __init__(self) -> None:
+        import orjson
+        self._dumps = orjson.dumps
+
+    def dumps(self, content: Any) -> bytes:
+        return self._dumps(content)
+
+
+def _make_serializer(name: str | None = None) -> Serializer:
+    """Returns the named serializer, or the fastest one available when no name is given."""
+    match name:
+        case 'stdlib':
+            return StdlibSerializer()
+        case 'orjson':
+            return OrjsonSerializer()
+        case None:
+            try:
+                return OrjsonSerializer()
+            except ImportError:
+                return StdlibSerializer()
+    raise ValueError(f'Unknown JSON serializer {name!r}, expected one of \'orjson\' or \'stdlib\'')
+
+
+serializer: Serializer = _make_serializer(os.getenv('JSON_SERIALIZER'))
+
+
+def use_serializer(name: str | None) -> Serializer:
+    """Switch the serializer used for every response, returning the new serializer."""
+    global serializer
+    serializer = _make_serializer(name)
+    return serializer
+
+
+def dumps(content: Any) -> bytes:
+    return serializer.dumps(content)
+
+
+class JSONBytesResponse(Response):
+    """A JSON response whose body has already been encoded, so it is sent as is."""
+    media_type = 'application/json'
+
+
+def json_response(content: Any, status_code: int = 200, headers: dict[str, str] | None = None) -> JSONBytesResponse:
+    return JSONBytesResponse(content=dumps(content), status_code=status_code, headers=headers)
+
+
+def encode_model(model: Model) -> bytes:
+    return dumps(model.json())
+
+
+def results_summary(results: ResultSet) -> dict[str, int]:
+    return {
+        'cluster_count': results.cluster_count,
+        'total_data_points': results.total_data_points
+    }
+
+
+def encode_cluster(results: ResultSet, index: int, start: int = 0, stop: int | None = None) -> bytes:
+    """Encodes the cluster at ``index``, optionally with only a range of its members.
+
+    When no member needs escaping, the members are copied into the JSON straight from the result set's string buffer,
+    without building a ResultItem or decoding any strings.
+    """
+    if not results.plain_strings:
+        return dumps(results.item(index, start, stop).json())
+    members = results.member_bytes(index, start, stop)
+    return b'{"cluster_label":%d,"occurrences":%d,"members":[%s]}' % (
+        results.labels[index], results.occurrences[index], b'"' + b'","'.join(members) + b'"' if members else b'')
+
+
+# A range of the members of the cluster at an index
+ClusterRange = tuple[int, int, int | None]
+
+
+def encode_results(results: ResultSet, clusters: Iterable[ClusterRange] | None = None,
+                   next_cursor: str | None = None) -> bytes:
+    """Encodes the results envelope for the given ranges of clusters, or for every cluster when none are given.
+
+    Encoded responses are cached by the API's ResponseCache, so a result set is normally only encoded once.
+    """
+    ranges = ((index, 0, None) for index in range(len(results))) if clusters is None else clusters
+    # The clusters are added to the end of the encoded summary object
+    summary = dumps(results_summary(results))[:-1]
+    encoded = b'%s,"clusters":[%s]}' % (summary, b','.join(encode_cluster(results, *cluster) for cluster in ranges))
+    if next_cursor is not None:
+        return b'{"results":%s,"next_cursor":%s}' % (encoded, dumps(next_cursor))
+    return b'{"results":%s}' % encoded
@@ -0,0 +1,16 @@
+import re
+
+# The longest a client can ask to wait for a model to change
+MAX_WAIT = 60.0
+
+_DURATION = re.compile(r'(\d+(?:\.\d+)?)(ms|s)?')
+
+
+def parse_wait(wait: str) -> float:
+    """Parses a wait duration such as 30, 30s or 500ms into seconds, raising a ValueError if it is invalid."""
+    if (match := _DURATION.fullmatch(wait.strip())) is None:
+        raise ValueError(f'Invalid duration {wait!r}')
+    seconds = float(match[1]) / (1000 if match[2] == 'ms' else 1)
+    if seconds > MAX_WAIT:
+        raise ValueError(f'Duration {wait!r} is too long')
+    return seconds
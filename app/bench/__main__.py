@@ -0,0 +1,5 @@
+from app.bench.load import main
+
+# Training workers are spawned, and import the main module again, so it must not run the benchmark when imported
+if __name__ == '__main__':
+    main()
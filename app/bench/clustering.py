@@ -0,0 +1,69 @@
+"""Compare the vectorised clustering engine with a per-item Python loop.
+
+Run with ``python -m app.bench.clustering [--points N]``.
+"""
+import argparse
+import time
+import tracemalloc
+from collections.abc import Callable, Iterable
+
+from app.api.resources import ResultItem
+from app.store.model_store import _make_results
+from app.training.clustering import FeatureBatch, cluster
+from app.training.sources import synthetic_traces
+
+
+def loop_cluster(batches: Iterable[FeatureBatch], clusters: int = 8) -> list[ResultItem]:
+    """The same single pass k-means as the engine, one trace and one centroid at a time like _make_results."""
+    centroids: list[list[float]] = []
+    counts: list[int] = []
+    members: list[list[str]] = []
+    for batch in batches:
+        for trace_id, row in zip(batch.ids, batch.features.tolist()):
+            if len(centroids) < clusters:
+                centroids.append(list(row))
+                counts.append(0)
+                members.append([])
+            distances = [sum((x - c) ** 2 for x, c in zip(row, centroid)) for centroid in centroids]
+            nearest = distances.index(min(distances))
+            counts[nearest] += 1
+            centroid = centroids[nearest]
+            for dim, value in enumerate(row):
+                centroid[dim] += (value - centroid[dim]) / counts[nearest]
+            if len(members[nearest]) < 1000:
+                members[nearest].append(trace_id)
+    return [ResultItem(cluster=idx, occurrences=count, members=items)
+            for idx, (count, items) in enumerate(zip(counts, members))]
+
+
+def _measure(function: Callable[[], list[ResultItem]]) -> tuple[float, float, int]:
+    """Returns the time taken, the peak memory used in MiB and the number of data points clustered."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    results = function()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return elapsed, peak, sum(item.occurrences for item in results)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--points', type=int, default=1_000_000, help='The number of traces for the engine')
+    parser.add_argument('--loop-points', type=int, default=50_000, help='The number of traces for the Python loop')
+    parser.add_argument('--batch-size', type=int, default=10_000)
+    args = parser.parse_args()
+
+    scenarios = {
+        '_make_results (random stub)': lambda: _make_results(),
+        'per-item loop': lambda: loop_cluster(synthetic_traces(args.loop_points, args.batch_size, seed=1)),
+        'vectorised engine': lambda: cluster(synthetic_traces(args.points, args.batch_size, seed=1), seed=1)
+    }
+    print(f'{"scenario":<30}{"points":>12}{"seconds":>10}{"points/s":>14}{"peak MiB":>10}')
+    for name, function in scenarios.items():
+        elapsed, peak, points = _measure(function)
+        print(f'{name:<30}{points:>12,}{elapsed:>10.2f}{points / elapsed:>14,.0f}{peak:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Show that listing models costs the same however many models are stored.
+
+Run with ``python -m app.bench.listing [--sizes N ...]``.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.api.resources import Model, Status
+from app.store import ModelStore
+from app.store.backends import MemoryBackend, SQLiteBackend, StoreBackend
+
+_REPEATS = 200
+
+
+def _fill(store: ModelStore, count: int) -> datetime:
+    """Adds ``count`` models, a few percent of them running, and returns the time halfway through their creation."""
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rng = random.Random(0)
+    models = [Model(id=Model.new_model().id, status=Status.RUNNING if rng.random() < 0.02 else Status.PENDING,
+                    created_at=start + timedelta(seconds=idx)) for idx in range(count)]
+    for idx in range(0, count, 10_000):
+        store.put_many(models[idx:idx + 10_000])
+    return start + timedelta(seconds=count // 2)
+
+
+def bench_backend(backend: StoreBackend, count: int) -> dict[str, float]:
+    """Returns the mean time in microseconds taken to fetch a page of 100 models with each kind of query."""
+    store = ModelStore(backend=backend)
+    middle = _fill(store, count)
+    queries = {
+        'all': lambda: store.list_models(limit=100),
+        'running': lambda: store.list_models([Status.RUNNING], limit=100),
+        'created_after': lambda: store.list_models(created_after=middle, limit=100),
+        'running_after': lambda: store.list_models([Status.RUNNING, Status.FAILED], created_after=middle, limit=100)
+    }
+    timings = {}
+    for name, query in queries.items():
+        start = time.perf_counter()
+        for _ in range(_REPEATS):
+            query()
+        timings[name] = (time.perf_counter() - start) / _REPEATS * 1e6
+    backend.close()
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 300_000],
+                        help='The numbers of models to store')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for idx, size in enumerate(args.sizes):
+            backends = {
+                'memory': MemoryBackend(),
+                'sqlite': SQLiteBackend(os.path.join(directory, f'bench-{size}.db'))
+            }
+            for name, backend in backends.items():
+                timings = bench_backend(backend, size)
+                if idx == 0 and name == 'memory':
+                    print(f'{"backend":<8}{"models":>10}' + ''.join(f'{query + " µs":>18}' for query in timings))
+                print(f'{name:<8}{size:>10,}' + ''.join(f'{timing:>18,.1f}' for timing in timings.values()))
+
+
+if __name__ == '__main__':
+    main()
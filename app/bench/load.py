@@ -0,0 +1,339 @@
+"""Replay mixes of requests against the API and report throughput, latency and memory for each scenario.
+
+A scenario is a JSONL file with one kind of request per line, e.g.
+``{"name": "get", "weight": 9, "method": "GET", "path": "/models/{model_id}"}``. Requests are picked at random in
+proportion to their weights, and may also have ``json`` and ``headers``. Paths may refer to ``{model_id}`` (one of the
+models created before the scenario starts), ``{model_ids}`` (a comma separated list of 50 of them) or
+``{large_model_id}`` (one of a few models with large results). Strings in ``json`` may refer to ``{request}``, a number
+which is different for every request, so that each request can create a new model rather than one identical to an
+earlier request's.
+
+Run with ``scripts/bench [SCENARIO ...] [--target asgi|uvicorn] [--save-baseline FILE] [--baseline FILE]``. The asgi
+target calls the app in this process, while the uvicorn target launches a server and sends it real HTTP requests.
+
+Bytes per request are the bytes of the response bodies as sent, so compressed responses count their compressed size.
+CPU per request is the CPU time used by the server, which with the asgi target also includes the client's.
+
+The API's rate limits are turned off, as they would otherwise cap the throughput being measured. With
+``--rate-limits`` they are kept, and as the simulated clients all have the same address they share a single budget. The
+training queue is made long enough to hold every model a scenario creates, unless TRAINING_QUEUE_SIZE is set, as
+otherwise creates would mostly measure rejections once it is full.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import socket
+import string
+import subprocess
+import sys
+import time
+from collections import Counter
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+SCENARIOS = Path(__file__).parent / 'scenarios'
+# The summary fields compared against a baseline, and whether a higher value is better
+COMPARED = {'requests_per_second': True, 'p50_ms': False, 'p99_ms': False, 'rss_mib': False,
+            'bytes_per_request': False, 'cpu_ms_per_request': False}
+_CONFIG = {'data_source': 'https://traces.example.com', 'data_api_key': 'bench'}
+_LARGE_CONFIG = _CONFIG | {'data_points': 200_000, 'clusters': 128}
+_TRAINING_QUEUE_SIZE = 1_000_000
+
+
+def _fill(value: Any, request: str) -> Any:
+    if isinstance(value, str):
+        return value.replace('{request}', request)
+    if isinstance(value, dict):
+        return {key: _fill(item, request) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_fill(item, request) for item in value]
+    return value
+
+
+@dataclass
+class RequestTemplate:
+    name: str
+    method: str
+    path: str
+    weight: float = 1.0
+    json: Any = None
+    headers: dict[str, str] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self._fields = [name for _, name, _, _ in string.Formatter().parse(self.path) if name]
+        self._numbered = '{request}' in json.dumps(self.json)
+
+    def url(self, rng: random.Random, pools: dict[str, list[str]]) -> str:
+        if not self._fields:
+            return self.path
+        values = {name: ','.join(rng.sample(pools['model_id'], min(50, len(pools['model_id']))))
+                  if name == 'model_ids' else rng.choice(pools[name]) for name in self._fields}
+        return self.path.format(**values)
+
+    def body(self, request: int) -> Any:
+        return _fill(self.json, str(request)) if self._numbered else self.json
+
+
+def load_scenario(path: Path) -> list[RequestTemplate]:
+    with open(path) as file:
+        return [RequestTemplate(**json.loads(line)) for line in file if line.strip()]
+
+
+def scenario_path(name: str) -> Path:
+    """Scenarios can be given by name (e.g. poll-heavy) or by the path of a JSONL file."""
+    if (path := Path(name)).suffix == '.jsonl':
+        return path
+    return SCENARIOS / f'{name}.jsonl'
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    """The nearest-rank percentile of some sorted values."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def summarise(latencies: list[float], statuses: Counter[str], elapsed: float, rss: float | None,
+              body_bytes: int = 0, cpu_seconds: float | None = None) -> dict[str, Any]:
+    ordered = sorted(latencies)
+    count = len(ordered) or 1
+    return {
+        'requests': len(ordered),
+        'requests_per_second': len(ordered) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(ordered, 0.5) * 1000,
+        'p90_ms': percentile(ordered, 0.9) * 1000,
+        'p99_ms': percentile(ordered, 0.99) * 1000,
+        'max_ms': (ordered[-1] if ordered else 0.0) * 1000,
+        'errors': sum(count for status, count in statuses.items() if status[0] not in '1234'),
+        'statuses': dict(sorted(statuses.items())),
+        'rss_mib': rss,
+        'bytes_per_request': body_bytes / count,
+        'cpu_ms_per_request': None if cpu_seconds is None else cpu_seconds * 1000 / count
+    }
+
+
+def rss_mib(pid: int) -> float | None:
+    """The resident memory of a process, where /proc is available."""
+    try:
+        with open(f'/proc/{pid}/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return None
+
+
+def cpu_seconds(pid: int) -> float | None:
+    """The CPU time (user and system) used by a process so far, where /proc is available."""
+    try:
+        with open(f'/proc/{pid}/stat') as file:
+            # The command may contain spaces, but is followed by the last parenthesis
+            fields = file.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+async def _create(client: httpx.AsyncClient, config: dict[str, Any], count: int) -> list[str]:
+    ids = []
+    while len(ids) < count:
+        # Small batches, as a batch is only accepted once the training queue has room for all of it
+        response = await client.post('/models:batch', json={'configs': [config] * min(50, count - len(ids))})
+        if response.status_code == 429:
+            # The training queue is full, wait for some models to finish
+            await asyncio.sleep(0.5)
+            continue
+        response.raise_for_status()
+        ids += [model['id'] for model in response.json()['models']]
+    return ids
+
+
+async def _wait_until_trained(client: httpx.AsyncClient, model_ids: list[str], timeout: float = 300.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = await client.get('/models', params={'ids': ','.join(model_ids)})
+        if all(model['status'] in ('completed', 'failed') for model in response.json()['models']):
+            return
+        await asyncio.sleep(0.5)
+    raise TimeoutError('The models used by the benchmark were not trained in time')
+
+
+async def setup(client: httpx.AsyncClient, models: int, large_models: int) -> dict[str, list[str]]:
+    """Creates the models that scenarios refer to, and waits for the models with large results to be trained."""
+    large_ids = await _create(client, _LARGE_CONFIG, large_models)
+    model_ids = await _create(client, _CONFIG | {'data_points': 1000}, models)
+    await _wait_until_trained(client, large_ids)
+    return {'model_id': model_ids, 'large_model_id': large_ids}
+
+
+async def drive(client: httpx.AsyncClient, templates: list[RequestTemplate], pools: dict[str, list[str]],
+                concurrency: int, duration: float, seed: int = 0) -> tuple[list[float], Counter[str], float, int]:
+    """Sends requests from ``concurrency`` clients at once for ``duration`` seconds.
+
+    Returns the latency of every request, the number of responses with each status code, the time taken and the
+    number of bytes received.
+    """
+    rng = random.Random(seed)
+    weights = [template.weight for template in templates]
+    latencies: list[float] = []
+    statuses: Counter[str] = Counter()
+    received = 0
+    numbers = itertools.count()
+
+    async def run_client(deadline: float) -> None:
+        nonlocal received
+        while time.perf_counter() < deadline:
+            template = rng.choices(templates, weights)[0]
+            url = template.url(rng, pools)
+            start = time.perf_counter()
+            try:
+                response = await client.request(template.method, url, json=template.body(next(numbers)),
+                                                headers=template.headers)
+                # Read the whole body, so streamed responses are timed until their last byte
+                await response.aread()
+                statuses[str(response.status_code)] += 1
+                # Before any decompression
+                received += response.num_bytes_downloaded
+            except httpx.HTTPError as exc:
+                statuses[type(exc).__name__] += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(start + duration) for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - start, received
+
+
+def _environment(rate_limits: bool) -> dict[str, str]:
+    """The environment variables the app is configured with, on top of those the bench is run with."""
+    environ = {'TRAINING_QUEUE_SIZE': os.getenv('TRAINING_QUEUE_SIZE', str(_TRAINING_QUEUE_SIZE))}
+    return environ if rate_limits else environ | {'RATE_LIMITS': 'off'}
+
+
+# A client for the target, and functions returning the target's resident memory and the CPU time it has used
+Target = tuple[httpx.AsyncClient, Callable[[], float | None], Callable[[], float | None]]
+
+
+@asynccontextmanager
+async def asgi_target(rate_limits: bool = False) -> AsyncIterator[Target]:
+    """Calls the app in this process, with its lifespan running so that models are trained."""
+    from app.api.rate_limiting import RateLimiter
+    from app.main import app
+    from app.store import ModelStore
+    app.state.model_store = ModelStore()
+    app.state.response_cache.clear()
+    os.environ.update(_environment(rate_limits))
+    app.state.rate_limiter = RateLimiter.from_env()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=60) as client:
+            yield client, lambda: rss_mib(os.getpid()), time.process_time
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def uvicorn_target(concurrency: int, rate_limits: bool = False) -> AsyncIterator[Target]:
+    """Launches a uvicorn server running the app, and sends it requests over HTTP."""
+    port = _free_port()
+    environ = dict(os.environ, **_environment(rate_limits))
+    server = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'app.main:app', '--host', '127.0.0.1',
+                               '--port', str(port), '--log-level', 'warning'], env=environ)
+    try:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', limits=limits, timeout=60) as client:
+            for _ in range(100):
+                try:
+                    if (await client.get('/healthz')).status_code == 204:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError('The uvicorn server did not start')
+            yield client, lambda: rss_mib(server.pid), lambda: cpu_seconds(server.pid)
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+
+async def run_scenario(name: str, target: str, concurrency: int, duration: float, models: int,
+                       large_models: int, rate_limits: bool = False) -> dict[str, Any]:
+    templates = load_scenario(scenario_path(name))
+    # Every scenario gets a fresh app, so they don't affect each other
+    context = asgi_target(rate_limits) if target == 'asgi' else uvicorn_target(concurrency, rate_limits)
+    async with context as (client, memory, cpu):
+        pools = await setup(client, models, large_models)
+        cpu_before = cpu()
+        latencies, statuses, elapsed, received = await drive(client, templates, pools, concurrency, duration)
+        cpu_after = cpu()
+        cpu_used = None if cpu_before is None or cpu_after is None else cpu_after - cpu_before
+        return summarise(latencies, statuses, elapsed, memory(), received, cpu_used)
+
+
+def compare(results: dict[str, dict[str, Any]], baseline: dict[str, dict[str, Any]],
+            tolerance: float) -> list[str]:
+    """Returns a description of every figure which is worse than the baseline by more than ``tolerance``."""
+    regressions = []
+    for scenario, summary in results.items():
+        if (previous := baseline.get(scenario)) is None:
+            continue
+        for key, higher_is_better in COMPARED.items():
+            if not previous.get(key) or summary.get(key) is None:
+                continue
+            change = (summary[key] - previous[key]) / previous[key]
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f'{scenario} {key}: {previous[key]:,.2f} -> {summary[key]:,.2f} '
+                                   f'({change:+.0%})')
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('scenarios', nargs='*', default=sorted(path.stem for path in SCENARIOS.glob('*.jsonl')),
+                        help='Names of scenarios in app/bench/scenarios, or paths of JSONL files')
+    parser.add_argument('--target', choices=('asgi', 'uvicorn'), default='asgi')
+    parser.add_argument('--concurrency', type=int, default=32, help='The number of clients sending requests at once')
+    parser.add_argument('--duration', type=float, default=10.0, help='How long to run each scenario in seconds')
+    parser.add_argument('--models', type=int, default=1000, help='The number of models to create before starting')
+    parser.add_argument('--large-models', type=int, default=4, help='The number of models with large results')
+    parser.add_argument('--save-baseline', type=Path, help='Write the results to this JSON file')
+    parser.add_argument('--baseline', type=Path, help='Compare the results with those saved in this JSON file')
+    parser.add_argument('--rate-limits', action='store_true',
+                        help='Keep the API\'s rate limits, rather than turning them off')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='How much worse than the baseline a figure may be before it is a regression')
+    args = parser.parse_args()
+
+    results = {}
+    print(f'{"scenario":<20}{"req/s":>10}{"p50 ms":>10}{"p90 ms":>10}{"p99 ms":>10}{"max ms":>10}{"errors":>8}'
+          f'{"rss MiB":>10}{"KiB/req":>10}{"CPU ms/req":>12}')
+    for name in args.scenarios:
+        summary = results[name] = asyncio.run(run_scenario(name, args.target, args.concurrency, args.duration,
+                                                           args.models, args.large_models, args.rate_limits))
+        rss = '-' if summary['rss_mib'] is None else f'{summary["rss_mib"]:.0f}'
+        cpu = '-' if summary['cpu_ms_per_request'] is None else f'{summary["cpu_ms_per_request"]:.2f}'
+        print(f'{name:<20}{summary["requests_per_second"]:>10,.0f}{summary["p50_ms"]:>10.2f}'
+              f'{summary["p90_ms"]:>10.2f}{summary["p99_ms"]:>10.2f}{summary["max_ms"]:>10.2f}'
+              f'{summary["errors"]:>8}{rss:>10}{summary["bytes_per_request"] / 1024:>10.1f}{cpu:>12}')
+
+    if args.save_baseline is not None:
+        args.save_baseline.write_text(json.dumps({'target': args.target, 'scenarios': results}, indent=2) + '\n')
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get('target') != args.target:
+            print(f'Warning: the baseline was measured against the {baseline.get("target")} target')
+        if regressions := compare(results, baseline['scenarios'], args.tolerance):
+            print('Regressions against the baseline:')
+            print('\n'.join(f'  {regression}' for regression in regressions))
+            sys.exit(1)
+        print('No regressions against the baseline')
@@ -0,0 +1,64 @@
+"""Measure the request rate of the JSON endpoints with each serializer.
+
+Rate limits are turned off, as they would otherwise throttle the requests being timed.
+Run with ``python -m app.bench.serialization [--requests N]``.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+
+from app.api import serializers
+from app.api.rate_limiting import RateLimiter
+from app.api.resources import Model, Status
+from app.main import app
+from app.store import ModelStore
+from app.training.clustering import cluster
+from app.training.sources import synthetic_traces
+
+
+async def _requests_per_second(client: httpx.AsyncClient, path: str, count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        response = await client.get(path)
+        response.raise_for_status()
+    return count / (time.perf_counter() - start)
+
+
+async def bench(count: int, data_points: int) -> dict[str, dict[str, float]]:
+    model_store = app.state.model_store = ModelStore()
+    app.state.rate_limiter = RateLimiter(enabled=False)
+    model = Model(id=uuid.uuid4(), status=Status.COMPLETED)
+    model_store[str(model.id)] = (model, cluster(synthetic_traces(data_points, seed=1), clusters=16, seed=1))
+    rates: dict[str, dict[str, float]] = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://bench') as client:
+        for name in ('stdlib', 'orjson'):
+            serializers.use_serializer(name)
+            rates[name] = {'GET /models/{id}': await _requests_per_second(client, f'/models/{model.id}', count)}
+            # Drop the cached response so the first set of results requests measures encoding the results each time
+            uncached = 0.0
+            for _ in range(count):
+                app.state.response_cache.invalidate(str(model.id))
+                uncached += 1 / await _requests_per_second(client, f'/models/{model.id}/results', 1)
+            rates[name]['GET /results (uncached)'] = count / uncached
+            rates[name]['GET /results (cached)'] = await _requests_per_second(client, f'/models/{model.id}/results',
+                                                                              count)
+    return rates
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000, help='The number of requests for each measurement')
+    parser.add_argument('--data-points', type=int, default=50_000, help='The size of the model\'s results')
+    args = parser.parse_args()
+
+    rates = asyncio.run(bench(args.requests, args.data_points))
+    print(f'{"endpoint":<28}' + ''.join(f'{name + " req/s":>16}' for name in rates))
+    for endpoint in rates['stdlib']:
+        print(f'{endpoint:<28}' + ''.join(f'{rate[endpoint]:>16,.0f}' for rate in rates.values()))
+
+
+if __name__ == '__main__':
+    main()
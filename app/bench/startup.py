@@ -0,0 +1,105 @@
+"""Measure how long it takes to import the app, which every worker process and every test run pays for.
+
+Run with ``python -m app.bench.startup [--module app.main] [--runs N] [--top N]``. Each run imports the module in a fresh
+interpreter with ``python -X importtime``, and the fastest run is reported. Most of the time goes on importing FastAPI,
+which the app can't avoid, so the budget applies to the rest: the app's own modules and anything else they import.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from dataclasses import dataclass
+
+# Imported by training, which only happens in the worker processes, so the API must never import them itself
+LAZY_MODULES = ('numpy', 'httpx')
+# The framework the app is built on, whose import time is not counted against the budget
+FRAMEWORK = 'fastapi'
+# The most the app may add to the time it takes to import the framework
+DEFAULT_BUDGET_MS = 200.0
+
+
+@dataclass(frozen=True)
+class ImportTime:
+    module: str
+    # Microseconds spent importing the module itself, and including everything it imported for the first time
+    self_us: int
+    cumulative_us: int
+
+
+@dataclass(frozen=True)
+class StartupProfile:
+    module: str
+    imports: dict[str, ImportTime]
+
+    @property
+    def total_ms(self) -> float:
+        return self.imports[self.module].cumulative_us / 1000
+
+    @property
+    def framework_ms(self) -> float:
+        return 0.0 if (framework := self.imports.get(FRAMEWORK)) is None else framework.cumulative_us / 1000
+
+    @property
+    def overhead_ms(self) -> float:
+        """The time spent importing everything but the framework."""
+        return self.total_ms - self.framework_ms
+
+    def imported(self, package: str) -> bool:
+        return any(module == package or module.startswith(f'{package}.') for module in self.imports)
+
+    def slowest(self, count: int) -> list[ImportTime]:
+        return sorted(self.imports.values(), key=lambda record: record.self_us, reverse=True)[:count]
+
+
+def parse_importtime(output: str) -> dict[str, ImportTime]:
+    """Parses the ``import time: <self> | <cumulative> | <module>`` lines written by ``python -X importtime``."""
+    imports = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, module = line.removeprefix('import time:').split('|')
+        if not self_us.strip().isdigit():
+            # The header line
+            continue
+        imports[module.strip()] = ImportTime(module.strip(), int(self_us), int(cumulative_us))
+    return imports
+
+
+def profile(module: str = 'app.main') -> StartupProfile:
+    """Imports a module in a fresh interpreter and records how long every import took."""
+    environ = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.getcwd(), os.getenv('PYTHONPATH')])))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], capture_output=True,
+                            text=True, env=environ, check=True)
+    return StartupProfile(module, parse_importtime(result.stderr))
+
+
+def fastest(module: str = 'app.main', runs: int = 3) -> StartupProfile:
+    """The fastest of several imports, as slower ones are usually slowed down by something else on the machine."""
+    return min((profile(module) for _ in range(runs)), key=lambda result: result.total_ms)
+
+
+def budget_ms() -> float:
+    return float(os.getenv('IMPORT_TIME_BUDGET_MS') or DEFAULT_BUDGET_MS)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='app.main')
+    parser.add_argument('--runs', type=int, default=5, help='The number of imports to take the fastest of')
+    parser.add_argument('--top', type=int, default=15, help='The number of slowest modules to list')
+    args = parser.parse_args()
+
+    result = fastest(args.module, args.runs)
+    print(f'{args.module}: {result.total_ms:.1f} ms, of which {FRAMEWORK} {result.framework_ms:.1f} ms and the rest '
+          f'{result.overhead_ms:.1f} ms (budget {budget_ms():.0f} ms)')
+    print(f'{"module":<48}{"self ms":>10}{"cumulative ms":>16}')
+    for record in result.slowest(args.top):
+        print(f'{record.module:<48}{record.self_us / 1000:>10.1f}{record.cumulative_us / 1000:>16.1f}')
+    if eager := [package for package in LAZY_MODULES if result.imported(package)]:
+        print(f'Imported eagerly: {", ".join(eager)}')
+    if eager or result.overhead_ms > budget_ms():
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
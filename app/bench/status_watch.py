@@ -0,0 +1,85 @@
+"""Compare the number of requests clients need to learn that their model has completed.
+
+Each client waits for its own model while a simulated trainer moves every model from pending to running to completed.
+Rate limits are turned off, as they would otherwise throttle the polling clients.
+Run with ``python -m app.bench.status_watch [--clients N]``.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+from app.api.rate_limiting import RateLimiter
+from app.api.resources import Model, Status
+from app.main import app
+from app.store import ModelStore
+
+
+async def _train(model_store: ModelStore, model_id: str, duration: float) -> None:
+    await asyncio.sleep(duration / 2)
+    await model_store.aio.set_status(model_id, Status.RUNNING)
+    await asyncio.sleep(duration / 2)
+    await model_store.aio.set_status(model_id, Status.COMPLETED)
+
+
+async def _poll(client: httpx.AsyncClient, model_id: str, interval: float) -> int:
+    requests = 0
+    while True:
+        requests += 1
+        if (await client.get(f'/models/{model_id}')).json()['status'] == 'completed':
+            return requests
+        await asyncio.sleep(interval)
+
+
+async def _long_poll(client: httpx.AsyncClient, model_id: str, interval: float) -> int:
+    requests = 0
+    while True:
+        requests += 1
+        if (await client.get(f'/models/{model_id}', params={'wait': '30s'})).json()['status'] == 'completed':
+            return requests
+
+
+async def _events(client: httpx.AsyncClient, model_id: str, interval: float) -> int:
+    response = await client.get(f'/models/{model_id}/events')
+    last_event = [line for line in response.text.splitlines() if line.startswith('data: ')][-1]
+    assert json.loads(last_event.removeprefix('data: '))['status'] == 'completed'
+    return 1
+
+
+async def bench(clients: int, duration: float, interval: float) -> dict[str, tuple[float, float]]:
+    """Returns the mean number of requests per completed model and the total time for each way of watching."""
+    results = {}
+    rng = random.Random(1)
+    # Every simulated client has the same address, so they would all share one budget
+    app.state.rate_limiter = RateLimiter(enabled=False)
+    for name, watch in (('poll', _poll), ('long-poll', _long_poll), ('server-sent events', _events)):
+        model_store = app.state.model_store = ModelStore()
+        models = [Model.new_model() for _ in range(clients)]
+        model_store.put_many(models)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://bench') as client:
+            start = time.perf_counter()
+            training = [_train(model_store, str(model.id), rng.uniform(duration / 2, duration)) for model in models]
+            watching = [watch(client, str(model.id), interval) for model in models]
+            *_, requests = await asyncio.gather(*training, asyncio.gather(*watching))
+            results[name] = (sum(requests) / clients, time.perf_counter() - start)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=500, help='The number of models being watched at once')
+    parser.add_argument('--duration', type=float, default=2.0, help='The longest time a model takes to train')
+    parser.add_argument('--interval', type=float, default=0.1, help='How often polling clients check their model')
+    args = parser.parse_args()
+
+    results = asyncio.run(bench(args.clients, args.duration, args.interval))
+    print(f'{"mode":<22}{"requests/model":>16}{"seconds":>10}')
+    for name, (requests, elapsed) in results.items():
+        print(f'{name:<22}{requests:>16.1f}{elapsed:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Compare the throughput of the ModelStore backends.
+
+Run with ``python -m app.bench.store [--models N]``.
+"""
+import argparse
+import os
+import tempfile
+import time
+from collections.abc import Callable
+
+from app.api.resources import Model, Status
+from app.store import ModelStore
+from app.store.backends import MemoryBackend, SQLiteBackend, StoreBackend
+
+
+def _timed(operation: Callable[[], None]) -> float:
+    start = time.perf_counter()
+    operation()
+    return time.perf_counter() - start
+
+
+def bench_backend(backend: StoreBackend, count: int) -> dict[str, float]:
+    """Returns the number of operations per second achieved by each type of operation."""
+    store = ModelStore(backend=backend)
+    models = [Model.new_model() for _ in range(count)]
+    ids = [str(model.id) for model in models]
+    batch = [Model.new_model() for _ in range(count)]
+
+    def insert() -> None:
+        for model_id, model in zip(ids, models):
+            store[model_id] = model
+
+    def get() -> None:
+        for model_id in ids:
+            store[model_id]
+
+    def set_status() -> None:
+        for model_id in ids:
+            store.set_status(model_id, Status.RUNNING)
+
+    def delete() -> None:
+        for model_id in ids:
+            del store[model_id]
+
+    timings = {
+        'insert': _timed(insert),
+        'get': _timed(get),
+        'set_status': _timed(set_status),
+        'delete': _timed(delete),
+        'put_many': _timed(lambda: store.put_many(batch)),
+        'delete_many': _timed(lambda: store.delete_many([str(model.id) for model in batch]))
+    }
+    return {operation: count / elapsed for operation, elapsed in timings.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--models', type=int, default=10_000, help='The number of models used for each operation')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = {
+            'memory': bench_backend(MemoryBackend(), args.models),
+            'sqlite': bench_backend(SQLiteBackend(os.path.join(directory, 'bench.db')), args.models)
+        }
+    print(f'{"operation":<12}' + ''.join(f'{name + " ops/s":>18}' for name in results))
+    for operation in results['memory']:
+        print(f'{operation:<12}' + ''.join(f'{timings[operation]:>18,.0f}' for timings in results.values()))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,42 @@
-import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
+from app.api.caching import ResponseCache
+from app.api.compression import CompressionPolicy
+from app.api.deduplication import ModelRequests
+from app.api.middleware import MetricsMiddleware
+from app.api.rate_limiting import RateLimiter, RateLimitMiddleware
+from app.api.routes import router
 from app.store import ModelStore
+from app.training import TrainingScheduler
 
-app = FastAPI()  # Add your configuration here
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    async with TrainingScheduler.from_env() as scheduler:
+        app.state.scheduler = scheduler
+        yield
+    app.state.scheduler = None
+
+
+app = FastAPI(title='Airbus workshop example API', version='1.0', lifespan=lifespan)  # Add your configuration here
+app.include_router(router)
+# Added first so that it runs inside the metrics middleware, which then records rejected requests too
+app.add_middleware(RateLimitMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 # DO NOT EDIT
 app.state.model_store = ModelStore()
+# The scheduler only runs while the app is being served, until then models remain pending
+app.state.scheduler = None
+app.state.response_cache = ResponseCache.from_env()
+app.state.model_requests = ModelRequests.from_env()
+app.state.compression = CompressionPolicy.from_env()
+app.state.rate_limiter = RateLimiter.from_env()
 
 
 if __name__ == '__main__':
-    port = os.getenv('PORT', 8080)
-    # FIXME: The API should be launched here
+    from app.server import main
+    main()
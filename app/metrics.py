@@ -0,0 +1,208 @@
+"""Metrics in the Prometheus text format.
+
+Every metric is created when this module is imported, and each set of label values gets its own series the first time
+it is used. Callers on hot paths should keep hold of the series they use so that recording a value only updates a few
+preallocated numbers.
+"""
+import bisect
+import math
+import threading
+from collections.abc import Iterable, Iterator, Sequence
+
+# Upper bounds of the latency buckets in seconds, and of the size buckets in bytes
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = tuple(float(4 ** power) for power in range(4, 14))
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    escaped = (value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+class CounterSeries:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class GaugeSeries(CounterSeries):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class HistogramSeries:
+    __slots__ = ('bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self.bounds = bounds
+        # One count per bucket, plus one for values above the largest bound. The counts are not cumulative.
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+class Metric:
+    """A named metric with a series for each combination of label values."""
+    kind: str
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._series: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_series(self) -> object:
+        raise NotImplementedError
+
+    def labels(self, *values: str) -> object:
+        """Returns the series for the given label values, creating it the first time they are used."""
+        if (series := self._series.get(values)) is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f'{self.name} takes the labels {self.label_names}, got {values}')
+            with self._lock:
+                series = self._series.setdefault(values, self._new_series())
+        return series
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def _samples(self) -> Iterator[tuple[str, str, float]]:
+        for values, series in list(self._series.items()):
+            yield self.name, _format_labels(self.label_names, values), series.value
+
+    def render(self) -> Iterator[str]:
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} {self.kind}'
+        for name, labels, value in self._samples():
+            yield f'{name}{labels} {_format_value(value)}'
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def _new_series(self) -> CounterSeries:
+        return CounterSeries()
+
+    def labels(self, *values: str) -> CounterSeries:
+        return super().labels(*values)
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def _new_series(self) -> GaugeSeries:
+        return GaugeSeries()
+
+    def labels(self, *values: str) -> GaugeSeries:
+        return super().labels(*values)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Iterable[float] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self) -> HistogramSeries:
+        return HistogramSeries(self.buckets)
+
+    def labels(self, *values: str) -> HistogramSeries:
+        return super().labels(*values)
+
+    def _samples(self) -> Iterator[tuple[str, str, float]]:
+        label_names = self.label_names + ('le',)
+        for values, series in list(self._series.items()):
+            with series._lock:
+                counts, total = list(series.counts), series.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield (f'{self.name}_bucket', _format_labels(label_names, values + (_format_value(bound),)),
+                       cumulative)
+            yield f'{self.name}_sum', _format_labels(self.label_names, values), total
+            yield f'{self.name}_count', _format_labels(self.label_names, values), cumulative
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f'A metric called {metric.name} already exists')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def __iter__(self) -> Iterator[Metric]:
+        return iter(list(self._metrics.values()))
+
+
+def render(metrics: Iterable[Metric]) -> bytes:
+    """Renders metrics in the Prometheus text exposition format."""
+    return ('\n'.join(line for metric in metrics for line in metric.render()) + '\n').encode()
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.histogram('http_request_duration_seconds', 'Time taken to respond to requests.',
+                                      labels=('method', 'route'))
+REQUESTS = registry.counter('http_requests_total', 'Requests responded to.', labels=('method', 'route', 'status'))
+RESPONSE_SIZE = registry.histogram('http_response_size_bytes', 'Size of response bodies.',
+                                   labels=('method', 'route'), buckets=SIZE_BUCKETS)
+REQUESTS_IN_FLIGHT = registry.gauge('http_requests_in_flight', 'Requests currently being handled.')
+REQUESTS_THROTTLED = registry.counter('http_requests_throttled_total',
+                                     'Requests rejected because their client used up its rate limit (rate) or the '
+                                     'worker was handling too many requests (in_flight).', labels=('kind', 'reason'))
+RESULTS_STAGE_DURATION = registry.histogram('results_stage_duration_seconds',
+                                            'Time spent in each stage of responding with results: store is reading '
+                                            'the model, generate is building missing results, serialize is '
+                                            'encoding them and compress is compressing the encoded results.',
+                                            labels=('stage',))
+TRAINING_DURATION = registry.histogram('training_duration_seconds', 'Time taken to train a model.',
+                                       labels=('status',), buckets=LATENCY_BUCKETS + (30.0, 60.0, 300.0, 900.0))
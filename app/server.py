@@ -0,0 +1,102 @@
+"""Launches the API with uvicorn.
+
+Run with ``python -m app.main`` (or ``scripts/start_api.sh``), optionally with the options below. Every option can also be
+set with an environment variable, and command line options take precedence.
+"""
+import argparse
+import importlib.util
+import logging
+import os
+from collections.abc import MutableMapping, Sequence
+from dataclasses import dataclass
+
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name) or default)
+
+
+@dataclass(frozen=True)
+class ServerConfig:
+    host: str = '0.0.0.0'
+    port: int = 8080
+    workers: int = 1
+    # How many connections may wait to be accepted, and how long idle keep-alive connections are kept open
+    backlog: int = 2048
+    keep_alive: int = 5
+    # How long to wait for open requests to finish after a shutdown signal, before the lifespan drains training jobs
+    graceful_timeout: int = 30
+    log_level: str = 'info'
+
+    @classmethod
+    def from_env(cls) -> 'ServerConfig':
+        """Configure the server using the HOST, PORT, WEB_CONCURRENCY, BACKLOG, KEEP_ALIVE, GRACEFUL_TIMEOUT and
+        LOG_LEVEL environment variables."""
+        return cls(host=os.getenv('HOST') or cls.host,
+                   port=_env_int('PORT', cls.port),
+                   workers=_env_int('WEB_CONCURRENCY', cls.workers),
+                   backlog=_env_int('BACKLOG', cls.backlog),
+                   keep_alive=_env_int('KEEP_ALIVE', cls.keep_alive),
+                   graceful_timeout=_env_int('GRACEFUL_TIMEOUT', cls.graceful_timeout),
+                   log_level=os.getenv('LOG_LEVEL') or cls.log_level)
+
+
+def event_loop() -> str:
+    return 'uvloop' if importlib.util.find_spec('uvloop') is not None else 'asyncio'
+
+
+def http_protocol() -> str:
+    return 'httptools' if importlib.util.find_spec('httptools') is not None else 'h11'
+
+
+def configure_workers(config: ServerConfig, environ: MutableMapping[str, str]) -> None:
+    """Prepares the environment that every worker process reads its configuration from.
+
+    Each worker has its own ModelStore, so several workers must share a backend or each one would only see the models
+    created through it. Each worker also trains models in its own process pool, so the CPUs are split between them.
+    """
+    if config.workers < 1:
+        raise ValueError('There must be at least one worker')
+    if config.workers == 1:
+        return
+    match environ.get('MODEL_STORE_BACKEND', '').lower():
+        case '':
+            environ['MODEL_STORE_BACKEND'] = 'sqlite'
+            logger.info('Using the sqlite model store backend so that it is shared between %d workers',
+                        config.workers)
+        case 'memory':
+            raise ValueError('The memory model store backend cannot be shared between workers, use the sqlite backend '
+                             'or a single worker')
+    environ.setdefault('TRAINING_WORKERS', str(max(1, (os.cpu_count() or 1) // config.workers)))
+
+
+def run(config: ServerConfig) -> None:
+    configure_workers(config, os.environ)
+    # Workers are separate processes, which import the app for themselves
+    uvicorn.run('app.main:app', host=config.host, port=config.port, workers=config.workers, loop=event_loop(),
+                http=http_protocol(), backlog=config.backlog, timeout_keep_alive=config.keep_alive,
+                timeout_graceful_shutdown=config.graceful_timeout, log_level=config.log_level)
+
+
+def parse_args(args: Sequence[str] | None = None) -> ServerConfig:
+    defaults = ServerConfig.from_env()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default=defaults.host)
+    parser.add_argument('--port', type=int, default=defaults.port)
+    parser.add_argument('--workers', type=int, default=defaults.workers,
+                        help='The number of worker processes, more than one requires a shared model store')
+    parser.add_argument('--backlog', type=int, default=defaults.backlog,
+                        help='The number of connections that may wait to be accepted')
+    parser.add_argument('--keep-alive', type=int, default=defaults.keep_alive,
+                        help='Seconds to keep idle connections open')
+    parser.add_argument('--graceful-timeout', type=int, default=defaults.graceful_timeout,
+                        help='Seconds to wait for open requests to finish when shutting down')
+    parser.add_argument('--log-level', default=defaults.log_level)
+    return ServerConfig(**vars(parser.parse_args(args)))
+
+
+def main() -> None:
+    run(parse_args())
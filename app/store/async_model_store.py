@@ -0,0 +1,140 @@
+import asyncio
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import TYPE_CHECKING, ParamSpec, TypeVar
+
+from app.api.resources.model import Model
+from app.api.resources.results import ResultItem
+from app.api.resources.status import Status
+from app.store.backends.base import ListingKey
+from app.store.result_set import ResultSet
+
+if TYPE_CHECKING:
+    from app.store.model_store import ModelStore, VT
+
+logger = logging.getLogger(__name__)
+
+P = ParamSpec('P')
+R = TypeVar('R')
+
+# How often to check for changes made by other processes, which can't notify waiters in this process
+SHARED_POLL_INTERVAL = 1.0
+
+
+@dataclass
+class AsyncModelStore:
+    """An asyncio interface to a ModelStore.
+
+    Reads never wait for writers: they return the latest snapshot of an entry, and writers use per-entry versions to
+    detect and retry conflicting updates instead of holding locks. Calls to backends that block on I/O are run in a
+    thread so they never stall the event loop.
+
+    Other processes sharing the backend can't notify waiters in this one, so while anything is waiting a single task
+    reads the versions of every watched model at once, every ``SHARED_POLL_INTERVAL`` seconds, and publishes those which
+    changed. However many clients are watching, that is one read a second.
+    """
+    store: 'ModelStore'
+    # The version each watched model was at when it was last read, to tell whether another process has changed it
+    _versions: dict[str, int] = field(default_factory=dict, init=False, repr=False)
+    _poller: asyncio.Task | None = field(default=None, init=False, repr=False)
+
+    async def _call(self, function: Callable[P, R], *args: P.args, **kwargs: P.kwargs) -> R:
+        if self.store.backend.blocking:
+            return await asyncio.to_thread(function, *args, **kwargs)
+        return function(*args, **kwargs)
+
+    async def get(self, model_id: str) -> 'VT | None':
+        return await self._call(self.store.get, model_id)
+
+    async def contains(self, model_id: str) -> bool:
+        return await self._call(self.store.__contains__, model_id)
+
+    async def versioned(self, model_id: str) -> 'tuple[VT, int]':
+        return await self._call(self.store.versioned, model_id)
+
+    async def wait_for_change(self, model_id: str, version: int, timeout: float) -> 'tuple[VT, int]':
+        """Waits up to ``timeout`` seconds for a model to move on from ``version``, returning its latest entry.
+
+        The entry is returned as soon as it changes, or when the timeout expires even if it has not changed. Raises a
+        KeyError if the model is deleted.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            # Subscribe before reading the entry, so a change made in between can't be missed
+            changed = self.store.notifier.subscribe(model_id)
+            try:
+                record = await self.versioned(model_id)
+                if record[1] != version or (remaining := deadline - loop.time()) <= 0:
+                    return record
+                if self.store.backend.shared:
+                    self._watch(model_id, version)
+                await asyncio.wait((changed,), timeout=remaining)
+            finally:
+                self.store.notifier.unsubscribe(model_id, changed)
+
+    def _watch(self, model_id: str, version: int) -> None:
+        self._versions[model_id] = version
+        # The poller stops once nothing is waiting, and dies with the event loop it was started on
+        if self._poller is None or self._poller.done() or self._poller.get_loop().is_closed():
+            self._poller = asyncio.create_task(self._poll_for_changes())
+
+    async def _poll_for_changes(self) -> None:
+        while True:
+            await asyncio.sleep(SHARED_POLL_INTERVAL)
+            if not (watched := self.store.notifier.watched()):
+                self._versions.clear()
+                return
+            try:
+                versions = await self._call(self.store.backend.get_versions, watched)
+            except Exception:
+                logger.exception('Checking %d watched models for changes failed', len(watched))
+                continue
+            for model_id in watched:
+                # Models are only compared once their waiter has said which version it has seen, a deleted model has
+                # no version at all
+                if model_id in self._versions and versions.get(model_id) != self._versions[model_id]:
+                    del self._versions[model_id]
+                    self.store.notifier.publish(model_id)
+            for model_id in self._versions.keys() - set(watched):
+                del self._versions[model_id]
+
+    async def put(self, model: Model) -> None:
+        await self._call(self.store.__setitem__, str(model.id), model)
+
+    async def get_many(self, model_ids: list[str]) -> 'dict[str, VT]':
+        return await self._call(self.store.get_many, model_ids)
+
+    async def list_models(self, statuses: list[Status] | None = None, created_after: datetime | None = None,
+                          after: ListingKey | None = None, limit: int = 100) -> list[Model]:
+        return await self._call(self.store.list_models, statuses, created_after, after, limit)
+
+    async def status_counts(self) -> dict[Status, int]:
+        return await self._call(self.store.status_counts)
+
+    async def backend_metrics(self) -> dict[str, int]:
+        return await self._call(self.store.backend.metrics)
+
+    async def put_many(self, models: list[Model]) -> None:
+        await self._call(self.store.put_many, models)
+
+    async def delete_many(self, model_ids: list[str]) -> int:
+        return await self._call(self.store.delete_many, model_ids)
+
+    async def delete(self, model_id: str) -> None:
+        await self._call(self.store.__delitem__, model_id)
+
+    async def set_status(self, model_id: str, status: Status, results: list[ResultItem] | None = None,
+                         errors: list[dict[str, str]] | None = None) -> None:
+        await self._call(self.store.set_status, model_id, status, results, errors)
+
+    async def get_results(self, model_id: str) -> list[ResultItem] | None:
+        return await self._call(self.store.get_results, model_id)
+
+    async def get_result_set(self, model_id: str) -> ResultSet | None:
+        return await self._call(self.store.get_result_set, model_id)
+
+    async def completed_results(self, model_id: str) -> tuple[Model, ResultSet | None, int]:
+        return await self._call(self.store.completed_results, model_id)
@@ -0,0 +1,32 @@
+import os
+
+from app.store.backends.base import Entry, StoreBackend
+from app.store.backends.memory import MemoryBackend
+from app.store.backends.sqlite import SQLiteBackend
+from app.store.retention import RetentionPolicy
+from app.store.snapshots import ResultSnapshots
+
+__all__ = [
+    'Entry',
+    'MemoryBackend',
+    'SQLiteBackend',
+    'StoreBackend',
+    'backend_from_env'
+]
+
+
+def backend_from_env() -> StoreBackend:
+    """Select a backend using the MODEL_STORE_BACKEND (memory or sqlite) and MODEL_STORE_PATH environment variables.
+
+    The memory backend's retention policy is configured by the environment variables read by RetentionPolicy.from_env,
+    and snapshots of completed results by those read by ResultSnapshots.from_env. By default the memory backend keeps
+    its snapshots in a temporary directory, while the sqlite backend keeps them next to the database so that every
+    worker shares them.
+    """
+    match backend := os.getenv('MODEL_STORE_BACKEND', 'memory').lower():
+        case 'memory':
+            return MemoryBackend(retention=RetentionPolicy.from_env(), snapshots=ResultSnapshots.from_env())
+        case 'sqlite':
+            path = os.getenv('MODEL_STORE_PATH', 'model_store.db')
+            return SQLiteBackend(path, snapshots=ResultSnapshots.from_env(f'{path}-snapshots'))
+    raise ValueError(f'Unknown model store backend {backend!r}, expected one of \'memory\' or \'sqlite\'')
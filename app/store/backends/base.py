@@ -0,0 +1,157 @@
+from abc import ABC, abstractmethod
+from collections.abc import Collection, Iterable, Iterator
+from datetime import datetime, timedelta, timezone
+
+from app.api.resources.model import Model
+from app.api.resources.status import Status
+from app.store.result_set import ResultSet
+
+Entry = tuple[Model, ResultSet | None]
+# Listings are ordered by creation time (in microseconds since the epoch) and then by ID
+ListingKey = tuple[int, str]
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def to_microseconds(timestamp: datetime) -> int:
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return (timestamp - _EPOCH) // timedelta(microseconds=1)
+
+
+def from_microseconds(microseconds: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=microseconds)
+
+
+def listing_key(model: Model) -> ListingKey:
+    return to_microseconds(model.created_at), str(model.id)
+
+
+class StoreBackend(ABC):
+    """Storage engine used by a ModelStore.
+
+    Backends only deal with persistence; the rules about which updates are allowed live in the ModelStore.
+
+    Every entry has a version which is incremented each time it is replaced. Writers use ``compare_and_swap`` to make
+    sure that they are updating the version they read, so concurrent writers can never overwrite each other's changes
+    and readers never need to take a lock.
+    """
+    # Whether calls may block on I/O, in which case async callers should run them in a thread
+    blocking: bool = False
+    # Whether other processes can change the entries, in which case changes can't only be detected via notifications
+    shared: bool = False
+
+    @abstractmethod
+    def get(self, model_id: str) -> Entry | None:
+        ...
+
+    @abstractmethod
+    def get_versioned(self, model_id: str) -> tuple[Entry, int] | None:
+        """Return an entry along with its current version."""
+
+    @abstractmethod
+    def compare_and_swap(self, model_id: str, version: int, entry: Entry) -> bool:
+        """Replace an entry only if it is still at the given version. Returns whether the entry was replaced."""
+
+    @abstractmethod
+    def insert(self, model_id: str, entry: Entry) -> None:
+        """Add a new entry, raising a KeyError if the ID is already in use."""
+
+    @abstractmethod
+    def replace(self, model_id: str, entry: Entry) -> None:
+        """Add or overwrite an entry."""
+
+    @abstractmethod
+    def delete(self, model_id: str) -> None:
+        """Remove an entry, raising a KeyError if it does not exist."""
+
+    @abstractmethod
+    def __contains__(self, model_id: object) -> bool:
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    @abstractmethod
+    def __iter__(self) -> Iterator[str]:
+        ...
+
+    def get_many(self, model_ids: Iterable[str]) -> dict[str, Entry]:
+        """Return the entries for all the given IDs that exist."""
+        return {model_id: entry for model_id in model_ids if (entry := self.get(model_id)) is not None}
+
+    def get_versions(self, model_ids: Iterable[str]) -> dict[str, int]:
+        """Return the current version of each of the given IDs that exist, without reading their entries."""
+        return {model_id: record[1] for model_id in model_ids
+                if (record := self.get_versioned(model_id)) is not None}
+
+    def list_models(self, statuses: Collection[Status] | None = None, after: ListingKey | None = None,
+                    limit: int = 100) -> list[Model]:
+        """Return up to ``limit`` models with one of the given statuses, ordered by their listing keys.
+
+        Only models whose listing key is greater than ``after`` are returned, so the key of the last model in one page
+        gives the start of the next. This default scans every entry, backends should use an index instead.
+        """
+        models = [entry[0] for model_id in self if (entry := self.get(model_id)) is not None
+                  and (not statuses or entry[0].status in statuses)
+                  and (after is None or listing_key(entry[0]) > after)]
+        return sorted(models, key=listing_key)[:limit]
+
+    def insert_many(self, entries: Iterable[tuple[str, Entry]]) -> None:
+        """Add several new entries, raising a KeyError if any ID is already in use."""
+        for model_id, entry in entries:
+            self.insert(model_id, entry)
+
+    def delete_many(self, model_ids: Iterable[str]) -> int:
+        """Remove all the given entries that exist and return how many were removed."""
+        deleted = 0
+        for model_id in model_ids:
+            if model_id in self:
+                self.delete(model_id)
+                deleted += 1
+        return deleted
+
+    def status_counts(self) -> dict[Status, int]:
+        """Return the number of models with each status."""
+        counts = dict.fromkeys(Status, 0)
+        for model_id in self:
+            if (entry := self.get(model_id)) is not None:
+                counts[entry[0].status] += 1
+        return counts
+
+    def snapshot_results(self, model_id: str, version: int, results: ResultSet) -> ResultSet:
+        """Called with the results of a completed model when they are read, so that the backend can swap them for a
+        memory-mapped snapshot rather than keep them in memory. Returns the results to use, which by default are the
+        results given."""
+        return results
+
+    def take_token(self, key: str, rate: float, burst: float) -> float:
+        """Take a token from the token bucket ``key``, which holds up to ``burst`` tokens and gains ``rate`` tokens a
+        second. Returns 0 if a token was taken, otherwise how many seconds until there will be one.
+
+        Only backends which are ``shared`` need to keep buckets, so that rate limits hold across every worker using
+        them. Other processes keep their buckets in memory.
+        """
+        raise NotImplementedError(f'{type(self).__name__} does not keep rate limits')
+
+    def claim_key(self, key: str, fingerprint: str, model_id: str, ttl: float) -> tuple[str, str]:
+        """Claim the idempotency key ``key`` for ``ttl`` seconds for a request with the config ``fingerprint`` which
+        created ``model_id``, unless the key is already claimed. Returns the fingerprint and model ID of the claim which
+        holds the key, which are those given if the claim is new.
+
+        Like rate limits, only backends which are ``shared`` need to keep claims, so that a retry which reaches another
+        worker gets the same model. Other processes keep their claims in memory.
+        """
+        raise NotImplementedError(f'{type(self).__name__} does not keep idempotency keys')
+
+    def release_key(self, key: str, model_id: str) -> None:
+        """Forget the claim of an idempotency key, if it is still held by ``model_id``."""
+        raise NotImplementedError(f'{type(self).__name__} does not keep idempotency keys')
+
+    def metrics(self) -> dict[str, int]:
+        """Numbers describing the state of the backend, such as how many models it holds."""
+        return {'models': len(self)}
+
+    def close(self) -> None:
+        """Release any resources held by the backend."""
@@ -0,0 +1,303 @@
+import bisect
+import heapq
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from collections.abc import Collection, Iterable, Iterator
+from dataclasses import dataclass, field
+from itertools import islice
+
+from app.api.resources.model import Model
+from app.api.resources.status import Status
+from app.store.backends.base import Entry, ListingKey, StoreBackend, listing_key
+from app.store.result_set import ResultSet
+from app.store.retention import ResultSpill, RetentionPolicy
+from app.store.snapshots import ResultSnapshots
+
+# Stand in for the results of an entry whose results have been spilled to disk, or snapshotted. They never leave the
+# backend.
+_SPILLED = object()
+_SNAPSHOT = object()
+
+
+def _add_key(index: list[ListingKey], key: ListingKey) -> None:
+    # New models are almost always the newest, so they can usually be appended without shifting any other keys
+    if not index or key > index[-1]:
+        index.append(key)
+    else:
+        bisect.insort(index, key)
+
+
+def _remove_key(index: list[ListingKey], key: ListingKey) -> None:
+    if (position := bisect.bisect_left(index, key)) < len(index) and index[position] == key:
+        del index[position]
+
+
+@dataclass
+class MemoryBackend(StoreBackend):
+    """A process-local backend. Each worker process using it sees its own set of models.
+
+    Entries are immutable ``(entry, version)`` records which are swapped out as a whole, so a reader always sees a
+    consistent snapshot without locking. Only writers take the lock, and only for as long as it takes to swap a record.
+
+    Writers also keep sorted lists of listing keys for every model and for the models with each status, so listings
+    are found with a binary search rather than a scan of every model. Listings take the lock to read a consistent
+    page of keys, which only takes as long as a few binary searches.
+
+    The retention policy is applied whenever the backend is written to, listed or counted. Expired models are hidden
+    from readers straight away, and results that were spilled to disk are read back (under the lock) when next requested.
+
+    With ``snapshots``, the results of completed models are written to a snapshot the first time they are read, and
+    from then on are served from the memory-mapped snapshot rather than held in memory.
+    """
+    retention: RetentionPolicy = field(default_factory=RetentionPolicy)
+    snapshots: ResultSnapshots | None = None
+    _data: dict[str, tuple[Entry, int]] = field(default_factory=dict, init=False)
+    _write_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+    _by_created: list[ListingKey] = field(default_factory=list, init=False, repr=False)
+    _by_status: dict[Status, list[ListingKey]] = field(default_factory=lambda: {status: [] for status in Status},
+                                                       init=False, repr=False)
+    # When each terminal model with a TTL expires, and per status a queue of (deadline, ID) in order of expiry
+    _deadlines: dict[str, float] = field(default_factory=dict, init=False, repr=False)
+    _expiry: dict[Status, deque[tuple[float, str]]] = field(default_factory=lambda: {status: deque()
+                                                                                      for status in Status},
+                                                            init=False, repr=False)
+    # Terminal models, and the size of the results held in memory, from least to most recently used
+    _terminal: OrderedDict[str, None] = field(default_factory=OrderedDict, init=False, repr=False)
+    _resident: OrderedDict[str, int] = field(default_factory=OrderedDict, init=False, repr=False)
+    _resident_bytes: int = field(default=0, init=False, repr=False)
+    _spill: ResultSpill = field(init=False, repr=False)
+    _counters: Counter[str] = field(default_factory=Counter, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._spill = ResultSpill(self.retention.spill_path)
+
+    def _reindex(self, old: Model | None, new: Model | None) -> None:
+        """Update the indexes for a change to an entry. Must be called with the write lock held."""
+        old_key = None if old is None else listing_key(old)
+        new_key = None if new is None else listing_key(new)
+        if old_key != new_key:
+            if old_key is not None:
+                _remove_key(self._by_created, old_key)
+            if new_key is not None:
+                _add_key(self._by_created, new_key)
+        if old_key != new_key or old.status != new.status:
+            if old is not None:
+                _remove_key(self._by_status[old.status], old_key)
+            if new is not None:
+                _add_key(self._by_status[new.status], new_key)
+
+    def _changed(self, model_id: str, old: Entry | None, new: Entry | None) -> None:
+        """Update the indexes and the retention bookkeeping for a change to an entry. Must be called with the write
+        lock held."""
+        self._reindex(None if old is None else old[0], None if new is None else new[0])
+        if old is not None:
+            if (size := self._resident.pop(model_id, None)) is not None:
+                self._resident_bytes -= size
+            self._spill.discard(model_id)
+            if old[1] is _SNAPSHOT and self.snapshots is not None:
+                self.snapshots.discard(model_id)
+            self._terminal.pop(model_id, None)
+            if new is None or not new[0].status.is_terminal:
+                self._deadlines.pop(model_id, None)
+        if new is None:
+            return
+        model, results = new
+        if isinstance(results, ResultSet) and not results.mapped:
+            self._resident[model_id] = results.nbytes
+            self._resident_bytes += results.nbytes
+        if model.status.is_terminal:
+            self._terminal[model_id] = None
+            # A model's time to live starts when it first reaches a terminal status
+            if model_id not in self._deadlines and (ttl := self.retention.ttl(model.status)) is not None:
+                self._deadlines[model_id] = deadline = time.monotonic() + ttl
+                self._expiry[model.status].append((deadline, model_id))
+
+    def _evict(self, model_id: str) -> None:
+        entry, _ = self._data.pop(model_id)
+        self._changed(model_id, entry, None)
+
+    def _enforce(self) -> None:
+        """Apply the retention policy. Must be called with the write lock held."""
+        now = time.monotonic()
+        for queue in self._expiry.values():
+            while queue and queue[0][0] <= now:
+                deadline, model_id = queue.popleft()
+                # Models which have been removed or replaced since they were queued leave stale items behind
+                if self._deadlines.get(model_id) == deadline:
+                    self._evict(model_id)
+                    self._counters['expired'] += 1
+        if (max_models := self.retention.max_models) is not None:
+            while len(self._data) > max_models and self._terminal:
+                self._evict(next(iter(self._terminal)))
+                self._counters['evicted'] += 1
+        if (max_result_bytes := self.retention.max_result_bytes) is not None:
+            while self._resident_bytes > max_result_bytes and self._resident:
+                model_id, size = self._resident.popitem(last=False)
+                self._resident_bytes -= size
+                (model, results), version = self._data[model_id]
+                self._spill.write(model_id, results)
+                # The contents of the entry are unchanged, so its version stays the same
+                self._data[model_id] = ((model, _SPILLED), version)
+                self._counters['spilled'] += 1
+
+    def _expired(self, model_id: str) -> bool:
+        return (deadline := self._deadlines.get(model_id)) is not None and deadline <= time.monotonic()
+
+    def _read(self, model_id: str) -> tuple[Entry, int] | None:
+        if (record := self._data.get(model_id)) is None or self._expired(model_id):
+            return None
+        if record[0][1] is _SPILLED:
+            return self._reload(model_id)
+        # Reading a model makes it the most recently used. Without the lock the model may have just been removed.
+        for recently_used in (self._terminal, self._resident):
+            if model_id in recently_used:
+                try:
+                    recently_used.move_to_end(model_id)
+                except KeyError:
+                    pass
+        if record[0][1] is _SNAPSHOT:
+            (model, _), version = record
+            if (results := self.snapshots.get(model_id, version)) is None:
+                # The model was removed after it was read
+                return None
+            return (model, results), version
+        return record
+
+    def _reload(self, model_id: str) -> tuple[Entry, int] | None:
+        with self._write_lock:
+            if (record := self._data.get(model_id)) is None or record[0][1] is not _SPILLED:
+                # Another reader got here first
+                return record
+            (model, _), version = record
+            record = ((model, self._spill.read(model_id)), version)
+            self._data[model_id] = record
+            self._changed(model_id, (model, _SPILLED), record[0])
+            self._counters['reloaded'] += 1
+            self._enforce()
+        return record
+
+    def snapshot_results(self, model_id: str, version: int, results: ResultSet) -> ResultSet:
+        if self.snapshots is None or results.mapped:
+            return results
+        # The snapshot is written without the lock, and only swapped in if the entry hasn't changed in the meantime
+        mapped = self.snapshots.put(model_id, version, results)
+        with self._write_lock:
+            if (record := self._data.get(model_id)) is None or record[1] != version or record[0][1] is not results:
+                self.snapshots.discard(model_id, version)
+                return results
+            if (size := self._resident.pop(model_id, None)) is not None:
+                self._resident_bytes -= size
+            # The contents of the entry are unchanged, so its version stays the same
+            self._data[model_id] = ((record[0][0], _SNAPSHOT), version)
+            self._counters['snapshotted'] += 1
+        return mapped
+
+    def get(self, model_id: str) -> Entry | None:
+        if (record := self._read(model_id)) is None:
+            return None
+        return record[0]
+
+    def get_versioned(self, model_id: str) -> tuple[Entry, int] | None:
+        return self._read(model_id)
+
+    def compare_and_swap(self, model_id: str, version: int, entry: Entry) -> bool:
+        with self._write_lock:
+            if (record := self._data.get(model_id)) is None or record[1] != version:
+                return False
+            self._data[model_id] = (entry, version + 1)
+            self._changed(model_id, record[0], entry)
+            self._enforce()
+        return True
+
+    def insert(self, model_id: str, entry: Entry) -> None:
+        with self._write_lock:
+            if model_id in self._data:
+                raise KeyError('Duplicate keys are not allowed')
+            self._data[model_id] = (entry, 0)
+            self._changed(model_id, None, entry)
+            self._enforce()
+
+    def replace(self, model_id: str, entry: Entry) -> None:
+        with self._write_lock:
+            version = record[1] + 1 if (record := self._data.get(model_id)) is not None else 0
+            self._data[model_id] = (entry, version)
+            self._changed(model_id, None if record is None else record[0], entry)
+            self._enforce()
+
+    def delete(self, model_id: str) -> None:
+        with self._write_lock:
+            self._evict(model_id)
+
+    def insert_many(self, entries: Iterable[tuple[str, Entry]]) -> None:
+        entries = list(entries)
+        records = {model_id: (entry, 0) for model_id, entry in entries}
+        with self._write_lock:
+            if len(records) != len(entries) or not records.keys().isdisjoint(self._data):
+                raise KeyError('Duplicate keys are not allowed')
+            self._data.update(records)
+            for model_id, (entry, _) in records.items():
+                self._changed(model_id, None, entry)
+            self._enforce()
+
+    def delete_many(self, model_ids: Iterable[str]) -> int:
+        deleted = 0
+        with self._write_lock:
+            for model_id in model_ids:
+                if model_id in self._data:
+                    self._evict(model_id)
+                    deleted += 1
+        return deleted
+
+    def list_models(self, statuses: Collection[Status] | None = None, after: ListingKey | None = None,
+                    limit: int = 100) -> list[Model]:
+        with self._write_lock:
+            self._enforce()
+            indexes = [self._by_created] if not statuses else [self._by_status[status] for status in set(statuses)]
+            pages = []
+            for index in indexes:
+                start = 0 if after is None else bisect.bisect_right(index, after)
+                pages.append(index[start:start + limit])
+            # Each page is sorted, so merging them gives the first keys across all the statuses
+            return [self._data[model_id][0][0] for _, model_id in islice(heapq.merge(*pages), limit)]
+
+    def _enforce_now(self) -> None:
+        # Counts and listings remove expired models first, so they agree with lookups, which already hide them
+        with self._write_lock:
+            self._enforce()
+
+    def status_counts(self) -> dict[Status, int]:
+        self._enforce_now()
+        return {status: len(index) for status, index in self._by_status.items()}
+
+    def metrics(self) -> dict[str, int]:
+        self._enforce_now()
+        return {
+            'models': len(self._data),
+            'resident_result_bytes': self._resident_bytes,
+            'spilled_results': len(self._spill),
+            'spilled_result_bytes': self._spill.nbytes,
+            'expired_total': self._counters['expired'],
+            'evicted_total': self._counters['evicted'],
+            'spilled_total': self._counters['spilled'],
+            'reloaded_total': self._counters['reloaded'],
+            'snapshotted_total': self._counters['snapshotted'],
+            'mapped_snapshots': 0 if self.snapshots is None else len(self.snapshots)
+        }
+
+    def __contains__(self, model_id: object) -> bool:
+        return model_id in self._data and not self._expired(model_id)
+
+    def __len__(self) -> int:
+        self._enforce_now()
+        return len(self._data)
+
+    def __iter__(self) -> Iterator[str]:
+        self._enforce_now()
+        # Iterate over a copy so that other threads can add models while the caller is iterating
+        return iter(list(self._data))
+
+    def close(self) -> None:
+        self._spill.close()
+        if self.snapshots is not None:
+            self.snapshots.close()
@@ -0,0 +1,337 @@
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Collection, Iterable, Iterator
+from dataclasses import dataclass, field
+from itertools import islice
+
+from app.api.resources.model import Model
+from app.api.resources.status import Status
+from app.store.backends.base import (Entry, ListingKey, StoreBackend, from_microseconds, listing_key,
+                                     to_microseconds)
+from app.store.result_set import ResultSet
+from app.store.snapshots import ResultSnapshots
+
+# The statements are constant strings so that sqlite3's per-connection statement cache only ever prepares them once.
+_CREATE_TABLE = '''
+    CREATE TABLE IF NOT EXISTS models (
+        id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        errors TEXT,
+        created_at INTEGER NOT NULL,
+        results BLOB,
+        version INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+'''
+# Listings walk these indexes in order from the cursor, so a page costs the same however many models there are
+_CREATE_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS models_by_created ON models (created_at, id)',
+    'CREATE INDEX IF NOT EXISTS models_by_status ON models (status, created_at, id)'
+)
+# Token buckets for rate limits. Rows are removed once their bucket would be full again, as a missing bucket is full.
+_CREATE_RATE_LIMITS = '''
+    CREATE TABLE IF NOT EXISTS rate_limits (
+        key TEXT PRIMARY KEY,
+        tokens REAL NOT NULL,
+        updated REAL NOT NULL,
+        full_at REAL NOT NULL,
+        taken INTEGER NOT NULL
+    ) WITHOUT ROWID
+'''
+# The tokens in a bucket once it has been refilled for the time since it was last updated. Clocks may differ a little
+# between workers, so time never runs backwards.
+_REFILLED = 'MIN(:burst, tokens + MAX(0, :now - updated) * :rate)'
+# Refills a bucket and takes a token if there is one, in a single statement so that workers can't both take the last
+# token. A new bucket starts full, so has a token to take.
+_TAKE_TOKEN = f'''
+    INSERT INTO rate_limits (key, tokens, updated, full_at, taken) VALUES (:key, :burst - 1, :now, :now + 1 / :rate, 1)
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = {_REFILLED} - ({_REFILLED} >= 1),
+        taken = {_REFILLED} >= 1,
+        full_at = MAX(updated, :now) + (:burst - {_REFILLED} + ({_REFILLED} >= 1)) / :rate,
+        updated = MAX(updated, :now)
+    RETURNING tokens, taken
+'''
+_DELETE_FULL_BUCKETS = 'DELETE FROM rate_limits WHERE full_at <= ?'
+# Idempotency keys claimed by requests to create a model, with the model each one created. Expired claims are ignored,
+# and removed from time to time.
+_CREATE_IDEMPOTENCY_KEYS = '''
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        key TEXT PRIMARY KEY,
+        fingerprint TEXT NOT NULL,
+        model_id TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    ) WITHOUT ROWID
+'''
+# Claims a key unless an unexpired claim already holds it, in which case nothing is returned, in a single statement so
+# that workers can't both claim the same key
+_CLAIM_KEY = '''
+    INSERT INTO idempotency_keys (key, fingerprint, model_id, expires_at)
+    VALUES (:key, :fingerprint, :model_id, :now + :ttl)
+    ON CONFLICT (key) DO UPDATE SET
+        fingerprint = excluded.fingerprint,
+        model_id = excluded.model_id,
+        expires_at = excluded.expires_at
+    WHERE expires_at <= :now
+    RETURNING fingerprint, model_id
+'''
+_SELECT_KEY = 'SELECT fingerprint, model_id FROM idempotency_keys WHERE key = ?'
+_RELEASE_KEY = 'DELETE FROM idempotency_keys WHERE key = ? AND model_id = ?'
+_DELETE_EXPIRED_KEYS = 'DELETE FROM idempotency_keys WHERE expires_at <= ?'
+# Full buckets and expired keys are removed after every this many tokens taken, or keys claimed, through a backend
+_PRUNE_INTERVAL = 1024
+_SELECT = 'SELECT status, errors, created_at, results, version FROM models WHERE id = ?'
+# Leaves out the results if the entry is still at the given version, whose results have been snapshotted
+_SELECT_UNLESS_SNAPSHOTTED = ('SELECT status, errors, created_at, CASE WHEN version = ? THEN NULL ELSE results END, '
+                              'version FROM models WHERE id = ?')
+_SELECT_IDS = 'SELECT id FROM models'
+# SQLite limits the number of parameters in a statement, so large lookups are split into chunks of this many IDs
+_CHUNK_SIZE = 500
+_SELECT_MANY = (f'SELECT id, status, errors, created_at, results, version FROM models '
+                f'WHERE id IN ({", ".join("?" * _CHUNK_SIZE)})')
+_SELECT_VERSIONS = f'SELECT id, version FROM models WHERE id IN ({", ".join("?" * _CHUNK_SIZE)})'
+_LIST = '''
+    SELECT id, status, errors, created_at FROM models WHERE (created_at, id) > (?, ?) ORDER BY created_at, id LIMIT ?
+'''
+_LIST_BY_STATUS = '''
+    SELECT id, status, errors, created_at FROM models WHERE status = ? AND (created_at, id) > (?, ?)
+    ORDER BY created_at, id LIMIT ?
+'''
+_STATUS_COUNTS = 'SELECT status, COUNT(*) FROM models GROUP BY status'
+_EXISTS = 'SELECT 1 FROM models WHERE id = ?'
+_COUNT = 'SELECT COUNT(*) FROM models'
+_INSERT = 'INSERT INTO models (id, status, errors, created_at, results) VALUES (?, ?, ?, ?, ?)'
+_REPLACE = '''
+    INSERT INTO models (id, status, errors, created_at, results) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (id) DO UPDATE SET
+        status = excluded.status, errors = excluded.errors, created_at = excluded.created_at,
+        results = excluded.results, version = version + 1
+'''
+_COMPARE_AND_SWAP = '''
+    UPDATE models SET status = ?, errors = ?, created_at = ?, results = ?, version = version + 1
+    WHERE id = ? AND version = ?
+'''
+_DELETE = 'DELETE FROM models WHERE id = ?'
+# A listing key that sorts before that of every model
+_FIRST_KEY = (-2 ** 63, '')
+
+
+def _to_row(model_id: str, entry: Entry) -> tuple[str, str, str | None, int, bytes | None]:
+    model, results = entry
+    errors = json.dumps(model.errors) if model.errors else None
+    encoded_results = None if results is None else results.to_bytes()
+    return model_id, model.status.value, errors, to_microseconds(model.created_at), encoded_results
+
+
+def _model_from_row(model_id: str, status: str, errors: str | None, created_at: int) -> Model:
+    return Model(id=uuid.UUID(model_id), status=Status(status), errors=json.loads(errors) if errors else [],
+                 created_at=from_microseconds(created_at))
+
+
+def _from_row(model_id: str, row: tuple[str, str | None, int, bytes | None, int]) -> Entry:
+    status, errors, created_at, results, _ = row
+    model = _model_from_row(model_id, status, errors, created_at)
+    if results is None:
+        return model, None
+    return model, ResultSet.from_bytes(results)
+
+
+@dataclass
+class SQLiteBackend(StoreBackend):
+    """A backend that keeps models in a SQLite database running in WAL mode.
+
+    Several worker processes can open the same file: WAL lets readers proceed while another process writes, so every
+    worker sees the same set of models. Connections are not shared between threads or processes, each one lazily opens
+    its own on first use.
+
+    With ``snapshots``, the results of completed models are written to a snapshot the first time they are read, and
+    from then on are served from the memory-mapped snapshot rather than read from the database. Workers that share a
+    snapshot directory write each snapshot once, and share the mapped pages.
+    """
+    path: str
+    blocking = True
+    shared = True
+    timeout: float = 30.0
+    snapshots: ResultSnapshots | None = None
+    _local: threading.local = field(default_factory=threading.local, init=False, repr=False)
+    _tokens_taken: int = field(default=0, init=False, repr=False)
+    _keys_claimed: int = field(default=0, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        # Create the schema eagerly so that any problem with the path is reported when the store is created
+        self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        local = self._local
+        # A connection must never be used by a forked child, so connections are also keyed on the PID
+        if getattr(local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                         check_same_thread=True, cached_statements=32)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(_CREATE_TABLE)
+            connection.execute(_CREATE_RATE_LIMITS)
+            connection.execute(_CREATE_IDEMPOTENCY_KEYS)
+            for statement in _CREATE_INDEXES:
+                connection.execute(statement)
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    def get(self, model_id: str) -> Entry | None:
+        return None if (record := self.get_versioned(model_id)) is None else record[0]
+
+    def get_versioned(self, model_id: str) -> tuple[Entry, int] | None:
+        if not isinstance(model_id, str):
+            return None
+        connection = self._connection()
+        if self.snapshots is not None and (version := self.snapshots.version(model_id)) is not None:
+            row = connection.execute(_SELECT_UNLESS_SNAPSHOTTED, (version, model_id)).fetchone()
+            if row is not None and row[4] == version:
+                model, _ = _from_row(model_id, row)
+                if (results := self.snapshots.get(model_id, version)) is not None:
+                    return (model, results), version
+            # The entry has changed since it was snapshotted, so the snapshot is stale
+            self.snapshots.discard(model_id, version)
+        row = connection.execute(_SELECT, (model_id,)).fetchone()
+        return None if row is None else (_from_row(model_id, row), row[4])
+
+    def snapshot_results(self, model_id: str, version: int, results: ResultSet) -> ResultSet:
+        if self.snapshots is None or results.mapped:
+            return results
+        # Another worker may already have written the snapshot
+        if (mapped := self.snapshots.get(model_id, version)) is not None:
+            return mapped
+        return self.snapshots.put(model_id, version, results)
+
+    def compare_and_swap(self, model_id: str, version: int, entry: Entry) -> bool:
+        _, status, errors, created_at, results = _to_row(model_id, entry)
+        parameters = (status, errors, created_at, results, model_id, version)
+        return self._connection().execute(_COMPARE_AND_SWAP, parameters).rowcount == 1
+
+    def insert(self, model_id: str, entry: Entry) -> None:
+        try:
+            self._connection().execute(_INSERT, _to_row(model_id, entry))
+        except sqlite3.IntegrityError as exc:
+            raise KeyError('Duplicate keys are not allowed') from exc
+
+    def replace(self, model_id: str, entry: Entry) -> None:
+        self._connection().execute(_REPLACE, _to_row(model_id, entry))
+        self._discard_snapshots([model_id])
+
+    def delete(self, model_id: str) -> None:
+        if self._connection().execute(_DELETE, (model_id,)).rowcount == 0:
+            raise KeyError(model_id)
+        self._discard_snapshots([model_id])
+
+    def _discard_snapshots(self, model_ids: Iterable[str]) -> None:
+        if self.snapshots is not None:
+            for model_id in model_ids:
+                self.snapshots.discard(model_id)
+
+    def get_many(self, model_ids: Iterable[str]) -> dict[str, Entry]:
+        connection = self._connection()
+        model_ids = list(dict.fromkeys(model_ids))
+        entries = {}
+        for start in range(0, len(model_ids), _CHUNK_SIZE):
+            chunk = model_ids[start:start + _CHUNK_SIZE]
+            # Pad the chunk so that the same prepared statement is always used, NULL never matches an ID
+            for model_id, *row in connection.execute(_SELECT_MANY, chunk + [None] * (_CHUNK_SIZE - len(chunk))):
+                entries[model_id] = _from_row(model_id, row)
+        return entries
+
+    def get_versions(self, model_ids: Iterable[str]) -> dict[str, int]:
+        connection = self._connection()
+        model_ids = list(dict.fromkeys(model_ids))
+        versions = {}
+        for start in range(0, len(model_ids), _CHUNK_SIZE):
+            chunk = model_ids[start:start + _CHUNK_SIZE]
+            versions.update(connection.execute(_SELECT_VERSIONS, chunk + [None] * (_CHUNK_SIZE - len(chunk))))
+        return versions
+
+    def list_models(self, statuses: Collection[Status] | None = None, after: ListingKey | None = None,
+                    limit: int = 100) -> list[Model]:
+        connection = self._connection()
+        created_at, model_id = _FIRST_KEY if after is None else after
+        if not statuses:
+            return [_model_from_row(*row) for row in connection.execute(_LIST, (created_at, model_id, limit))]
+        # One indexed range per status is cheaper than an IN clause, which would have to sort every matching model
+        pages = []
+        for status in set(statuses):
+            rows = connection.execute(_LIST_BY_STATUS, (status.value, created_at, model_id, limit))
+            pages.append([_model_from_row(*row) for row in rows])
+        return list(islice(heapq.merge(*pages, key=listing_key), limit))
+
+    def status_counts(self) -> dict[Status, int]:
+        counts = dict.fromkeys(Status, 0)
+        for status, count in self._connection().execute(_STATUS_COUNTS):
+            counts[Status(status)] = count
+        return counts
+
+    def insert_many(self, entries: Iterable[tuple[str, Entry]]) -> None:
+        connection = self._connection()
+        rows = [_to_row(model_id, entry) for model_id, entry in entries]
+        try:
+            # A single transaction means one fsync of the WAL for the whole batch, and no partial batches on failure
+            with connection:
+                connection.execute('BEGIN IMMEDIATE')
+                connection.executemany(_INSERT, rows)
+        except sqlite3.IntegrityError as exc:
+            raise KeyError('Duplicate keys are not allowed') from exc
+
+    def delete_many(self, model_ids: Iterable[str]) -> int:
+        connection = self._connection()
+        model_ids = list(model_ids)
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            deleted = connection.executemany(_DELETE, ((model_id,) for model_id in model_ids)).rowcount
+        self._discard_snapshots(model_ids)
+        return deleted
+
+    def take_token(self, key: str, rate: float, burst: float) -> float:
+        connection = self._connection()
+        now = time.time()
+        tokens, taken = connection.execute(_TAKE_TOKEN, {'key': key, 'rate': rate, 'burst': burst,
+                                                         'now': now}).fetchone()
+        self._tokens_taken += 1
+        if self._tokens_taken % _PRUNE_INTERVAL == 0:
+            connection.execute(_DELETE_FULL_BUCKETS, (now,))
+        return 0.0 if taken else (1 - tokens) / rate
+
+    def claim_key(self, key: str, fingerprint: str, model_id: str, ttl: float) -> tuple[str, str]:
+        connection = self._connection()
+        now = time.time()
+        parameters = {'key': key, 'fingerprint': fingerprint, 'model_id': model_id, 'now': now, 'ttl': ttl}
+        while (claim := connection.execute(_CLAIM_KEY, parameters).fetchone()) is None:
+            # The key is held by another claim, unless that claim was released since
+            if (claim := connection.execute(_SELECT_KEY, (key,)).fetchone()) is not None:
+                break
+        self._keys_claimed += 1
+        if self._keys_claimed % _PRUNE_INTERVAL == 0:
+            connection.execute(_DELETE_EXPIRED_KEYS, (now,))
+        return claim
+
+    def release_key(self, key: str, model_id: str) -> None:
+        self._connection().execute(_RELEASE_KEY, (key, model_id))
+
+    def __contains__(self, model_id: object) -> bool:
+        if not isinstance(model_id, str):
+            return False
+        return self._connection().execute(_EXISTS, (model_id,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self._connection().execute(_COUNT).fetchone()[0]
+
+    def __iter__(self) -> Iterator[str]:
+        # Materialise the IDs so that callers can modify the store while iterating over it
+        return iter([row[0] for row in self._connection().execute(_SELECT_IDS)])
+
+    def close(self) -> None:
+        if self.snapshots is not None:
+            self.snapshots.close()
+        if (connection := getattr(self._local, 'connection', None)) is not None:
+            connection.close()
+            del self._local.connection, self._local.pid
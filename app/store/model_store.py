@@ -1,15 +1,28 @@
 import random
 import string
-from collections.abc import MutableMapping, Iterator
-from dataclasses import dataclass, field
-from typing import Any, TypeVar
+import time
+from collections.abc import Collection, Iterable, MutableMapping, Iterator
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, TypeVar
 
 from app.api.resources.model import Model
 from app.api.resources.results import ResultItem
 from app.api.resources.status import Status
+from app.metrics import RESULTS_STAGE_DURATION
+from app.store.backends import StoreBackend, backend_from_env
+from app.store.backends.base import ListingKey, to_microseconds
+from app.store.notifier import StatusNotifier
+from app.store.result_set import ResultSet
+
+if TYPE_CHECKING:
+    from app.store.async_model_store import AsyncModelStore
 
 KT = TypeVar('KT', bound=str)
-VT = TypeVar('VT', bound=tuple[Model, list[ResultItem] | None])
+VT = TypeVar('VT', bound=tuple[Model, ResultSet | None])
+
+_GENERATE_STAGE = RESULTS_STAGE_DURATION.labels('generate')
 
 
 def _make_results() -> list[ResultItem]:
@@ -25,49 +38,129 @@ def _make_results() -> list[ResultItem]:
 
 @dataclass
 class ModelStore(MutableMapping[KT, VT]):
-    _data: dict[KT, VT] = field(default_factory=dict, init=False)
+    backend: StoreBackend = field(default_factory=backend_from_env)
+    # Status changes and deletions made through this store are published here, to wake up clients watching a model
+    notifier: StatusNotifier = field(default_factory=StatusNotifier)
 
-    def set_status(self, model_id: KT, status: Status) -> None:
-        if model_id not in self:
+    @cached_property
+    def aio(self) -> 'AsyncModelStore':
+        """An asyncio view of this store for use from async request handlers."""
+        from app.store.async_model_store import AsyncModelStore
+        return AsyncModelStore(self)
+
+    def versioned(self, model_id: KT) -> tuple[VT, int]:
+        """Returns a model and its results along with the version of the entry, which changes on every update."""
+        if (record := self.backend.get_versioned(model_id)) is None:
             raise KeyError(f'No model with id {model_id!r} exists')
-        if (model := self[model_id][0]).status in (Status.FAILED, Status.COMPLETED):
-            raise ValueError('A model that has failed or completed cannot have its status changed')
-        model.status = status
+        return record
+
+    def set_status(self, model_id: KT, status: Status, results: Iterable[ResultItem] | None = None,
+                   errors: list[dict[str, str]] | None = None) -> None:
+        """Update the status of a model, optionally storing its results or errors as part of the same update."""
+        if results is not None and not isinstance(results, ResultSet):
+            results = ResultSet.from_items(results)
+        # Models are never changed in place: a new copy is swapped in only if nobody else updated the entry since it
+        # was read, otherwise the status check is repeated against the newer entry.
+        while True:
+            (model, current_results), version = self.versioned(model_id)
+            if model.status.is_terminal:
+                raise ValueError('A model that has failed or completed cannot have its status changed')
+            model = replace(model, status=status) if errors is None else replace(model, status=status, errors=errors)
+            entry = (model, current_results if results is None else results)
+            if self.backend.compare_and_swap(model_id, version, entry):
+                self.notifier.publish(model_id)
+                return
+
+    def completed_results(self, model_id: KT) -> tuple[Model, ResultSet | None, int]:
+        """Returns a model, its results if it has completed (or None if not) and the version of its entry."""
+        while True:
+            (model, results), version = self.versioned(model_id)
+            if model.status != Status.COMPLETED:
+                return model, results, version
+            if results is not None:
+                # Completed results never change, so the backend may serve them from a snapshot from now on
+                return model, self.backend.snapshot_results(model_id, version, results), version
+            # If another caller stored results first, the swap fails and their results are returned instead
+            start = time.perf_counter()
+            results = ResultSet.from_items(_make_results())
+            _GENERATE_STAGE.observe(time.perf_counter() - start)
+            if self.backend.compare_and_swap(model_id, version, (model, results)):
+                return model, self.backend.snapshot_results(model_id, version + 1, results), version + 1
+
+    def get_result_set(self, model_id: KT) -> ResultSet | None:
+        """Returns the results of a completed model in their compact form, or None if the model has not completed."""
+        return self.completed_results(model_id)[1]
 
     def get_results(self, model_id: KT) -> list[ResultItem] | None:
-        if self[model_id][0].status != Status.COMPLETED:
+        """Returns the results of a completed model as a list of every cluster, or None if the model has not completed.
+
+        This builds every cluster at once, use ``get_result_set`` to access large results a piece at a time.
+        """
+        if (results := self.get_result_set(model_id)) is None:
             return None
-        if not (results := self[model_id][1]):
-            results = _make_results()
-            self[model_id] = (self[model_id][0], results)
-        return results
+        return list(results)
 
     def get(self, model_id: KT) -> VT | None:
-        if model_id in self:
-            return self[model_id]
-        return None
+        return self.backend.get(model_id)
+
+    def get_many(self, model_ids: Iterable[KT]) -> dict[KT, VT]:
+        """Returns the models and results for all the given IDs that exist, in a single lookup."""
+        return self.backend.get_many(model_ids)
+
+    def list_models(self, statuses: Collection[Status] | None = None, created_after: datetime | None = None,
+                    after: ListingKey | None = None, limit: int = 100) -> list[Model]:
+        """Returns up to ``limit`` models, oldest first, optionally only those with the given statuses.
+
+        Only models created after ``created_after`` and whose listing key is after ``after`` (the key of the last model
+        in the previous page) are returned. The backend's indexes are used, so this never scans the whole store.
+        """
+        if created_after is not None:
+            # No model ID sorts after '~', so this key is after every model created at that time
+            created_key = (to_microseconds(created_after), '~')
+            after = created_key if after is None else max(after, created_key)
+        return self.backend.list_models(statuses, after, limit)
+
+    def status_counts(self) -> dict[Status, int]:
+        """Returns the number of models with each status."""
+        return self.backend.status_counts()
+
+    def put_many(self, models: Iterable[Model]) -> None:
+        """Add several new models in a single batch. Either all the models are added, or none of them are."""
+        self.backend.insert_many((str(model.id), (model, None)) for model in models)
+
+    def delete_many(self, model_ids: Iterable[KT]) -> int:
+        """Delete all the given models that exist, returning the number of models deleted."""
+        model_ids = list(model_ids)
+        deleted = self.backend.delete_many(model_ids)
+        for model_id in model_ids:
+            self.notifier.publish(model_id)
+        return deleted
 
     def __setitem__(self, model_id: KT, value: VT) -> None:
         if isinstance(value, tuple):
-            self._data[model_id] = value
+            model, results = value
+            if results is not None and not isinstance(results, ResultSet):
+                results = ResultSet.from_items(results)
+            self.backend.replace(model_id, (model, results))
             return
-        if model_id in self:
-            raise KeyError(f'Duplicate keys are not allowed')
-        elif model_id != str(value.id):
+        if model_id != str(value.id):
             raise ValueError('The \'model_id\' must match the ID of the model.')
-        self._data[model_id] = (value, None)
+        self.backend.insert(model_id, (value, None))
 
     def __delitem__(self, model_id: KT) -> None:
-        del self._data[model_id]
+        self.backend.delete(model_id)
+        self.notifier.publish(model_id)
 
     def __getitem__(self, model_id: KT) -> VT:
-        return self._data[model_id]
+        if (entry := self.backend.get(model_id)) is None:
+            raise KeyError(model_id)
+        return entry
 
     def __len__(self) -> int:
-        return len(self._data)
+        return len(self.backend)
 
     def __contains__(self, item: Any) -> bool:
-        return item in self._data
+        return item in self.backend
 
     def __iter__(self) -> Iterator[KT]:
-        return iter(self._data)
+        return iter(self.backend)
@@ -0,0 +1,55 @@
+import asyncio
+import threading
+from dataclasses import dataclass, field
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+@dataclass
+class StatusNotifier:
+    """Wakes up coroutines waiting for a model to change.
+
+    Waiting coroutines hold nothing but a future, so any number of them can wait without using CPU until the model they
+    are waiting on changes. Changes may be published from any thread.
+    """
+    _waiters: dict[str, set[tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = field(default_factory=dict,
+                                                                                       init=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def subscribe(self, model_id: str) -> asyncio.Future:
+        """Returns a future which completes the next time the model changes."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            self._waiters.setdefault(model_id, set()).add((loop, future))
+        return future
+
+    def unsubscribe(self, model_id: str, future: asyncio.Future) -> None:
+        with self._lock:
+            if (waiters := self._waiters.get(model_id)) is not None:
+                waiters.discard((future.get_loop(), future))
+                if not waiters:
+                    del self._waiters[model_id]
+
+    def publish(self, model_id: str) -> None:
+        """Wake up everything waiting on the model."""
+        with self._lock:
+            waiters = self._waiters.pop(model_id, ())
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                # The waiter's event loop has been closed, so there is nothing left to wake up
+                pass
+
+    def watched(self) -> list[str]:
+        """The models which currently have waiters."""
+        with self._lock:
+            return list(self._waiters)
+
+    def waiting(self, model_id: str) -> int:
+        """The number of waiters currently subscribed to a model."""
+        return len(self._waiters.get(model_id, ()))
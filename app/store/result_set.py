@@ -0,0 +1,238 @@
+import mmap
+import re
+import struct
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+from typing import Any, BinaryIO, overload
+
+from app.api.resources.results import ResultItem
+
+# A column is either an array built in memory, or a view of a serialised result set (possibly memory-mapped)
+Column = array | memoryview
+
+_PREFIX = struct.Struct('<4sH')
+# Header: magic, version, number of clusters, number of member references, number of distinct strings, from version 2
+# the length of the training checkpoint, and from version 3 flags (after the version) describing the strings
+_HEADERS = {1: struct.Struct('<4sHQQQ'), 2: struct.Struct('<4sHQQQQ'), 3: struct.Struct('<4sHHQQQQ')}
+_MAGIC = b'RSET'
+_VERSION = 3
+# From version 3 each column starts on an 8 byte boundary, so that a mapped file can be viewed as arrays in place
+_ALIGNMENT = 8
+# Set when no string contains a character that must be escaped in JSON, so strings can be copied into JSON as is
+_PLAIN_STRINGS = 1
+_NEEDS_ESCAPING = re.compile(rb'["\\\x00-\x1f]')
+_COLUMNS = (('labels', 'q'), ('occurrences', 'q'), ('member_offsets', 'Q'), ('member_refs', 'I'),
+            ('string_offsets', 'Q'))
+
+
+def _padding(length: int) -> int:
+    return -length % _ALIGNMENT
+
+
+class ResultSet(Sequence[ResultItem]):
+    """The results of a model, stored column-wise.
+
+    Rather than one ResultItem (and one list of strings) per cluster, the labels and occurrences of every cluster are
+    stored in flat arrays, and every distinct member string is stored once in a single buffer. Each cluster's members
+    are a range of indexes into that buffer, so a cluster or a page of its members can be read without building the
+    other clusters. ResultItems are only created when they are accessed.
+
+    The columns can also be views of a serialised result set, such as a file mapped with ``map``. The result set then
+    holds no copy of the data, and reading a cluster only touches the pages of the file that it is stored in.
+
+    Results built by training also carry an opaque checkpoint, which lets the model be refreshed from where it left off
+    rather than rebuilt. It is never part of the API's responses.
+    """
+    __slots__ = ('labels', 'occurrences', 'member_offsets', 'member_refs', 'string_offsets', 'strings',
+                 'checkpoint', 'plain_strings', 'total_data_points', '_source')
+
+    def __init__(self, labels: Column, occurrences: Column, member_offsets: Column, member_refs: Column,
+                 string_offsets: Column, strings: bytes | memoryview, checkpoint: bytes | None = None,
+                 plain_strings: bool | None = None, source: Any = None) -> None:
+        self.labels = labels
+        self.occurrences = occurrences
+        # Cluster i's members are member_refs[member_offsets[i]:member_offsets[i + 1]]
+        self.member_offsets = member_offsets
+        self.member_refs = member_refs
+        # String j is strings[string_offsets[j]:string_offsets[j + 1]]
+        self.string_offsets = string_offsets
+        self.strings = strings
+        self.checkpoint = checkpoint
+        # Whether every string can be written into JSON without escaping it
+        self.plain_strings = _NEEDS_ESCAPING.search(strings) is None if plain_strings is None else plain_strings
+        self.total_data_points = sum(occurrences)
+        # The buffer that the columns are views of, if they are
+        self._source = source
+
+    @classmethod
+    def from_items(cls, items: Iterable[ResultItem], checkpoint: bytes | None = None) -> 'ResultSet':
+        labels, occurrences = array('q'), array('q')
+        member_offsets, member_refs = array('Q', [0]), array('I')
+        string_offsets, strings = array('Q', [0]), bytearray()
+        interned: dict[str, int] = {}
+        for item in items:
+            labels.append(item.cluster)
+            occurrences.append(item.occurrences)
+            for member in item.members:
+                if (ref := interned.get(member)) is None:
+                    ref = interned[member] = len(interned)
+                    strings += member.encode()
+                    string_offsets.append(len(strings))
+                member_refs.append(ref)
+            member_offsets.append(len(member_refs))
+        return cls(labels, occurrences, member_offsets, member_refs, string_offsets, bytes(strings), checkpoint)
+
+    @property
+    def cluster_count(self) -> int:
+        return len(self.labels)
+
+    @property
+    def mapped(self) -> bool:
+        """Whether the columns are views of a memory-mapped file, rather than held in memory."""
+        return isinstance(self._source, mmap.mmap)
+
+    @property
+    def nbytes(self) -> int:
+        """An estimate of the memory used by the result set's buffers. The pages of a mapped file belong to the OS page
+        cache, so they are not included."""
+        if self.mapped:
+            return 0
+        buffers = (self.labels, self.occurrences, self.member_offsets, self.member_refs, self.string_offsets)
+        return (sum(buffer.itemsize * len(buffer) for buffer in buffers) + len(self.strings)
+                + len(self.checkpoint or b''))
+
+    def _string(self, ref: int) -> str:
+        return str(self.strings[self.string_offsets[ref]:self.string_offsets[ref + 1]], 'utf-8')
+
+    def member_count(self, index: int) -> int:
+        return self.member_offsets[index + 1] - self.member_offsets[index]
+
+    def _member_range(self, index: int, start: int, stop: int | None) -> Column:
+        first, last = self.member_offsets[index], self.member_offsets[index + 1]
+        stop = last if stop is None else min(first + stop, last)
+        return self.member_refs[first + start:stop]
+
+    def members(self, index: int, start: int = 0, stop: int | None = None) -> list[str]:
+        """Returns the members of the cluster at ``index``, optionally only those in the range [start, stop)."""
+        return [self._string(ref) for ref in self._member_range(index, start, stop)]
+
+    def member_bytes(self, index: int, start: int = 0, stop: int | None = None) -> list[bytes | memoryview]:
+        """Like ``members``, but returns the UTF-8 encoded members as slices of the string buffer, without decoding
+        them."""
+        strings, offsets = self.strings, self.string_offsets
+        return [strings[offsets[ref]:offsets[ref + 1]] for ref in self._member_range(index, start, stop)]
+
+    def index_of(self, label: int) -> int | None:
+        """Returns the index of the cluster with the given label, or None if there isn't one."""
+        labels = self.labels
+        # Clusters are usually labelled with their index
+        if 0 <= label < len(labels) and labels[label] == label:
+            return label
+        for index, other in enumerate(labels):
+            if other == label:
+                return index
+        return None
+
+    def item(self, index: int, start: int = 0, stop: int | None = None) -> ResultItem:
+        """Builds the ResultItem for a single cluster, optionally with only a range of its members."""
+        return ResultItem(cluster=self.labels[index], occurrences=self.occurrences[index],
+                          members=self.members(index, start, stop))
+
+    @overload
+    def __getitem__(self, index: int) -> ResultItem: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[ResultItem]: ...
+
+    def __getitem__(self, index: int | slice) -> ResultItem | list[ResultItem]:
+        if isinstance(index, slice):
+            return [self.item(idx) for idx in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('ResultSet index out of range')
+        return self.item(index)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __iter__(self) -> Iterator[ResultItem]:
+        return (self.item(idx) for idx in range(len(self)))
+
+    def __eq__(self, other: Any) -> bool:
+        # Result sets compare equal to a list of the same ResultItems, so they can be used wherever a list was
+        if isinstance(other, (ResultSet, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f'ResultSet(cluster_count={self.cluster_count}, total_data_points={self.total_data_points})'
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # Mapped result sets can't be pickled as they are, and the serialised form is the most compact one anyway
+        return ResultSet.from_bytes, (self.to_bytes(),)
+
+    def _chunks(self) -> Iterator[bytes | memoryview]:
+        checkpoint = self.checkpoint or b''
+        yield _HEADERS[_VERSION].pack(_MAGIC, _VERSION, _PLAIN_STRINGS if self.plain_strings else 0, len(self.labels),
+                                      len(self.member_refs), len(self.string_offsets) - 1, len(checkpoint))
+        for name, _ in _COLUMNS:
+            column = getattr(self, name)
+            yield column if isinstance(column, memoryview) else memoryview(column)
+            yield bytes(_padding(len(column) * column.itemsize))
+        yield self.strings
+        yield bytes(_padding(len(self.strings)))
+        yield checkpoint
+
+    def to_bytes(self) -> bytes:
+        """Serialises the result set into a compact binary form that can be read with ``from_bytes``."""
+        return b''.join(self._chunks())
+
+    def write(self, file: BinaryIO) -> int:
+        """Writes the serialised result set to a file a column at a time, returning the number of bytes written."""
+        return sum(file.write(chunk) for chunk in self._chunks())
+
+    @classmethod
+    def from_buffer(cls, buffer: Any) -> 'ResultSet':
+        """Reads a serialised result set without copying it: the columns are views of ``buffer``, which must not change
+        while the result set is in use."""
+        data = memoryview(buffer)
+        magic, version = _PREFIX.unpack_from(data)
+        if magic != _MAGIC or version not in _HEADERS:
+            raise ValueError('The data is not a serialised ResultSet')
+        header = _HEADERS[version]
+        # Version 1 results were written before checkpoints were stored, and version 3 added flags and alignment
+        if version < 3:
+            _, _, clusters, refs, strings, *checkpoint_length = header.unpack_from(data)
+            flags = None
+        else:
+            _, _, flags, clusters, refs, strings, *checkpoint_length = header.unpack_from(data)
+        aligned = version >= 3
+        offset = header.size
+        columns = []
+        for (_, typecode), length in zip(_COLUMNS, (clusters, clusters, clusters + 1, refs, strings + 1)):
+            size = length * array(typecode).itemsize
+            columns.append(data[offset:offset + size].cast(typecode))
+            offset += size + (_padding(size) if aligned else 0)
+        end = offset + columns[-1][-1]
+        checkpoint = bytes(data[end + (_padding(end - offset) if aligned else 0):]) if any(checkpoint_length) else None
+        plain_strings = None if flags is None else bool(flags & _PLAIN_STRINGS)
+        return cls(*columns, data[offset:end], checkpoint, plain_strings, source=buffer)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'ResultSet':
+        """Reads a serialised result set into a copy which is independent of ``data``."""
+        view = cls.from_buffer(data)
+        columns = []
+        for name, typecode in _COLUMNS:
+            column = array(typecode)
+            column.frombytes(getattr(view, name).cast('B'))
+            columns.append(column)
+        return cls(*columns, bytes(view.strings), view.checkpoint, view.plain_strings)
+
+    @classmethod
+    def map(cls, path: str) -> 'ResultSet':
+        """Memory-maps a file written with ``write``. Pages of the file are only read when they are accessed, and are
+        shared with every other process that maps the same file."""
+        with open(path, 'rb') as file:
+            return cls.from_buffer(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+
+from app.api.resources.status import Status
+from app.store.result_set import ResultSet
+
+
+def _env_number(name: str, kind: type[int] | type[float]) -> int | float | None:
+    return None if (value := os.getenv(name)) in (None, '') else kind(value)
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """How long models that have failed or completed are kept, and how much memory they may use.
+
+    Terminal models are removed ``completed_ttl`` or ``failed_ttl`` seconds after they reach that status, and the least
+    recently used ones are removed once there are more than ``max_models`` models. Once results use more than
+    ``max_result_bytes``, the least recently used results are moved to disk under ``spill_path`` (a temporary directory
+    by default) and read back the next time they are needed. Pending and running models are never removed, as they
+    still have work in flight. None means no limit.
+    """
+    completed_ttl: float | None = None
+    failed_ttl: float | None = None
+    max_models: int | None = None
+    max_result_bytes: int | None = None
+    spill_path: str | None = None
+
+    @classmethod
+    def from_env(cls) -> 'RetentionPolicy':
+        """Configure a policy using the MODEL_TTL_COMPLETED, MODEL_TTL_FAILED, MODEL_STORE_MAX_MODELS,
+        MODEL_STORE_RESULT_BYTES and MODEL_STORE_SPILL_PATH environment variables."""
+        return cls(completed_ttl=_env_number('MODEL_TTL_COMPLETED', float),
+                   failed_ttl=_env_number('MODEL_TTL_FAILED', float),
+                   max_models=_env_number('MODEL_STORE_MAX_MODELS', int),
+                   max_result_bytes=_env_number('MODEL_STORE_RESULT_BYTES', int),
+                   spill_path=os.getenv('MODEL_STORE_SPILL_PATH') or None)
+
+    def ttl(self, status: Status) -> float | None:
+        match status:
+            case Status.COMPLETED:
+                return self.completed_ttl
+            case Status.FAILED:
+                return self.failed_ttl
+        return None
+
+
+class ResultSpill:
+    """An on-disk cache of result sets that have been evicted from memory, one file per model."""
+
+    def __init__(self, directory: str | None = None) -> None:
+        self._directory = directory
+        # A temporary directory is only created once something is spilled, and is removed when the spill is closed
+        self._owns_directory = directory is None
+        self._sizes: dict[str, int] = {}
+        self._bytes = 0
+
+    def _path(self, model_id: str) -> str:
+        if self._directory is None:
+            self._directory = tempfile.mkdtemp(prefix='model-results-')
+        return os.path.join(self._directory, f'{model_id}.rset')
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def write(self, model_id: str, results: ResultSet) -> None:
+        data = results.to_bytes()
+        with open(self._path(model_id), 'wb') as file:
+            file.write(data)
+        self._bytes += len(data) - self._sizes.get(model_id, 0)
+        self._sizes[model_id] = len(data)
+
+    def read(self, model_id: str) -> ResultSet:
+        with open(self._path(model_id), 'rb') as file:
+            return ResultSet.from_bytes(file.read())
+
+    def discard(self, model_id: str) -> None:
+        if (size := self._sizes.pop(model_id, None)) is None:
+            return
+        self._bytes -= size
+        try:
+            os.remove(self._path(model_id))
+        except FileNotFoundError:
+            pass
+
+    def close(self) -> None:
+        if self._owns_directory and self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+        self._sizes.clear()
+        self._bytes = 0
+
+    def __contains__(self, model_id: object) -> bool:
+        return model_id in self._sizes
+
+    def __len__(self) -> int:
+        return len(self._sizes)
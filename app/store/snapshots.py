@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+from app.store.result_set import ResultSet
+
+
+class ResultSnapshots:
+    """Completed results written once to disk in ResultSet's binary form, and read back by memory-mapping the file.
+
+    Results never change once a model has completed, so each snapshot is written once, under
+    ``<directory>/<model ID>/<version>.rset``, and then shared by every request (and every process using the same
+    directory) without being copied into memory: the pages of the file are held by the OS page cache. Every mapping
+    holds a file descriptor open, so only the ``max_open`` most recently used snapshots are kept mapped, and the others
+    are mapped again when they are next needed.
+    """
+
+    def __init__(self, directory: str | None = None, max_open: int = 256) -> None:
+        self.max_open = max_open
+        # A temporary directory is created lazily, and is removed along with the snapshots
+        self._directory = directory
+        self._owns_directory = directory is None
+        self._open: OrderedDict[str, tuple[int, ResultSet]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._finalizer: weakref.finalize | None = None
+
+    @classmethod
+    def from_env(cls, default_directory: str | None = None) -> 'ResultSnapshots | None':
+        """Configure snapshots using the MODEL_STORE_SNAPSHOTS (set to 0 to keep results in memory instead),
+        MODEL_STORE_SNAPSHOT_PATH and MODEL_STORE_SNAPSHOT_MAPS environment variables."""
+        if os.getenv('MODEL_STORE_SNAPSHOTS', '1').lower() in ('0', 'false', 'no', 'off'):
+            return None
+        return cls(os.getenv('MODEL_STORE_SNAPSHOT_PATH') or default_directory,
+                   max_open=int(os.getenv('MODEL_STORE_SNAPSHOT_MAPS') or 256))
+
+    @property
+    def directory(self) -> str:
+        if self._directory is None:
+            self._directory = tempfile.mkdtemp(prefix='model-snapshots-')
+            self._finalizer = weakref.finalize(self, shutil.rmtree, self._directory, True)
+        return self._directory
+
+    def _path(self, model_id: str, version: int) -> str:
+        return os.path.join(self.directory, model_id, f'{version}.rset')
+
+    def _remember(self, model_id: str, version: int, results: ResultSet) -> None:
+        with self._lock:
+            self._open[model_id] = (version, results)
+            self._open.move_to_end(model_id)
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+
+    def version(self, model_id: str) -> int | None:
+        """The version of a model's results whose snapshot is currently mapped, if there is one."""
+        return None if (record := self._open.get(model_id)) is None else record[0]
+
+    def get(self, model_id: str, version: int) -> ResultSet | None:
+        """Returns the snapshot of version ``version`` of a model's results, or None if there isn't one."""
+        with self._lock:
+            if (record := self._open.get(model_id)) is not None and record[0] == version:
+                self._open.move_to_end(model_id)
+                return record[1]
+        try:
+            results = ResultSet.map(self._path(model_id, version))
+        except FileNotFoundError:
+            return None
+        self._remember(model_id, version, results)
+        return results
+
+    def put(self, model_id: str, version: int, results: ResultSet) -> ResultSet:
+        """Writes a snapshot of a model's results, returning the results read back from the snapshot."""
+        path = self._path(model_id, version)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file and rename it, so a snapshot is never mapped before it has been completely written
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                results.write(file)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        mapped = ResultSet.map(path)
+        self._remember(model_id, version, mapped)
+        return mapped
+
+    def discard(self, model_id: str, version: int | None = None) -> None:
+        """Removes the snapshots of a model, or only the snapshot of one version of its results. Results which are
+        still mapped remain readable until they are no longer used."""
+        with self._lock:
+            if (record := self._open.get(model_id)) is not None and version in (None, record[0]):
+                del self._open[model_id]
+        if self._directory is None:
+            return
+        if version is None:
+            shutil.rmtree(os.path.join(self._directory, model_id), ignore_errors=True)
+            return
+        try:
+            os.remove(self._path(model_id, version))
+        except FileNotFoundError:
+            pass
+
+    def close(self) -> None:
+        with self._lock:
+            self._open.clear()
+        if self._finalizer is not None:
+            self._finalizer()
+            self._directory = self._finalizer = None
+
+    def __len__(self) -> int:
+        """The number of snapshots currently mapped by this process."""
+        return len(self._open)
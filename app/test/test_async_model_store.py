@@ -0,0 +1,137 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from app.api.resources import Model, Status
+from app.store import ModelStore
+from app.store.backends import MemoryBackend, SQLiteBackend, StoreBackend
+
+
+class TestAsyncModelStore(unittest.IsolatedAsyncioTestCase):
+    _model_store: ModelStore
+    _executor: ThreadPoolExecutor
+
+    def _make_backend(self) -> StoreBackend:
+        return MemoryBackend()
+
+    def setUp(self) -> None:
+        self._model_store = ModelStore(backend=self._make_backend())
+        # Simulates request handlers and a background executor updating the store at the same time
+        self._executor = ThreadPoolExecutor(max_workers=8)
+
+    def tearDown(self) -> None:
+        self._executor.shutdown()
+        self._model_store.backend.close()
+
+    async def _hammer(self, count: int, function, *args) -> list[BaseException | object]:
+        loop = asyncio.get_running_loop()
+        tasks = []
+        for idx in range(count):
+            # Alternate between the async API and the sync API being called from other threads
+            if idx % 2:
+                tasks.append(loop.run_in_executor(self._executor, getattr(self._model_store, function), *args))
+            else:
+                tasks.append(getattr(self._model_store.aio, function)(*args))
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def test_put_and_get(self) -> None:
+        model = Model.new_model()
+        await self._model_store.aio.put(model)
+        self.assertEqual(await self._model_store.aio.get(str(model.id)), (model, None))
+        self.assertIsNone(await self._model_store.aio.get(str(Model.new_model().id)))
+        await self._model_store.aio.delete(str(model.id))
+        self.assertNotIn(str(model.id), self._model_store)
+
+    async def test_no_lost_status_updates(self) -> None:
+        model = Model.new_model()
+        await self._model_store.aio.put(model)
+        _, initial_version = self._model_store.versioned(str(model.id))
+        outcomes = await self._hammer(200, 'set_status', str(model.id), Status.RUNNING)
+        self.assertFalse([outcome for outcome in outcomes if isinstance(outcome, BaseException)])
+        # Every update should have been applied exactly once
+        (model, _), version = self._model_store.versioned(str(model.id))
+        self.assertEqual(version, initial_version + 200)
+        self.assertEqual(model.status, Status.RUNNING)
+
+    async def test_only_one_terminal_transition_wins(self) -> None:
+        model = Model.new_model()
+        await self._model_store.aio.put(model)
+        completed = await self._hammer(50, 'set_status', str(model.id), Status.COMPLETED)
+        failed = await self._hammer(50, 'set_status', str(model.id), Status.FAILED)
+        outcomes = completed + failed
+        # The first update to complete the model wins, and every other update must be rejected
+        self.assertEqual(sum(1 for outcome in outcomes if outcome is None), 1)
+        self.assertTrue(all(isinstance(outcome, ValueError) for outcome in outcomes if outcome is not None))
+        self.assertEqual(self._model_store[str(model.id)][0].status, Status.COMPLETED)
+
+    async def test_results_are_generated_once(self) -> None:
+        model = Model.new_model()
+        await self._model_store.aio.put(model)
+        await self._model_store.aio.set_status(str(model.id), Status.COMPLETED)
+        outcomes = await self._hammer(100, 'get_results', str(model.id))
+        # Every caller should see the same results as the ones which were stored
+        stored = self._model_store[str(model.id)][1]
+        self.assertTrue(all(outcome == stored for outcome in outcomes))
+
+    async def test_reads_see_consistent_snapshots(self) -> None:
+        model = Model.new_model()
+        await self._model_store.aio.put(model)
+
+        async def read() -> None:
+            for _ in range(50):
+                current, _ = await self._model_store.aio.get(str(model.id))
+                self.assertEqual(current.id, model.id)
+                self.assertIn(current.status, (Status.PENDING, Status.RUNNING))
+                await asyncio.sleep(0)
+
+        writes = self._hammer(100, 'set_status', str(model.id), Status.RUNNING)
+        await asyncio.gather(writes, *(read() for _ in range(20)))
+
+
+class TestAsyncSQLiteModelStore(TestAsyncModelStore):
+    _directory: tempfile.TemporaryDirectory
+
+    def _make_backend(self) -> StoreBackend:
+        self._directory = tempfile.TemporaryDirectory()
+        return SQLiteBackend(os.path.join(self._directory.name, 'models.db'))
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        self._directory.cleanup()
+
+    async def test_changes_by_other_workers_are_polled_once_for_every_waiter(self) -> None:
+        models = [Model.new_model() for _ in range(3)]
+        await self._model_store.aio.put_many(models)
+        # Another worker, with its own connection to the same database
+        other_store = ModelStore(backend=SQLiteBackend(self._model_store.backend.path))
+        backend = self._model_store.backend
+        with mock.patch('app.store.async_model_store.SHARED_POLL_INTERVAL', 0.05), \
+                mock.patch.object(backend, 'get_versions', wraps=backend.get_versions) as get_versions, \
+                mock.patch.object(backend, 'get_versioned', wraps=backend.get_versioned) as get_versioned:
+            waiters = [asyncio.create_task(self._model_store.aio.wait_for_change(str(model.id), 0, 5))
+                       for model in models for _ in range(50)]
+            await asyncio.sleep(0.1)
+            get_versions.reset_mock()
+            get_versioned.reset_mock()
+            await asyncio.sleep(0.2)
+            self.assertFalse(any(waiter.done() for waiter in waiters))
+            # Every watched model is read in the same batch, rather than once for each waiter
+            self.assertEqual(get_versioned.call_count, 0)
+            self.assertTrue(1 <= get_versions.call_count <= 0.2 / 0.05 + 1)
+            self.assertTrue(all(len(call.args[0]) == 3 for call in get_versions.call_args_list))
+            other_store.set_status(str(models[0].id), Status.RUNNING)
+            (model, _), version = await asyncio.wait_for(waiters[0], 1)
+            self.assertEqual((model.status, version), (Status.RUNNING, 1))
+            self.assertTrue(all(waiter.done() for waiter in waiters[:50]))
+            self.assertFalse(any(waiter.done() for waiter in waiters[50:]))
+            other_store.delete_many([str(model.id) for model in models[1:]])
+            outcomes = await asyncio.gather(*waiters[50:], return_exceptions=True)
+            self.assertTrue(all(isinstance(outcome, KeyError) for outcome in outcomes))
+        other_store.backend.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.api.operations.post_models_batch import MAX_BATCH_SIZE
+from app.api.rate_limiting import RateLimiter
+from app.api.resources import Model, Status
+from app.main import app
+from app.store import ModelStore
+
+_CONFIG = {'data_source': 'https://myexampleapi.com', 'data_api_key': 'my_example_api_key'}
+
+
+class TestBatchModels(unittest.TestCase):
+    _test_client: TestClient = None
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._test_client = TestClient(app)
+
+    def setUp(self) -> None:
+        app.state.rate_limiter = RateLimiter.from_env()
+
+    def tearDown(self) -> None:
+        self._test_client.app.state.model_store = ModelStore()
+
+    def test_create_batch(self) -> None:
+        response = self._test_client.post('/models:batch', json={'configs': [_CONFIG] * 3})
+        self.assertEqual(response.status_code, 201)
+        models = response.json()['models']
+        self.assertEqual(len(models), 3)
+        self.assertEqual({model['status'] for model in models}, {'pending'})
+        self.assertEqual(len(self._test_client.app.state.model_store), 3)
+
+    def test_invalid_batch_is_rejected(self) -> None:
+        configs = [_CONFIG, {'data_api_key': 'key'}, {**_CONFIG, 'data_source': 'https://airbus.com'}]
+        response = self._test_client.post('/models:batch', json={'configs': configs})
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        # There should be one error for each invalid config, saying which config it is for
+        self.assertEqual([error['code'] for error in errors], ['invalid_model_config', 'data_source_unreachable'])
+        self.assertTrue(errors[0]['message'].startswith('Item 1: '))
+        self.assertTrue(errors[1]['message'].startswith('Item 2: '))
+        # None of the models should have been created
+        self.assertEqual(len(self._test_client.app.state.model_store), 0)
+
+    def test_batch_size_is_limited(self) -> None:
+        for configs in ([], [_CONFIG] * (MAX_BATCH_SIZE + 1)):
+            response = self._test_client.post('/models:batch', json={'configs': configs})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['errors'][0]['code'], 'invalid_batch_size')
+
+    def test_get_many(self) -> None:
+        models = [Model.new_model() for _ in range(3)]
+        model_store = self._test_client.app.state.model_store
+        model_store.put_many(models)
+        model_store.set_status(str(models[0].id), Status.RUNNING)
+        missing_id = str(uuid.uuid4())
+        # IDs can be comma separated, repeated, or both
+        ids = [f'{models[0].id},{models[1].id}', str(models[2].id), missing_id]
+        response = self._test_client.get('/models', params={'ids': ids})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([model['id'] for model in body['models']], [str(model.id) for model in models])
+        self.assertEqual(body['models'][0]['status'], 'running')
+        # Missing models are reported without failing the request
+        self.assertEqual(len(body['errors']), 1)
+        self.assertEqual(body['errors'][0]['code'], 'model_not_found')
+        self.assertIn(missing_id, body['errors'][0]['message'])
+
+    def test_get_many_by_status(self) -> None:
+        models = [Model.new_model() for _ in range(3)]
+        model_store = self._test_client.app.state.model_store
+        model_store.put_many(models)
+        model_store.set_status(str(models[1].id), Status.RUNNING)
+        response = self._test_client.get('/models', params={'ids': [str(model.id) for model in models],
+                                                            'status': 'running'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([model['id'] for model in response.json()['models']], [str(models[1].id)])
+        self.assertNotIn('errors', response.json())
+
+    def test_get_many_with_invalid_ids(self) -> None:
+        response = self._test_client.get('/models', params={'ids': f'{uuid.uuid4()},not-a-uuid'})
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0]['code'], 'invalid_model_id')
+        self.assertTrue(errors[0]['message'].startswith('Item 1: '))
+
+
+if __name__ == '__main__':
+    unittest.main()
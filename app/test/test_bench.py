@@ -0,0 +1,61 @@
+import random
+import unittest
+from collections import Counter
+
+from app.bench.load import SCENARIOS, RequestTemplate, compare, load_scenario, percentile, summarise
+
+
+class TestLoadHarness(unittest.TestCase):
+
+    def test_scenarios_are_valid(self) -> None:
+        pools = {'model_id': ['a', 'b', 'c'], 'large_model_id': ['d']}
+        scenarios = list(SCENARIOS.glob('*.jsonl'))
+        self.assertGreaterEqual(len(scenarios), 3)
+        for path in scenarios:
+            for template in load_scenario(path):
+                self.assertIn(template.method, ('GET', 'POST', 'DELETE'))
+                self.assertTrue(template.url(random.Random(0), pools).startswith('/'))
+
+    def test_url(self) -> None:
+        pools = {'model_id': ['a', 'b', 'c'], 'large_model_id': ['d']}
+        rng = random.Random(0)
+        self.assertEqual(RequestTemplate('get', 'GET', '/models/{large_model_id}').url(rng, pools), '/models/d')
+        ids = RequestTemplate('get', 'GET', '/models?ids={model_ids}').url(rng, pools).removeprefix('/models?ids=')
+        self.assertCountEqual(ids.split(','), pools['model_id'])
+
+    def test_numbered_bodies(self) -> None:
+        template = RequestTemplate('create', 'POST', '/models', json={'config': {'data_source': 'https://a.com/{request}',
+                                                                                 'data_points': 10}})
+        self.assertEqual(template.body(7), {'config': {'data_source': 'https://a.com/7', 'data_points': 10}})
+        self.assertNotEqual(template.body(1), template.body(2))
+        plain = RequestTemplate('get', 'GET', '/models', json={'a': 1})
+        self.assertIs(plain.body(1), plain.json)
+
+    def test_summarise(self) -> None:
+        latencies = [idx / 1000 for idx in range(1, 101)]
+        summary = summarise(latencies, Counter({'200': 97, '429': 1, '500': 1, 'ReadTimeout': 1}), 2.0, None)
+        self.assertEqual(summary['requests_per_second'], 50)
+        self.assertAlmostEqual(summary['p50_ms'], 50)
+        self.assertAlmostEqual(summary['p99_ms'], 99)
+        self.assertAlmostEqual(summary['max_ms'], 100)
+        # Rejected requests are not errors, but failed ones are
+        self.assertEqual(summary['errors'], 2)
+        self.assertEqual(percentile([], 0.5), 0)
+        self.assertIsNone(summary['cpu_ms_per_request'])
+
+    def test_summarise_bytes_and_cpu(self) -> None:
+        summary = summarise([0.001] * 4, Counter({'200': 4}), 1.0, None, body_bytes=4096, cpu_seconds=0.01)
+        self.assertEqual(summary['bytes_per_request'], 1024)
+        self.assertAlmostEqual(summary['cpu_ms_per_request'], 2.5)
+
+    def test_compare(self) -> None:
+        baseline = {'poll-heavy': {'requests_per_second': 1000, 'p50_ms': 1.0, 'p99_ms': 10.0, 'rss_mib': None}}
+        results = {'poll-heavy': {'requests_per_second': 850, 'p50_ms': 1.05, 'p99_ms': 8.0, 'rss_mib': 100},
+                   'create-heavy': {'requests_per_second': 1}}
+        regressions = compare(results, baseline, tolerance=0.1)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith('poll-heavy requests_per_second'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import unittest
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.api.caching import CachedResponse, ResponseCache, content_etag, make_etag
+from app.api.rate_limiting import RateLimiter
+from app.api.resources import Model, ResultItem, Status
+from app.main import app
+from app.store import ModelStore
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def test_lru_eviction(self) -> None:
+        cache = ResponseCache(max_models=2, max_bytes=100)
+        cache.put('a', 'model', CachedResponse('"1"', b'a' * 10, 'application/json'))
+        cache.put('b', 'model', CachedResponse('"1"', b'b' * 10, 'application/json'))
+        # Using 'a' makes 'b' the least recently used model
+        self.assertIsNotNone(cache.get('a', 'model'))
+        cache.put('c', 'model', CachedResponse('"1"', b'c' * 10, 'application/json'))
+        self.assertIsNone(cache.get('b', 'model'))
+        self.assertIsNotNone(cache.get('a', 'model'))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.nbytes, 20)
+
+    def test_byte_budget(self) -> None:
+        cache = ResponseCache(max_models=10, max_bytes=25)
+        cache.put('a', 'model', CachedResponse('"1"', b'a' * 10, 'application/json'))
+        cache.put('a', 'results', CachedResponse('"1"', b'a' * 10, 'application/json'))
+        cache.put('b', 'model', CachedResponse('"1"', b'b' * 10, 'application/json'))
+        # All of a's responses are evicted together to make room for b
+        self.assertIsNone(cache.get('a', 'model'))
+        self.assertIsNone(cache.get('a', 'results'))
+        self.assertEqual(cache.nbytes, 10)
+        # Responses larger than the whole budget are never cached
+        cache.put('c', 'model', CachedResponse('"1"', b'c' * 30, 'application/json'))
+        self.assertIsNone(cache.get('c', 'model'))
+
+    def test_invalidate(self) -> None:
+        cache = ResponseCache()
+        cache.put('a', 'model', CachedResponse('"1"', b'a', 'application/json'))
+        cache.put('a', 'results', CachedResponse('"1"', b'aa', 'application/json'))
+        cache.invalidate('a')
+        cache.invalidate('missing')
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.nbytes, 0)
+
+    def test_etags_differ_by_version_and_variant(self) -> None:
+        self.assertEqual(make_etag(1, 'model'), make_etag(1, 'model'))
+        self.assertNotEqual(make_etag(1, 'model'), make_etag(2, 'model'))
+        self.assertNotEqual(make_etag(1, 'model'), make_etag(1, 'results'))
+        self.assertEqual(content_etag(b'{}', 'model'), content_etag(b'{}', 'model'))
+        self.assertNotEqual(content_etag(b'{}', 'model'), content_etag(b'[]', 'model'))
+        self.assertNotEqual(content_etag(b'{}', 'model'), content_etag(b'{}', 'results'))
+
+
+class TestConditionalGet(unittest.TestCase):
+    _test_client: TestClient = None
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._test_client = TestClient(app)
+
+    def setUp(self) -> None:
+        app.state.rate_limiter = RateLimiter.from_env()
+
+    def tearDown(self) -> None:
+        # Reset the model store after each test
+        self._test_client.app.state.model_store = ModelStore()
+
+    def _add_model(self, status: Status) -> str:
+        model = Model(id=uuid.uuid4(), status=status)
+        results = [ResultItem(cluster=0, occurrences=1, members=['A'])] if status == Status.COMPLETED else None
+        self._test_client.app.state.model_store[str(model.id)] = (model, results)
+        return str(model.id)
+
+    def test_pending_model_is_revalidated(self) -> None:
+        model_id = self._add_model(Status.PENDING)
+        response = self._test_client.get(f'/models/{model_id}')
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+        etag = response.headers['ETag']
+        # The client already has the latest version
+        response = self._test_client.get(f'/models/{model_id}', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        # Once the status changes the old ETag should no longer match
+        self._test_client.app.state.model_store.set_status(model_id, Status.RUNNING)
+        response = self._test_client.get(f'/models/{model_id}', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'running')
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_terminal_model_is_cached(self) -> None:
+        model_id = self._add_model(Status.COMPLETED)
+        for path in (f'/models/{model_id}', f'/models/{model_id}/results'):
+            first = self._test_client.get(path)
+            self.assertEqual(first.status_code, 200)
+            self.assertIn('max-age', first.headers['Cache-Control'])
+            # The second response should be served from the cache, with the same ETag and body
+            second = self._test_client.get(path)
+            self.assertEqual(second.headers['ETag'], first.headers['ETag'])
+            self.assertEqual(second.content, first.content)
+            response = self._test_client.get(path, headers={'If-None-Match': f'W/{first.headers["ETag"]}'})
+            self.assertEqual(response.status_code, 304)
+        self.assertIsNotNone(self._test_client.app.state.response_cache._models.get(model_id))
+
+    def test_storing_results_keeps_the_model_etag(self) -> None:
+        model = Model(id=uuid.uuid4(), status=Status.COMPLETED)
+        model_id = str(model.id)
+        # Results which haven't been stored yet are generated and stored the first time they are read
+        self._test_client.app.state.model_store[model_id] = (model, None)
+        etag = self._test_client.get(f'/models/{model_id}').headers['ETag']
+        self.assertEqual(self._test_client.get(f'/models/{model_id}/results').status_code, 200)
+        # Without the cached response, the ETag is built again after the model's entry has changed
+        self._test_client.app.state.response_cache.invalidate(model_id)
+        response = self._test_client.get(f'/models/{model_id}', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+
+    def test_pages_have_their_own_etags(self) -> None:
+        model_id = self._add_model(Status.COMPLETED)
+        full = self._test_client.get(f'/models/{model_id}/results')
+        page = self._test_client.get(f'/models/{model_id}/results', params={'limit': 1})
+        streamed = self._test_client.get(f'/models/{model_id}/results', headers={'Accept': 'application/x-ndjson'})
+        self.assertEqual(len({full.headers['ETag'], page.headers['ETag'], streamed.headers['ETag']}), 3)
+
+    def test_delete_invalidates_cache(self) -> None:
+        model_id = self._add_model(Status.FAILED)
+        self.assertEqual(self._test_client.get(f'/models/{model_id}').status_code, 200)
+        self.assertEqual(self._test_client.delete(f'/models/{model_id}').status_code, 204)
+        self.assertIsNone(self._test_client.app.state.response_cache._models.get(model_id))
+        self.assertEqual(self._test_client.get(f'/models/{model_id}').status_code, 404)
+
+    def test_cache_checks_model_still_exists(self) -> None:
+        model_id = self._add_model(Status.FAILED)
+        self.assertEqual(self._test_client.get(f'/models/{model_id}').status_code, 200)
+        # Simulate another worker deleting the model, which can't invalidate this worker's cache
+        del self._test_client.app.state.model_store[model_id]
+        self.assertEqual(self._test_client.get(f'/models/{model_id}').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
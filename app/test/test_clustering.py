@@ -0,0 +1,74 @@
+import unittest
+
+import numpy as np
+
+from app.api.resources import ResultItem
+from app.training.clustering import FeatureBatch, MiniBatchKMeans, cluster
+from app.training.sources import synthetic_traces
+
+
+class TestClustering(unittest.TestCase):
+
+    def test_finds_separated_clusters(self) -> None:
+        centres = np.array([[0.0, 0.0], [100.0, 100.0], [-100.0, 100.0]])
+        rng = np.random.default_rng(1)
+        features = np.concatenate([centre + rng.standard_normal((300, 2)) for centre in centres])
+        # Traces from each blob should be spread across the batches, as the centroids are seeded from the first batch
+        order = rng.permutation(len(features))
+        batches = [FeatureBatch(ids=[f'T{idx}' for idx in order[start:start + 100]],
+                                features=features[order[start:start + 100]])
+                   for start in range(0, len(features), 100)]
+        model = MiniBatchKMeans(clusters=3, seed=4).fit(batches)
+        results = model.results()
+        # Each blob should end up in its own cluster
+        self.assertEqual(len(results), 3)
+        self.assertEqual(sorted(item.occurrences for item in results), [300, 300, 300])
+        self.assertTrue(np.allclose(np.sort(model.centroids, axis=0), np.sort(centres, axis=0), atol=0.5))
+        # The members of each cluster should all come from the same blob
+        for item in results:
+            blobs = {int(member[1:]) // 300 for member in item.members}
+            self.assertEqual(len(blobs), 1)
+
+    def test_results_match_schema(self) -> None:
+        results = cluster(synthetic_traces(total=25_000, batch_size=4_000, seed=3), clusters=5, max_members=10, seed=3)
+        self.assertTrue(all(isinstance(item, ResultItem) for item in results))
+        # Every data point should be counted exactly once
+        self.assertEqual(sum(item.occurrences for item in results), 25_000)
+        for label, item in enumerate(results):
+            # The labels should be sequential, and the members bounded
+            self.assertEqual(item.cluster, label)
+            self.assertGreater(item.occurrences, 0)
+            self.assertEqual(len(item.members), min(10, item.occurrences))
+
+    def test_empty_clusters_are_dropped(self) -> None:
+        # There are only two distinct points, so only two of the four clusters can have members
+        batch = FeatureBatch(ids=['A', 'B', 'C', 'D'], features=np.array([[1.0, 1.0], [1.0, 1.0], [5.0, 5.0],
+                                                                          [5.0, 5.0]]))
+        results = cluster([batch], clusters=4, seed=0)
+        self.assertEqual(len(results), 2)
+        self.assertCountEqual([item.members for item in results], [['A', 'B'], ['C', 'D']])
+
+    def test_no_data(self) -> None:
+        self.assertEqual(cluster([]), [])
+        self.assertEqual(cluster([FeatureBatch(ids=[], features=np.empty((0, 3)))]), [])
+
+    def test_resume(self) -> None:
+        batches = list(synthetic_traces(3000, batch_size=500, seed=3))
+        model = MiniBatchKMeans(clusters=4, max_members=600, seed=1).fit(batches)
+        # Carrying on from the results of the first half should give the same clusters as reading every batch at once
+        first = MiniBatchKMeans(clusters=4, max_members=600, seed=1).fit(batches[:3])
+        resumed = MiniBatchKMeans.resume(first.cluster_centroids, first.results(), max_members=600).fit(batches[3:])
+        self.assertEqual(resumed.results(), model.results())
+        self.assertTrue(np.allclose(resumed.cluster_centroids, model.cluster_centroids))
+        # With no previous clusters, the centroids are seeded from the first new batch
+        self.assertEqual(len(MiniBatchKMeans.resume(np.empty((0, 0)), [], clusters=2).fit(batches).results()), 2)
+        with self.assertRaises(ValueError):
+            MiniBatchKMeans.resume(np.zeros((1, 8)), [])
+
+    def test_mismatched_batch(self) -> None:
+        with self.assertRaises(ValueError):
+            FeatureBatch(ids=['A'], features=np.zeros((2, 3)))
+
+
+if __name__ == '__main__':
+    unittest.main()
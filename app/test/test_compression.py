@@ -0,0 +1,123 @@
+import gzip
+import json
+import unittest
+import uuid
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from app.api.compression import CompressionPolicy
+from app.api.rate_limiting import RateLimiter
+from app.api.resources import Model, ResultItem, Status
+from app.main import app
+from app.store import ModelStore
+
+
+class TestNegotiation(unittest.TestCase):
+    _policy = CompressionPolicy(encodings=('br', 'gzip'))
+
+    def test_negotiate(self) -> None:
+        self.assertEqual(self._policy.negotiate('gzip, deflate'), 'gzip')
+        # With no preference between them, the server's preference wins
+        self.assertEqual(self._policy.negotiate('gzip, br'), 'br')
+        self.assertEqual(self._policy.negotiate('*'), 'br')
+        self.assertEqual(self._policy.negotiate('br;q=0.5, gzip'), 'gzip')
+        self.assertEqual(self._policy.negotiate('*, br;q=0'), 'gzip')
+        self.assertIsNone(self._policy.negotiate('gzip;q=0'))
+        self.assertIsNone(self._policy.negotiate('identity'))
+        self.assertIsNone(self._policy.negotiate(None))
+        self.assertIsNone(CompressionPolicy(encodings=()).negotiate('gzip'))
+
+    def test_from_env(self) -> None:
+        with mock.patch.dict('os.environ', {'RESPONSE_COMPRESSION': 'gzip', 'COMPRESSION_MIN_BYTES': '10'}):
+            self.assertEqual(CompressionPolicy.from_env(), CompressionPolicy(encodings=('gzip',), min_size=10))
+        with mock.patch.dict('os.environ', {'RESPONSE_COMPRESSION': 'off'}):
+            self.assertEqual(CompressionPolicy.from_env().encodings, ())
+        with mock.patch.dict('os.environ', {'RESPONSE_COMPRESSION': 'gzip,lzma'}):
+            with self.assertRaises(ValueError):
+                CompressionPolicy.from_env()
+
+    def test_round_trip(self) -> None:
+        body = b'{"members":["ABCDEFGHIJ","ABCDEFGHIJ"]}' * 100
+        policy = CompressionPolicy(encodings=('gzip',))
+        compressed = policy.compress(body, 'gzip')
+        self.assertLess(len(compressed), len(body))
+        self.assertEqual(gzip.decompress(compressed), body)
+        compressor = policy.compressor('gzip')
+        self.assertEqual(gzip.decompress(compressor.compress(body) + compressor.flush()), body)
+
+
+class TestCompressedResults(unittest.TestCase):
+    _test_client: TestClient = None
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._test_client = TestClient(app)
+
+    def setUp(self) -> None:
+        app.state.rate_limiter = RateLimiter.from_env()
+        app.state.compression = CompressionPolicy(encodings=('gzip',), min_size=1024)
+
+    def tearDown(self) -> None:
+        app.state.model_store = ModelStore()
+        app.state.response_cache.clear()
+        app.state.compression = CompressionPolicy.from_env()
+
+    def _completed_model(self, clusters: int) -> str:
+        model = Model(id=uuid.uuid4(), status=Status.COMPLETED)
+        results = [ResultItem(cluster=idx, occurrences=50, members=[f'TRACE{member:05d}' for member in range(50)])
+                   for idx in range(clusters)]
+        app.state.model_store[str(model.id)] = (model, results)
+        return str(model.id)
+
+    def test_large_results_are_compressed_once(self) -> None:
+        model_id = self._completed_model(clusters=20)
+        identity = self._test_client.get(f'/models/{model_id}/results', headers={'Accept-Encoding': 'identity'})
+        self.assertNotIn('Content-Encoding', identity.headers)
+        self.assertEqual(identity.headers['Vary'], 'Accept-Encoding')
+        with mock.patch.object(CompressionPolicy, 'compress', autospec=True,
+                               side_effect=CompressionPolicy.compress) as compress:
+            first = self._test_client.get(f'/models/{model_id}/results', headers={'Accept-Encoding': 'gzip'})
+            second = self._test_client.get(f'/models/{model_id}/results', headers={'Accept-Encoding': 'gzip'})
+        # The compressed body is cached, so the second request doesn't compress it again
+        self.assertEqual(compress.call_count, 1)
+        for response in (first, second):
+            self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+            self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+            self.assertEqual(response.json(), identity.json())
+            self.assertLess(response.num_bytes_downloaded, len(identity.content) / 4)
+        # Each encoding is a separate representation with its own ETag
+        self.assertEqual(first.headers['ETag'], second.headers['ETag'])
+        self.assertNotEqual(first.headers['ETag'], identity.headers['ETag'])
+        not_modified = self._test_client.get(f'/models/{model_id}/results',
+                                             headers={'Accept-Encoding': 'gzip', 'If-None-Match': first.headers['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.headers['Vary'], 'Accept-Encoding')
+        self.assertNotIn('Content-Encoding', not_modified.headers)
+
+    def test_small_results_are_not_compressed(self) -> None:
+        model_id = self._completed_model(clusters=1)
+        response = self._test_client.get(f'/models/{model_id}/results?limit=1', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+
+    def test_streamed_results_are_compressed(self) -> None:
+        model_id = self._completed_model(clusters=5)
+        response = self._test_client.get(f'/models/{model_id}/results',
+                                         headers={'Accept': 'application/x-ndjson', 'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(lines[0], {'cluster_count': 5, 'total_data_points': 250})
+        self.assertEqual([line['cluster_label'] for line in lines[1:]], [0, 1, 2, 3, 4])
+
+    def test_compression_can_be_turned_off(self) -> None:
+        app.state.compression = CompressionPolicy(encodings=())
+        model_id = self._completed_model(clusters=20)
+        response = self._test_client.get(f'/models/{model_id}/results', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertNotIn('Vary', response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
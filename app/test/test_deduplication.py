@@ -0,0 +1,181 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app.api.deduplication import ModelRequests, config_fingerprint
+from app.api.rate_limiting import RateLimiter
+from app.api.resources import ModelConfig, Status
+from app.main import app
+from app.store import ModelStore
+from app.store.backends import SQLiteBackend
+
+_CONFIG = {'data_source': 'https://myexampleapi.com', 'data_api_key': 'my_example_api_key', 'clusters': 4}
+
+
+class TestConfigFingerprint(unittest.TestCase):
+
+    def test_equivalent_configs(self) -> None:
+        reordered = {'clusters': 4, 'data_api_key': 'my_example_api_key', 'data_source': 'https://myexampleapi.com/'}
+        self.assertEqual(config_fingerprint(ModelConfig(**_CONFIG)), config_fingerprint(ModelConfig(**reordered)))
+        for changed in ({'clusters': 5}, {'data_api_key': 'another_key'}, {'name': 'model'}):
+            self.assertNotEqual(config_fingerprint(ModelConfig(**_CONFIG)),
+                                config_fingerprint(ModelConfig(**_CONFIG | changed)))
+
+    def test_claims(self) -> None:
+        requests = ModelRequests(window=300, max_entries=2)
+        claim, is_new = requests.claim('a', 'model-1')
+        self.assertTrue(is_new)
+        self.assertEqual(requests.claim('a', 'model-2'), (claim, False))
+        requests.release(claim)
+        self.assertEqual(requests.claim('a', 'model-3')[0].model_id, 'model-3')
+        # The oldest claims are forgotten once there are too many
+        requests.claim('b', 'model-4')
+        requests.claim('c', 'model-5')
+        self.assertEqual(len(requests), 2)
+        self.assertTrue(requests.claim('a', 'model-6')[1])
+
+        requests = ModelRequests(window=0)
+        self.assertTrue(requests.claim('a', 'model-1')[1])
+        self.assertTrue(requests.claim('a', 'model-2')[1])
+        self.assertTrue(requests.claim('a', 'model-3', 'key')[1])
+        self.assertEqual(requests.claim('a', 'model-4', 'key')[0].model_id, 'model-3')
+
+
+class TestDeduplication(unittest.TestCase):
+    _test_client: TestClient = None
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._test_client = TestClient(app)
+
+    def setUp(self) -> None:
+        app.state.rate_limiter = RateLimiter.from_env()
+        app.state.model_requests = ModelRequests()
+
+    def tearDown(self) -> None:
+        app.state.model_store = ModelStore()
+        app.state.model_requests = ModelRequests.from_env()
+
+    def _post(self, config: dict, key: str | None = None) -> httpx.Response:
+        headers = {} if key is None else {'Idempotency-Key': key}
+        return self._test_client.post('/models', json={'config': config}, headers=headers)
+
+    def test_identical_requests_share_a_model(self) -> None:
+        first = self._post(_CONFIG)
+        self.assertEqual(first.status_code, 201)
+        second = self._post(_CONFIG)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second.headers['Location'], first.headers['Location'])
+        self.assertEqual(self._post(_CONFIG | {'clusters': 5}).status_code, 201)
+        self.assertEqual(len(app.state.model_store), 2)
+
+    def test_failed_and_deleted_models_are_not_shared(self) -> None:
+        model_id = self._post(_CONFIG).json()['id']
+        app.state.model_store.set_status(model_id, Status.FAILED)
+        retried = self._post(_CONFIG)
+        self.assertEqual(retried.status_code, 201)
+        self.assertNotEqual(retried.json()['id'], model_id)
+        self.assertEqual(self._test_client.delete(f'/models/{retried.json()["id"]}').status_code, 204)
+        self.assertEqual(self._post(_CONFIG).status_code, 201)
+
+    def test_idempotency_key(self) -> None:
+        app.state.model_requests = ModelRequests(window=0)
+        first = self._post(_CONFIG, key='create-1')
+        self.assertEqual(first.status_code, 201)
+        # Without the key the same config makes a new model, as deduplication of configs is turned off
+        self.assertEqual(self._post(_CONFIG).status_code, 201)
+        retried = self._post(_CONFIG, key='create-1')
+        self.assertEqual(retried.status_code, 200)
+        self.assertEqual(retried.json()['id'], first.json()['id'])
+        # A key can't be reused for a different config, but keys of clients with different API keys are separate
+        reused = self._post(_CONFIG | {'clusters': 5}, key='create-1')
+        self.assertEqual(reused.status_code, 422)
+        self.assertEqual(reused.json()['errors'][0]['code'], 'idempotency_key_mismatch')
+        self.assertEqual(self._post(_CONFIG | {'data_api_key': 'another_key'}, key='create-1').status_code, 201)
+        self.assertEqual(len(app.state.model_store), 3)
+
+
+class TestSharedIdempotencyKeys(unittest.TestCase):
+    _test_client: TestClient = None
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._test_client = TestClient(app)
+
+    def setUp(self) -> None:
+        app.state.rate_limiter = RateLimiter.from_env()
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._directory.name, 'models.db')
+        self._use_worker()
+
+    def tearDown(self) -> None:
+        app.state.model_store.backend.close()
+        app.state.model_store = ModelStore()
+        app.state.model_requests = ModelRequests.from_env()
+        self._directory.cleanup()
+
+    def _use_worker(self) -> None:
+        # Each worker has its own connection to the database and its own memory of recent requests
+        if isinstance(getattr(app.state.model_store, 'backend', None), SQLiteBackend):
+            app.state.model_store.backend.close()
+        app.state.model_store = ModelStore(backend=SQLiteBackend(self._path))
+        app.state.model_requests = ModelRequests(window=0)
+
+    def _post(self, config: dict, key: str) -> httpx.Response:
+        return self._test_client.post('/models', json={'config': config}, headers={'Idempotency-Key': key})
+
+    def test_retries_on_another_worker_get_the_same_model(self) -> None:
+        first = self._post(_CONFIG, 'create-1')
+        self.assertEqual(first.status_code, 201)
+        self._use_worker()
+        retried = self._post(_CONFIG, 'create-1')
+        self.assertEqual(retried.status_code, 200)
+        self.assertEqual(retried.json()['id'], first.json()['id'])
+        reused = self._post(_CONFIG | {'clusters': 5}, 'create-1')
+        self.assertEqual(reused.status_code, 422)
+        self.assertEqual(len(app.state.model_store), 1)
+        # Once the model has failed, the key is claimed again for a new one
+        app.state.model_store.set_status(first.json()['id'], Status.FAILED)
+        self._use_worker()
+        retried = self._post(_CONFIG, 'create-1')
+        self.assertEqual(retried.status_code, 201)
+        self.assertEqual(self._post(_CONFIG, 'create-1').json()['id'], retried.json()['id'])
+        self.assertEqual(len(app.state.model_store), 2)
+
+    def test_claims_expire(self) -> None:
+        backend = app.state.model_store.backend
+        self.assertEqual(backend.claim_key('key', 'a', 'model-1', 60), ('a', 'model-1'))
+        self.assertEqual(backend.claim_key('key', 'b', 'model-2', 60), ('a', 'model-1'))
+        # Only the claim's own model can release it
+        backend.release_key('key', 'model-2')
+        self.assertEqual(backend.claim_key('key', 'b', 'model-2', 60), ('a', 'model-1'))
+        backend.release_key('key', 'model-1')
+        self.assertEqual(backend.claim_key('key', 'b', 'model-2', 0), ('b', 'model-2'))
+        self.assertEqual(backend.claim_key('key', 'c', 'model-3', 60), ('c', 'model-3'))
+
+
+class TestConcurrentRequests(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        app.state.rate_limiter = RateLimiter.from_env()
+
+    async def asyncTearDown(self) -> None:
+        app.state.model_store = ModelStore()
+        app.state.model_requests = ModelRequests.from_env()
+
+    async def test_concurrent_requests_share_a_model(self) -> None:
+        app.state.model_requests = ModelRequests()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://testserver') as client:
+            responses = await asyncio.gather(*(client.post('/models', json={'config': _CONFIG}) for _ in range(5)))
+        self.assertEqual(sorted(response.status_code for response in responses), [200, 200, 200, 200, 201])
+        self.assertEqual(len({response.json()['id'] for response in responses}), 1)
+        self.assertEqual(len(app.state.model_store), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
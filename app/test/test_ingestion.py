@@ -0,0 +1,207 @@
+import asyncio
+import socket
+import threading
+import unittest
+import uuid
+from typing import Any
+from urllib.parse import parse_qs
+
+import httpx
+import uvicorn
+
+from app.training.ingestion import ClientPool, IngestionError, RetryPolicy, TraceClient, is_reserved, prefetch
+from app.training.worker import refresh, train
+
+_API_KEY = 'my_example_api_key'
+
+
+class TraceService:
+    """A stub trace query service, which serves ``count`` traces and fails the first ``failures`` requests."""
+
+    def __init__(self, count: int, failures: int = 0, drop_after: int | None = None) -> None:
+        self.traces = [{'id': f'T{idx:04d}', 'features': [float(idx % 3), float(idx % 3) * 10]}
+                       for idx in range(count)]
+        self.failures = failures
+        # The connection of the first successful request is dropped after this many traces
+        self.drop_after = drop_after
+        self.requests: list[dict[str, list[str]]] = []
+
+    async def __call__(self, scope: dict[str, Any], receive: Any, send: Any) -> None:
+        if scope['type'] != 'http':
+            return
+        params = parse_qs(scope['query_string'].decode())
+        self.requests.append(params)
+        if dict(scope['headers']).get(b'authorization') != f'Bearer {_API_KEY}'.encode():
+            return await self._respond(send, 401)
+        if self.failures > 0:
+            self.failures -= 1
+            return await self._respond(send, 503, [(b'retry-after', b'0')])
+        start = int(params.get('cursor', ['0'])[0])
+        if 'after' in params:
+            start += next(idx + 1 for idx, trace in enumerate(self.traces) if trace['id'] == params['after'][0])
+        end = start + int(params['limit'][0])
+        headers = [(b'content-type', b'application/x-ndjson')]
+        if end < len(self.traces):
+            headers.append((b'next-cursor', str(end).encode()))
+        await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+        for position, trace in enumerate(self.traces[start:end]):
+            if position == self.drop_after:
+                self.drop_after = None
+                raise ConnectionResetError()
+            line = httpx.Response(200, json=trace).content + b'\n'
+            # Send each line in two chunks, so that lines are split across reads
+            for chunk in (line[:5], line[5:]):
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    @staticmethod
+    async def _respond(send: Any, status: int, headers: list[tuple[bytes, bytes]] | None = None) -> None:
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers or []})
+        await send({'type': 'http.response.body', 'body': b''})
+
+
+def _client(service: TraceService, attempts: int = 3) -> TraceClient:
+    return TraceClient('http://traces.local/query', retry=RetryPolicy(attempts=attempts, backoff=0),
+                       transport=httpx.ASGITransport(app=service))
+
+
+class TestTraceClient(unittest.IsolatedAsyncioTestCase):
+
+    async def test_batches_span_pages(self) -> None:
+        service = TraceService(25)
+        client = _client(service)
+        batches = [batch async for batch in client.batches(_API_KEY, batch_size=7, page_size=10)]
+        self.assertEqual([len(batch.ids) for batch in batches], [7, 7, 7, 4])
+        self.assertEqual([trace_id for batch in batches for trace_id in batch.ids],
+                         [trace['id'] for trace in service.traces])
+        self.assertEqual(batches[-1].features.tolist(), [trace['features'] for trace in service.traces[21:]])
+        self.assertEqual([params.get('cursor') for params in service.requests], [None, ['10'], ['20']])
+        await client.aclose()
+
+    async def test_limit(self) -> None:
+        service = TraceService(25)
+        client = _client(service)
+        batches = [batch async for batch in client.batches(_API_KEY, batch_size=10, limit=12, page_size=10)]
+        self.assertEqual([len(batch.ids) for batch in batches], [10, 2])
+        # The second page is only as long as is needed
+        self.assertEqual(len(service.requests), 2)
+        self.assertEqual([batch async for batch in client.batches(_API_KEY, limit=0)], [])
+        await client.aclose()
+
+    async def test_unavailable_source_is_retried(self) -> None:
+        service = TraceService(5, failures=2)
+        traces = [trace async for trace in _client(service).traces(_API_KEY)]
+        self.assertEqual(len(traces), 5)
+        self.assertEqual(len(service.requests), 3)
+
+        service = TraceService(5, failures=3)
+        with self.assertRaisesRegex(IngestionError, 'after 3 attempts'):
+            _ = [trace async for trace in _client(service).traces(_API_KEY)]
+        self.assertEqual(len(service.requests), 3)
+
+    async def test_rejected_key_is_not_retried(self) -> None:
+        service = TraceService(5)
+        with self.assertRaisesRegex(IngestionError, '401'):
+            _ = [trace async for trace in _client(service).traces('wrong_key')]
+        self.assertEqual(len(service.requests), 1)
+
+    async def test_invalid_traces(self) -> None:
+        service = TraceService(5)
+        service.traces[3] = {'id': 'T0003'}
+        with self.assertRaises(IngestionError):
+            _ = [trace async for trace in _client(service).traces(_API_KEY)]
+        service.traces[3] = {'id': 'T0003', 'features': [1.0]}
+        with self.assertRaises(IngestionError):
+            _ = [batch async for batch in _client(service).batches(_API_KEY)]
+
+    async def test_prefetch(self) -> None:
+        service = TraceService(25)
+        client = _client(service)
+        batches = [batch async for batch in prefetch(client.batches(_API_KEY, batch_size=5, page_size=10))]
+        self.assertEqual(len(batches), 5)
+        service.failures = 3
+        with self.assertRaises(IngestionError):
+            _ = [batch async for batch in prefetch(client.batches(_API_KEY, batch_size=5, page_size=10))]
+        await client.aclose()
+
+    async def test_client_pool(self) -> None:
+        pool = ClientPool()
+        self.assertIs(pool.get('https://a.com'), pool.get('https://a.com'))
+        self.assertIsNot(pool.get('https://a.com'), pool.get('https://b.com'))
+        await pool.aclose()
+
+    def test_reserved_domains(self) -> None:
+        self.assertTrue(is_reserved('https://traces.example.com/query'))
+        self.assertTrue(is_reserved('https://EXAMPLE.org.'))
+        self.assertTrue(is_reserved('http://traces.test'))
+        self.assertFalse(is_reserved('https://myexampleapi.com'))
+        self.assertFalse(is_reserved('http://127.0.0.1:8000'))
+
+
+class TestTraceServer(unittest.TestCase):
+    """Reads traces over HTTP from a stub service running in uvicorn."""
+    _service: TraceService
+    _server: uvicorn.Server
+    _thread: threading.Thread
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        cls._service = TraceService(2500)
+        cls._server = uvicorn.Server(uvicorn.Config(cls._service, host='127.0.0.1', port=port, log_level='critical'))
+        cls._thread = threading.Thread(target=cls._server.run, daemon=True)
+        cls._thread.start()
+        while not cls._server.started:
+            threading.Event().wait(0.01)
+        cls._data_source = f'http://127.0.0.1:{port}/query'
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls._server.should_exit = True
+        cls._thread.join()
+
+    def test_train_reads_from_data_source(self) -> None:
+        results = train(str(uuid.uuid4()), {'data_source': self._data_source, 'data_api_key': _API_KEY, 'clusters': 3})
+        self.assertEqual(results.total_data_points, 2500)
+        self.assertEqual(results.cluster_count, 3)
+        results = train(str(uuid.uuid4()), {'data_source': self._data_source, 'data_api_key': _API_KEY,
+                                            'data_points': 100})
+        self.assertEqual(results.total_data_points, 100)
+
+    def test_refresh_only_reads_new_traces(self) -> None:
+        config = {'data_source': self._data_source, 'data_api_key': _API_KEY, 'clusters': 3}
+        base = train(str(uuid.uuid4()), config)
+        self._service.traces.append({'id': 'T9999', 'features': [1.0, 10.0]})
+        self._service.requests.clear()
+        try:
+            results = refresh(str(uuid.uuid4()), config, base)
+            self.assertEqual([params['after'] for params in self._service.requests], [['T2499']])
+            # Refreshing again finds nothing new
+            self.assertEqual(refresh(str(uuid.uuid4()), config, results), results)
+            self.assertEqual(self._service.requests[-1]['after'], ['T9999'])
+        finally:
+            self._service.traces.pop()
+        self.assertEqual(results.total_data_points, 2501)
+        # The new trace has the same features as T0001, so it joins the same cluster
+        self.assertEqual([item.occurrences for item in results], [item.occurrences + ('T0001' in item.members)
+                                                                  for item in base])
+
+    def test_dropped_connection_resumes_the_page(self) -> None:
+        self._service.drop_after = 300
+
+        async def read() -> list[str]:
+            client = TraceClient(self._data_source, retry=RetryPolicy(backoff=0))
+            try:
+                return [trace_id async for trace_id, _ in client.traces(_API_KEY)]
+            finally:
+                await client.aclose()
+
+        trace_ids = asyncio.run(read())
+        self.assertIsNone(self._service.drop_after)
+        self.assertEqual(trace_ids, [trace['id'] for trace in self._service.traces])
+
+
+if __name__ == '__main__':
+    unittest.main()
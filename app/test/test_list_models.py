@@ -0,0 +1,67 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+
+from app.api.rate_limiting import RateLimiter
+from app.api.resources import Model, Status
+from app.main import app
+from app.store import ModelStore
+
+
+class TestListModels(unittest.TestCase):
+    _test_client: TestClient = None
+    _models: list[Model]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._test_client = TestClient(app)
+
+    def setUp(self) -> None:
+        app.state.rate_limiter = RateLimiter.from_env()
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self._models = [Model(id=Model.new_model().id, created_at=start + timedelta(minutes=idx)) for idx in range(5)]
+        model_store = self._test_client.app.state.model_store
+        model_store.put_many(self._models)
+        for model in self._models[1::2]:
+            model_store.set_status(str(model.id), Status.RUNNING)
+
+    def tearDown(self) -> None:
+        self._test_client.app.state.model_store = ModelStore()
+
+    def _list(self, **params) -> dict:
+        response = self._test_client.get('/models', params=params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_list_all(self) -> None:
+        body = self._list()
+        self.assertEqual([model['id'] for model in body['models']], [str(model.id) for model in self._models])
+        self.assertNotIn('next_cursor', body)
+
+    def test_list_by_status(self) -> None:
+        body = self._list(status='running')
+        self.assertEqual([model['id'] for model in body['models']], [str(model.id) for model in self._models[1::2]])
+        self.assertEqual({model['status'] for model in body['models']}, {'running'})
+
+    def test_list_created_after(self) -> None:
+        body = self._list(created_after='2024-01-01T00:02:00Z')
+        self.assertEqual([model['id'] for model in body['models']], [str(model.id) for model in self._models[3:]])
+
+    def test_paging(self) -> None:
+        listed, cursor = [], None
+        while True:
+            body = self._list(limit=2, **({'cursor': cursor} if cursor else {}))
+            listed += [model['id'] for model in body['models']]
+            if (cursor := body.get('next_cursor')) is None:
+                break
+        self.assertEqual(listed, [str(model.id) for model in self._models])
+
+    def test_invalid_cursor(self) -> None:
+        response = self._test_client.get('/models', params={'cursor': 'not a cursor'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['code'], 'invalid_cursor')
+
+
+if __name__ == '__main__':
+    unittest.main()
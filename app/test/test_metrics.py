@@ -0,0 +1,101 @@
+import unittest
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.api.rate_limiting import RateLimiter
+from app.main import app
+from app.metrics import CONTENT_TYPE, Counter, Histogram, render
+from app.store import ModelStore
+
+_MODEL_CONFIG = {'config': {'data_source': 'https://myexampleapi.com', 'data_api_key': 'my_example_api_key'}}
+
+
+def _sample(text: str, name: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(name + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    raise AssertionError(f'{name} is not in the metrics')
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_histogram(self) -> None:
+        histogram = Histogram('latency_seconds', 'Latency.', labels=('route',), buckets=(0.1, 1.0))
+        series = histogram.labels('/models')
+        for value in (0.05, 0.1, 0.5, 2.0):
+            series.observe(value)
+        text = render([histogram]).decode()
+        # Buckets are cumulative and include values equal to their bound
+        self.assertIn('latency_seconds_bucket{route="/models",le="0.1"} 2', text)
+        self.assertIn('latency_seconds_bucket{route="/models",le="1"} 3', text)
+        self.assertIn('latency_seconds_bucket{route="/models",le="+Inf"} 4', text)
+        self.assertIn('latency_seconds_count{route="/models"} 4', text)
+        self.assertEqual(_sample(text, 'latency_seconds_sum{route="/models"}'), 2.65)
+
+    def test_series_are_reused(self) -> None:
+        counter = Counter('requests_total', 'Requests.', labels=('status',))
+        self.assertIs(counter.labels('200'), counter.labels('200'))
+        with self.assertRaises(ValueError):
+            counter.labels('200', 'GET')
+        counter.labels('a "quoted"\nvalue').inc(2)
+        self.assertIn('requests_total{status="a \\"quoted\\"\\nvalue"} 2', render([counter]).decode())
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    _test_client: TestClient = None
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._test_client = TestClient(app)
+
+    def setUp(self) -> None:
+        app.state.rate_limiter = RateLimiter.from_env()
+
+    def tearDown(self) -> None:
+        self._test_client.app.state.model_store = ModelStore()
+
+    def _metrics(self) -> str:
+        response = self._test_client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Type'], CONTENT_TYPE)
+        return response.text
+
+    def test_requests_are_recorded_by_route(self) -> None:
+        route = 'method="GET",route="/models/{model_id}"'
+        before = self._metrics()
+        counts = {status: _sample(before, f'http_requests_total{{{route},status="{status}"}}')
+                  if f'{route},status="{status}"' in before else 0 for status in (200, 404)}
+        model_id = self._test_client.post('/models', json=_MODEL_CONFIG).json()['id']
+        self._test_client.get(f'/models/{model_id}')
+        self._test_client.get(f'/models/{model_id}')
+        self._test_client.get('/models/6c0c6d36-2b55-4a9f-b9a5-0a4c4a5e7f0b')
+        after = self._metrics()
+        # Requests are labelled with the route's template, not the path that was requested
+        self.assertEqual(_sample(after, f'http_requests_total{{{route},status="200"}}'), counts[200] + 2)
+        self.assertEqual(_sample(after, f'http_requests_total{{{route},status="404"}}'), counts[404] + 1)
+        self.assertIn(f'http_request_duration_seconds_bucket{{{route},le="+Inf"}}', after)
+        self.assertIn(f'http_response_size_bytes_sum{{{route}}}', after)
+        self.assertNotIn(model_id, after)
+
+    def test_unknown_methods_share_a_label(self) -> None:
+        method = f'X{uuid.uuid4().hex.upper()}'
+        self.assertEqual(self._test_client.request(method, '/models').status_code, 405)
+        metrics = self._metrics()
+        self.assertNotIn(method, metrics)
+        self.assertIn('http_requests_total{method="other",route=', metrics)
+
+    def test_store_metrics(self) -> None:
+        for idx in range(2):
+            # Identical configs would share a model, so give each model its own
+            self._test_client.post('/models', json={'config': {**_MODEL_CONFIG['config'], 'name': f'model-{idx}'}})
+        text = self._metrics()
+        self.assertEqual(_sample(text, 'model_store_models{status="pending"}'), 2)
+        self.assertEqual(_sample(text, 'model_store_models{status="completed"}'), 0)
+        # The request for the metrics is itself in flight
+        self.assertEqual(_sample(text, 'http_requests_in_flight'), 1)
+        self.assertIn('model_store_expired_total', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
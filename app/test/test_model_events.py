@@ -0,0 +1,144 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import httpx
+
+from app.api.rate_limiting import RateLimiter
+from app.api.resources import Model, Status
+from app.main import app
+from app.store import ModelStore
+from app.store.backends import SQLiteBackend
+from app.store.notifier import StatusNotifier
+
+
+class TestModelEvents(unittest.IsolatedAsyncioTestCase):
+    _client: httpx.AsyncClient
+
+    async def asyncSetUp(self) -> None:
+        app.state.rate_limiter = RateLimiter.from_env()
+        self._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://testserver')
+
+    async def asyncTearDown(self) -> None:
+        await self._client.aclose()
+        app.state.model_store = ModelStore()
+
+    def _add_model(self) -> str:
+        model = Model.new_model()
+        app.state.model_store[str(model.id)] = model
+        return str(model.id)
+
+    async def _update_later(self, model_id: str, *statuses: Status) -> None:
+        for status in statuses:
+            await asyncio.sleep(0.05)
+            app.state.model_store.set_status(model_id, status)
+
+    async def test_long_poll_until_terminal(self) -> None:
+        model_id = self._add_model()
+        update = asyncio.create_task(self._update_later(model_id, Status.RUNNING, Status.COMPLETED))
+        start = time.monotonic()
+        # Without an ETag the request is held until the model has failed or completed
+        response = await self._client.get(f'/models/{model_id}', params={'wait': '5s'})
+        await update
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'completed')
+        self.assertLess(time.monotonic() - start, 5)
+
+    async def test_long_poll_until_changed(self) -> None:
+        model_id = self._add_model()
+        etag = (await self._client.get(f'/models/{model_id}')).headers['ETag']
+        update = asyncio.create_task(self._update_later(model_id, Status.RUNNING))
+        response = await self._client.get(f'/models/{model_id}', params={'wait': '5s'},
+                                          headers={'If-None-Match': etag})
+        await update
+        # The request should return as soon as the model moves on from the client's version
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'running')
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    async def test_long_poll_times_out(self) -> None:
+        model_id = self._add_model()
+        etag = (await self._client.get(f'/models/{model_id}')).headers['ETag']
+        response = await self._client.get(f'/models/{model_id}', params={'wait': '100ms'},
+                                          headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        # Nothing should be left waiting on the model
+        self.assertEqual(app.state.model_store.notifier.waiting(model_id), 0)
+
+    async def test_long_poll_deleted_model(self) -> None:
+        model_id = self._add_model()
+
+        async def delete_later() -> None:
+            await asyncio.sleep(0.05)
+            del app.state.model_store[model_id]
+
+        deletion = asyncio.create_task(delete_later())
+        response = await self._client.get(f'/models/{model_id}', params={'wait': '5s'})
+        await deletion
+        self.assertEqual(response.status_code, 404)
+
+    async def test_invalid_wait(self) -> None:
+        model_id = self._add_model()
+        for wait in ('soon', '-1s', '10m', '61s'):
+            response = await self._client.get(f'/models/{model_id}', params={'wait': wait})
+            self.assertEqual(response.status_code, 400, wait)
+            self.assertEqual(response.json()['errors'][0]['code'], 'invalid_wait')
+
+    async def test_event_stream(self) -> None:
+        model_id = self._add_model()
+        update = asyncio.create_task(self._update_later(model_id, Status.RUNNING, Status.COMPLETED))
+        response = await self._client.get(f'/models/{model_id}/events')
+        await update
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers['Content-Type'].startswith('text/event-stream'))
+        events = [event for event in response.text.split('\n\n') if event]
+        statuses = [json.loads(event.split('data: ')[1].split('\n')[0])['status'] for event in events]
+        # The stream starts with the current status and ends once the model completes
+        self.assertEqual(statuses, ['pending', 'running', 'completed'])
+        self.assertTrue(all(event.startswith('event: status') for event in events))
+
+    async def test_event_stream_deleted_model(self) -> None:
+        model_id = self._add_model()
+
+        async def delete_later() -> None:
+            await asyncio.sleep(0.05)
+            del app.state.model_store[model_id]
+
+        deletion = asyncio.create_task(delete_later())
+        response = await self._client.get(f'/models/{model_id}/events')
+        await deletion
+        self.assertTrue(response.text.rstrip().split('\n\n')[-1].startswith('event: deleted'))
+        response = await self._client.get(f'/models/{model_id}/events')
+        self.assertEqual(response.status_code, 404)
+
+
+class TestStatusNotifier(unittest.IsolatedAsyncioTestCase):
+
+    async def test_publish_from_another_thread(self) -> None:
+        notifier = StatusNotifier()
+        changed = notifier.subscribe('model')
+        threading.Thread(target=notifier.publish, args=('model',)).start()
+        await asyncio.wait_for(changed, timeout=5)
+        self.assertEqual(notifier.waiting('model'), 0)
+
+    async def test_changes_by_other_processes_are_noticed(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'models.db')
+            model_store, other_store = ModelStore(backend=SQLiteBackend(path)), ModelStore(backend=SQLiteBackend(path))
+            model = Model.new_model()
+            model_store[str(model.id)] = model
+            _, version = model_store.versioned(str(model.id))
+            # The other store can't notify this store's waiters, so the change is found by polling the database
+            waiting = asyncio.create_task(model_store.aio.wait_for_change(str(model.id), version, 10))
+            await asyncio.sleep(0.05)
+            await other_store.aio.set_status(str(model.id), Status.RUNNING)
+            (model, _), _ = await asyncio.wait_for(waiting, timeout=5)
+            self.assertEqual(model.status, Status.RUNNING)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,7 @@ import random
 
 from fastapi.testclient import TestClient
 
+from app.api.rate_limiting import RateLimiter
 from app.main import app
 from app.api.resources import Model
 from app.store import ModelStore
@@ -18,6 +19,9 @@ class TestPostModels(unittest.TestCase):
         random.seed(500)
         cls._test_client = TestClient(app)
 
+    def setUp(self) -> None:
+        app.state.rate_limiter = RateLimiter.from_env()
+
     def tearDown(self) -> None:
         # Reset the model store after each test
         self._test_client.app.state.model_store = ModelStore()
@@ -0,0 +1,24 @@
+import unittest
+
+from app.api.negotiation import accepts, parse_accept
+
+
+class TestNegotiation(unittest.TestCase):
+
+    def test_parse_accept(self) -> None:
+        self.assertEqual(parse_accept('application/json, application/x-ndjson;q=0.5, */*;q=0'),
+                         {'application/json': 1.0, 'application/x-ndjson': 0.5, '*/*': 0.0})
+        self.assertEqual(parse_accept(None), {})
+        self.assertEqual(parse_accept('text/plain;q=abc'), {'text/plain': 0.0})
+
+    def test_accepts(self) -> None:
+        self.assertTrue(accepts('application/x-ndjson', 'application/x-ndjson'))
+        self.assertTrue(accepts('Application/X-NDJSON; q=0.1', 'application/x-ndjson'))
+        # Explicitly refused or only matched by a wildcard should not count
+        self.assertFalse(accepts('application/x-ndjson;q=0', 'application/x-ndjson'))
+        self.assertFalse(accepts('*/*', 'application/x-ndjson'))
+        self.assertFalse(accepts(None, 'application/x-ndjson'))
+
+
+if __name__ == '__main__':
+    unittest.main()
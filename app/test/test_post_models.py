@@ -3,6 +3,7 @@ import uuid
 
 from fastapi.testclient import TestClient
 
+from app.api.rate_limiting import RateLimiter
 from app.main import app
 from app.api.resources import Status
 from app.store import ModelStore
@@ -15,6 +16,9 @@ class TestPostModels(unittest.TestCase):
     def setUpClass(cls) -> None:
         cls._test_client = TestClient(app)
 
+    def setUp(self) -> None:
+        app.state.rate_limiter = RateLimiter.from_env()
+
     def tearDown(self) -> None:
         # Reset the model store after each test
         self._test_client.app.state.model_store = ModelStore()
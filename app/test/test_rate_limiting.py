@@ -0,0 +1,156 @@
+import os
+import tempfile
+import unittest
+import uuid
+from unittest import mock
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app.api.rate_limiting import Budget, RateLimiter, is_watch, request_kind
+from app.main import app
+from app.store import ModelStore
+from app.store.backends import SQLiteBackend
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_request_kind(self) -> None:
+        self.assertEqual(request_kind('POST', '/models'), 'create')
+        self.assertEqual(request_kind('POST', '/models:batch'), 'create')
+        self.assertEqual(request_kind('POST', '/models/abc:refresh'), 'create')
+        self.assertEqual(request_kind('GET', '/models'), 'poll')
+        self.assertEqual(request_kind('GET', '/models/abc'), 'poll')
+        self.assertEqual(request_kind('GET', '/models/abc/events'), 'poll')
+        self.assertEqual(request_kind('GET', '/models/abc/results'), 'results')
+        self.assertIsNone(request_kind('DELETE', '/models/abc'))
+        self.assertIsNone(request_kind('GET', '/healthz'))
+        self.assertTrue(is_watch('GET', '/models/abc/events', b''))
+        self.assertTrue(is_watch('GET', '/models/abc', b'wait=30s'))
+        self.assertTrue(is_watch('GET', '/models/abc', b'a=b&wait=30s'))
+        self.assertFalse(is_watch('GET', '/models/abc', b''))
+        self.assertFalse(is_watch('GET', '/models/abc/results', b'wait=30s'))
+
+    def test_from_env(self) -> None:
+        with mock.patch.dict('os.environ', {'RATE_LIMIT_CREATE': '2,10', 'RATE_LIMIT_POLL': '0',
+                                            'MAX_IN_FLIGHT_RESULTS': '8', 'MAX_IN_FLIGHT': '100'}):
+            limiter = RateLimiter.from_env()
+        self.assertEqual(limiter.budgets['create'], Budget(rate=2, burst=10))
+        self.assertEqual(limiter.budgets['poll'].rate, 0)
+        self.assertEqual(limiter.budgets['results'].max_in_flight, 8)
+        self.assertEqual(limiter.max_in_flight, 100)
+        self.assertEqual(Budget.parse('5'), Budget(rate=5, burst=5))
+        with mock.patch.dict('os.environ', {'RATE_LIMITS': 'off'}):
+            self.assertFalse(RateLimiter.from_env().enabled)
+        with self.assertRaises(ValueError):
+            Budget(rate=1, burst=0.5)
+
+    def test_in_flight_caps(self) -> None:
+        limiter = RateLimiter(budgets={'results': Budget(max_in_flight=1)}, max_in_flight=2)
+        self.assertTrue(limiter.enter('results'))
+        self.assertFalse(limiter.enter('results'))
+        self.assertTrue(limiter.enter('poll'))
+        # Every kind of request counts towards the overall cap
+        self.assertFalse(limiter.enter('poll'))
+        limiter.leave('results')
+        self.assertTrue(limiter.enter('results'))
+        # Watches have their own cap, and don't count towards the others
+        limiter = RateLimiter(max_in_flight=1, max_watches=2)
+        self.assertTrue(limiter.enter('poll'))
+        self.assertTrue(limiter.enter('poll', watch=True))
+        self.assertTrue(limiter.enter('poll', watch=True))
+        self.assertFalse(limiter.enter('poll', watch=True))
+        limiter.leave('poll', watch=True)
+        self.assertTrue(limiter.enter('poll', watch=True))
+
+    def test_least_recently_used_clients_are_forgotten(self) -> None:
+        limiter = RateLimiter(max_clients=2)
+        budget = Budget(rate=1, burst=1)
+        for client in ('a', 'b', 'c'):
+            self.assertEqual(limiter._take_token(client, budget), 0)
+        self.assertEqual(len(limiter), 2)
+        self.assertGreater(limiter._take_token('c', budget), 0)
+        # The first client's bucket was evicted, so it starts again with a full one
+        self.assertEqual(limiter._take_token('a', budget), 0)
+
+    def test_shared_buckets(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'models.db')
+            backend, other_backend = SQLiteBackend(path), SQLiteBackend(path)
+            self.assertEqual(backend.take_token('client', 1, 2), 0)
+            self.assertEqual(other_backend.take_token('client', 1, 2), 0)
+            # Both workers took a token from the same bucket, which is now empty
+            self.assertAlmostEqual(backend.take_token('client', 1, 2), 1, delta=0.1)
+            self.assertEqual(backend.take_token('other client', 1, 2), 0)
+            backend.close()
+            other_backend.close()
+
+
+class TestRateLimitMiddleware(unittest.TestCase):
+    _test_client: TestClient = None
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._test_client = TestClient(app)
+
+    def tearDown(self) -> None:
+        app.state.model_store = ModelStore()
+        app.state.rate_limiter = RateLimiter.from_env()
+
+    def _assert_throttled(self, response: httpx.Response, code: str) -> None:
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response.headers['Retry-After']), 1)
+        self.assertEqual(response.json()['errors'][0]['code'], code)
+
+    def test_clients_are_throttled_separately(self) -> None:
+        app.state.rate_limiter = RateLimiter(budgets={'poll': Budget(rate=0.1, burst=2)})
+        url = f'/models/{uuid.uuid4()}'
+        for _ in range(2):
+            self.assertEqual(self._test_client.get(url).status_code, 404)
+        response = self._test_client.get(url)
+        self._assert_throttled(response, 'rate_limited')
+        self.assertEqual(response.headers['Retry-After'], '10')
+        # Clients are told apart by their address, so sending an API key doesn't get a client a new budget
+        self._assert_throttled(self._test_client.get(url, headers={'X-API-Key': 'a'}), 'rate_limited')
+        other_client = TestClient(app, client=('10.0.0.2', 50000))
+        self.assertEqual(other_client.get(url).status_code, 404)
+        # Other kinds of request have their own budgets, and health checks are never limited
+        self.assertEqual(self._test_client.get(f'{url}/results').status_code, 404)
+        self.assertEqual(self._test_client.get('/healthz').status_code, 204)
+        metrics = self._test_client.get('/metrics').text
+        self.assertIn('http_requests_throttled_total{kind="poll",reason="rate"}', metrics)
+
+    def test_busy_workers_reject_requests(self) -> None:
+        limiter = app.state.rate_limiter = RateLimiter(budgets={'results': Budget(max_in_flight=1)})
+        limiter.enter('results')
+        self._assert_throttled(self._test_client.get(f'/models/{uuid.uuid4()}/results'), 'server_busy')
+        self.assertEqual(self._test_client.get(f'/models/{uuid.uuid4()}').status_code, 404)
+        limiter.leave('results')
+        self.assertEqual(self._test_client.get(f'/models/{uuid.uuid4()}/results').status_code, 404)
+
+    def test_watches_are_not_counted_as_in_flight(self) -> None:
+        limiter = app.state.rate_limiter = RateLimiter(max_in_flight=1)
+        limiter.enter('poll')
+        self.assertEqual(self._test_client.get(f'/models/{uuid.uuid4()}?wait=1s').status_code, 404)
+        self._assert_throttled(self._test_client.get(f'/models/{uuid.uuid4()}'), 'server_busy')
+        limiter.leave('poll')
+
+    def test_limits_are_shared_through_the_store(self) -> None:
+        app.state.rate_limiter = RateLimiter(budgets={'poll': Budget(rate=0.1, burst=1)})
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'models.db')
+            app.state.model_store = ModelStore(backend=SQLiteBackend(path))
+            self.assertEqual(self._test_client.get(f'/models/{uuid.uuid4()}').status_code, 404)
+            # Another worker's limiter uses the same buckets
+            app.state.rate_limiter = RateLimiter(budgets={'poll': Budget(rate=0.1, burst=1)})
+            self._assert_throttled(self._test_client.get(f'/models/{uuid.uuid4()}'), 'rate_limited')
+            app.state.model_store.backend.close()
+
+    def test_limits_can_be_turned_off(self) -> None:
+        app.state.rate_limiter = RateLimiter(budgets={'poll': Budget(rate=0.1, burst=1)}, enabled=False)
+        for _ in range(3):
+            self.assertEqual(self._test_client.get(f'/models/{uuid.uuid4()}').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.api.rate_limiting import RateLimiter
+from app.api.resources import Model, ModelConfig, ResultItem, Status
+from app.main import app
+from app.store import ModelStore
+from app.store.result_set import ResultSet
+from app.training.worker import train
+
+_CONFIG = {'data_source': 'https://traces.example.com', 'data_api_key': 'my_example_api_key', 'data_points': 100}
+
+
+def _train() -> ResultSet:
+    # Train with the config in the form the API passes it to the scheduler
+    return train(str(uuid.uuid4()), ModelConfig(**_CONFIG).model_dump(mode='json'))
+
+
+class TestRefreshModel(unittest.TestCase):
+    _test_client: TestClient = None
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._test_client = TestClient(app)
+
+    def setUp(self) -> None:
+        app.state.rate_limiter = RateLimiter.from_env()
+
+    def tearDown(self) -> None:
+        self._test_client.app.state.model_store = ModelStore()
+
+    def _add_model(self, status: Status, results: list[ResultItem] | None = None) -> str:
+        model = Model.new_model()
+        model_store = self._test_client.app.state.model_store
+        model_store[str(model.id)] = model
+        if status != Status.PENDING:
+            model_store.set_status(str(model.id), status, results=results)
+        return str(model.id)
+
+    def test_refresh(self) -> None:
+        model_id = self._add_model(Status.COMPLETED, _train())
+        response = self._test_client.post(f'/models/{model_id}:refresh', json={'config': _CONFIG})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['status'], 'pending')
+        self.assertNotEqual(response.json()['id'], model_id)
+        self.assertTrue(response.headers['Location'].endswith(f'/models/{response.json()["id"]}'))
+        self.assertEqual(len(self._test_client.app.state.model_store), 2)
+
+    def test_unknown_model(self) -> None:
+        response = self._test_client.post(f'/models/{uuid.uuid4()}:refresh', json={'config': _CONFIG})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['errors'][0]['code'], 'model_not_found')
+
+    def test_only_trained_models_can_be_refreshed(self) -> None:
+        model_ids = [self._add_model(Status.PENDING), self._add_model(Status.FAILED),
+                     # Results which were not built by training have no checkpoint to carry on from
+                     self._add_model(Status.COMPLETED, [ResultItem(cluster=0, occurrences=1, members=['A'])])]
+        for model_id in model_ids:
+            response = self._test_client.post(f'/models/{model_id}:refresh', json={'config': _CONFIG})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['errors'][0]['code'], 'model_not_refreshable')
+        self.assertEqual(len(self._test_client.app.state.model_store), 3)
+
+    def test_data_source_must_match(self) -> None:
+        model_id = self._add_model(Status.COMPLETED, _train())
+        config = {**_CONFIG, 'data_source': 'https://other.example.com'}
+        response = self._test_client.post(f'/models/{model_id}:refresh', json={'config': config})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['code'], 'model_not_refreshable')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import os
+import pickle
+import struct
+import tempfile
+import unittest
+
+from app.api.resources import ResultItem
+from app.store.result_set import ResultSet
+
+
+class TestResultSet(unittest.TestCase):
+    _items: list[ResultItem]
+    _results: ResultSet
+
+    def setUp(self) -> None:
+        self._items = [
+            ResultItem(cluster=0, occurrences=10, members=['ALPHA', 'BRAVO', 'CHARLIE']),
+            ResultItem(cluster=3, occurrences=4, members=['BRAVO']),
+            ResultItem(cluster=7, occurrences=1, members=[])
+        ]
+        self._results = ResultSet.from_items(self._items)
+
+    def test_behaves_like_a_list(self) -> None:
+        self.assertEqual(len(self._results), 3)
+        self.assertEqual(list(self._results), self._items)
+        self.assertEqual(self._results, self._items)
+        self.assertEqual(self._results[1], self._items[1])
+        self.assertEqual(self._results[-1], self._items[-1])
+        self.assertEqual(self._results[1:], self._items[1:])
+        with self.assertRaises(IndexError):
+            self._results[3]
+
+    def test_totals(self) -> None:
+        self.assertEqual(self._results.cluster_count, 3)
+        self.assertEqual(self._results.total_data_points, 15)
+
+    def test_strings_are_interned(self) -> None:
+        # BRAVO is a member of two clusters but should only be stored once
+        self.assertEqual(self._results.strings, b'ALPHABRAVOCHARLIE')
+        self.assertEqual(len(self._results.member_refs), 4)
+
+    def test_member_pages(self) -> None:
+        self.assertEqual(self._results.members(0, 1, 2), ['BRAVO'])
+        self.assertEqual(self._results.members(0, 1), ['BRAVO', 'CHARLIE'])
+        self.assertEqual(self._results.members(0, 5), [])
+        self.assertEqual(self._results.member_count(0), 3)
+        self.assertEqual(self._results.item(0, 0, 1), ResultItem(cluster=0, occurrences=10, members=['ALPHA']))
+
+    def test_index_of(self) -> None:
+        self.assertEqual(self._results.index_of(7), 2)
+        self.assertIsNone(self._results.index_of(1))
+
+    def test_serialisation(self) -> None:
+        self.assertEqual(ResultSet.from_bytes(self._results.to_bytes()), self._items)
+        self.assertEqual(pickle.loads(pickle.dumps(self._results)), self._items)
+        self.assertEqual(ResultSet.from_bytes(ResultSet.from_items([]).to_bytes()), [])
+        with self.assertRaises(ValueError):
+            ResultSet.from_bytes(b'\0' * 64)
+
+    def test_checkpoint(self) -> None:
+        results = ResultSet.from_items(self._items, checkpoint=b'CHECKPOINT')
+        copy = ResultSet.from_bytes(results.to_bytes())
+        self.assertEqual(copy, self._items)
+        self.assertEqual(copy.checkpoint, b'CHECKPOINT')
+        self.assertEqual(pickle.loads(pickle.dumps(results)).checkpoint, b'CHECKPOINT')
+        self.assertIsNone(ResultSet.from_bytes(self._results.to_bytes()).checkpoint)
+
+    def _legacy(self, version: int, checkpoint: bytes = b'') -> bytes:
+        # Before version 3 there were no flags, and the columns were packed together without any alignment
+        results = self._results
+        counts = (len(results.labels), len(results.member_refs), len(results.string_offsets) - 1)
+        header = struct.pack('<4sHQQQ', b'RSET', 1, *counts) if version == 1 else \
+            struct.pack('<4sHQQQQ', b'RSET', 2, *counts, len(checkpoint))
+        columns = (results.labels, results.occurrences, results.member_offsets, results.member_refs,
+                   results.string_offsets)
+        return header + b''.join(column.tobytes() for column in columns) + results.strings + checkpoint
+
+    def test_reads_version_1(self) -> None:
+        # Results stored before checkpoints were added have a shorter header and nothing after the strings
+        results = ResultSet.from_bytes(self._legacy(1))
+        self.assertEqual(results, self._items)
+        self.assertIsNone(results.checkpoint)
+
+    def test_reads_version_2(self) -> None:
+        results = ResultSet.from_bytes(self._legacy(2, b'CHECKPOINT'))
+        self.assertEqual(results, self._items)
+        self.assertEqual(results.checkpoint, b'CHECKPOINT')
+        self.assertTrue(results.plain_strings)
+        self.assertEqual(ResultSet.from_buffer(self._legacy(2)), self._items)
+
+    def test_columns_are_aligned(self) -> None:
+        data = self._results.to_bytes()
+        self.assertEqual(len(data) % 8, 0)
+        view = ResultSet.from_buffer(data)
+        for name in ('labels', 'occurrences', 'member_offsets', 'member_refs', 'string_offsets', 'strings'):
+            column = getattr(view, name)
+            # Each column is a view of the data, starting on an 8 byte boundary
+            self.assertIsInstance(column, memoryview)
+            self.assertEqual(column.obj, data)
+        self.assertEqual(view, self._items)
+
+    def test_mapped(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.rset')
+            results = ResultSet.from_items(self._items, checkpoint=b'CHECKPOINT')
+            with open(path, 'wb') as file:
+                self.assertEqual(results.write(file), len(results.to_bytes()))
+            mapped = ResultSet.map(path)
+            self.assertTrue(mapped.mapped)
+            self.assertFalse(results.mapped)
+            self.assertEqual(mapped, self._items)
+            self.assertEqual(mapped.checkpoint, b'CHECKPOINT')
+            self.assertEqual(mapped.total_data_points, 15)
+            self.assertEqual(mapped.index_of(7), 2)
+            self.assertIsNone(mapped.index_of(1))
+            self.assertEqual(mapped.members(0, 1, 2), ['BRAVO'])
+            self.assertEqual([bytes(member) for member in mapped.member_bytes(0)], [b'ALPHA', b'BRAVO', b'CHARLIE'])
+            # The mapped pages are not counted as memory used by the result set
+            self.assertEqual(mapped.nbytes, 0)
+            # Pickling copies the data out of the file
+            copy = pickle.loads(pickle.dumps(mapped))
+            self.assertFalse(copy.mapped)
+            self.assertEqual(copy, self._items)
+
+    def test_plain_strings(self) -> None:
+        self.assertTrue(self._results.plain_strings)
+        for member in ('say "hi"', 'back\\slash', 'new\nline'):
+            results = ResultSet.from_items([ResultItem(cluster=0, occurrences=1, members=[member])])
+            self.assertFalse(results.plain_strings)
+            self.assertFalse(ResultSet.from_bytes(results.to_bytes()).plain_strings)
+        self.assertTrue(ResultSet.from_items([ResultItem(cluster=0, occurrences=1, members=['café'])]).plain_strings)
+
+if __name__ == '__main__':
+    unittest.main()
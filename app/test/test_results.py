@@ -1,3 +1,4 @@
+import json
 import random
 import re
 import unittest
@@ -6,7 +7,8 @@ from typing import Any
 
 from fastapi.testclient import TestClient
 
-from app.api.resources import Status
+from app.api.rate_limiting import RateLimiter
+from app.api.resources import Model, ResultItem, Status
 from app.store import ModelStore
 from app.main import app
 
@@ -32,6 +34,9 @@ class TestGetResults(unittest.TestCase):
         random.seed(10)
         cls._test_client = TestClient(app)
 
+    def setUp(self) -> None:
+        app.state.rate_limiter = RateLimiter.from_env()
+
     def tearDown(self) -> None:
         # Reset the model store after each test
         self._test_client.app.state.model_store = ModelStore()
@@ -108,6 +113,79 @@ class TestGetResults(unittest.TestCase):
         self.assertEqual(results_resp.status_code, 400)
         self._check_error_response(results_resp.json())
 
+    def _create_completed_model(self, clusters: int, members: int) -> str:
+        model = Model(id=uuid.uuid4(), status=Status.COMPLETED)
+        results = [ResultItem(cluster=idx, occurrences=members * 2,
+                              members=[f'M{idx}-{member}' for member in range(members)])
+                   for idx in range(clusters)]
+        self._test_client.app.state.model_store[str(model.id)] = (model, results)
+        return str(model.id)
+
+    def test_get_results_paginated_clusters(self) -> None:
+        model_id = self._create_completed_model(clusters=5, members=3)
+        labels, cursor, pages = [], None, 0
+        while True:
+            params = {'limit': 2} | ({'cursor': cursor} if cursor else {})
+            response = self._test_client.get(f'/models/{model_id}/results', params=params)
+            self.assertEqual(response.status_code, 200)
+            results = response.json()['results']
+            # The totals should always describe the whole model, not just the page
+            self.assertEqual(results['cluster_count'], 5)
+            self.assertEqual(results['total_data_points'], 30)
+            labels.extend(cluster['cluster_label'] for cluster in results['clusters'])
+            pages += 1
+            if (cursor := response.json().get('next_cursor')) is None:
+                break
+        self.assertEqual(pages, 3)
+        self.assertEqual(labels, [0, 1, 2, 3, 4])
+
+    def test_get_results_single_cluster(self) -> None:
+        model_id = self._create_completed_model(clusters=3, members=5)
+        response = self._test_client.get(f'/models/{model_id}/results', params={'cluster': 1, 'limit': 3})
+        self.assertEqual(response.status_code, 200)
+        clusters = response.json()['results']['clusters']
+        self.assertEqual(len(clusters), 1)
+        self.assertEqual(clusters[0], {'cluster_label': 1, 'occurrences': 10, 'members': ['M1-0', 'M1-1', 'M1-2']})
+        # The rest of the members should be on the next page
+        cursor = response.json()['next_cursor']
+        response = self._test_client.get(f'/models/{model_id}/results', params={'cluster': 1, 'cursor': cursor})
+        self.assertEqual(response.json()['results']['clusters'][0]['members'], ['M1-3', 'M1-4'])
+        self.assertNotIn('next_cursor', response.json())
+
+    def test_get_results_pagination_errors(self) -> None:
+        model_id = self._create_completed_model(clusters=2, members=2)
+        # Unknown clusters should be reported as not found
+        response = self._test_client.get(f'/models/{model_id}/results', params={'cluster': 7})
+        self.assertEqual(response.status_code, 404)
+        self._check_error_response(response.json())
+        # Cursors that weren't returned by the API should be rejected
+        response = self._test_client.get(f'/models/{model_id}/results', params={'cursor': '!not-a-cursor!'})
+        self.assertEqual(response.status_code, 400)
+        self._check_error_response(response.json())
+        # As should page sizes that are out of range
+        response = self._test_client.get(f'/models/{model_id}/results', params={'limit': 0})
+        self.assertEqual(response.status_code, 422)
+
+    def test_get_results_as_ndjson(self) -> None:
+        model_id = self._create_completed_model(clusters=3, members=2)
+        expected = self._test_client.get(f'/models/{model_id}/results').json()['results']
+        response = self._test_client.get(f'/models/{model_id}/results', headers={'Accept': 'application/x-ndjson'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers['Content-Type'].startswith('application/x-ndjson'))
+        header, *clusters = [json.loads(line) for line in response.text.splitlines()]
+        # The first line should hold the totals, followed by one line per cluster
+        self.assertEqual(header, {'cluster_count': 3, 'total_data_points': 12})
+        self.assertEqual(clusters, expected['clusters'])
+        # Paging should also work when streaming, with the cursor in the first line
+        response = self._test_client.get(f'/models/{model_id}/results', params={'limit': 2},
+                                         headers={'Accept': 'application/x-ndjson'})
+        header, *clusters = [json.loads(line) for line in response.text.splitlines()]
+        self.assertIn('next_cursor', header)
+        self.assertEqual(clusters, expected['clusters'][:2])
+        # Clients which don't ask for NDJSON should still get a single JSON document
+        response = self._test_client.get(f'/models/{model_id}/results', headers={'Accept': '*/*'})
+        self.assertEqual(response.headers['Content-Type'], 'application/json')
+
 
 if __name__ == '__main__':
     unittest.main()
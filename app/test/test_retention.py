@@ -0,0 +1,123 @@
+import os
+import tempfile
+import time
+import unittest
+
+from app.api.resources import Model, ResultItem, Status
+from app.store import ModelStore
+from app.store.backends import MemoryBackend
+from app.store.retention import RetentionPolicy
+from app.store.result_set import ResultSet
+
+
+def _results(count: int = 20) -> ResultSet:
+    return ResultSet.from_items(ResultItem(cluster=idx, occurrences=idx + 1, members=[f'TRACE{idx:05d}'] * 3)
+                                for idx in range(count))
+
+
+class TestRetention(unittest.TestCase):
+
+    def _make_store(self, **policy) -> ModelStore:
+        model_store = ModelStore(backend=MemoryBackend(retention=RetentionPolicy(**policy)))
+        self.addCleanup(model_store.backend.close)
+        return model_store
+
+    def _add(self, model_store: ModelStore, status: Status = Status.PENDING, results: ResultSet | None = None) -> str:
+        model = Model.new_model()
+        model_store[str(model.id)] = model
+        if status != Status.PENDING:
+            model_store.set_status(str(model.id), status, results=results)
+        return str(model.id)
+
+    def test_terminal_models_expire(self) -> None:
+        model_store = self._make_store(completed_ttl=0.05, failed_ttl=60)
+        completed = self._add(model_store, Status.COMPLETED, _results())
+        failed = self._add(model_store, Status.FAILED)
+        running = self._add(model_store, Status.RUNNING)
+        self.assertIn(completed, model_store)
+        time.sleep(0.1)
+        # Expired models are hidden from readers before they are removed
+        self.assertNotIn(completed, model_store)
+        self.assertIsNone(model_store.get(completed))
+        with self.assertRaises(KeyError):
+            model_store.completed_results(completed)
+        self.assertIn(failed, model_store)
+        self.assertIn(running, model_store)
+        # The next write removes them
+        self._add(model_store)
+        self.assertEqual(len(model_store), 3)
+        self.assertEqual(model_store.backend.metrics()['expired_total'], 1)
+        self.assertEqual(model_store.backend.metrics()['resident_result_bytes'], 0)
+
+    def test_expired_models_are_not_counted(self) -> None:
+        model_store = self._make_store(completed_ttl=0.05)
+        completed = self._add(model_store, Status.COMPLETED, _results())
+        self._add(model_store, Status.RUNNING)
+        time.sleep(0.1)
+        # Without any write since the model expired, counts and listings still agree with lookups
+        self.assertIsNone(model_store.get(completed))
+        self.assertEqual(len(model_store), 1)
+        self.assertNotIn(completed, list(model_store.backend))
+        self.assertEqual(model_store.status_counts()[Status.COMPLETED], 0)
+        self.assertEqual(model_store.status_counts()[Status.RUNNING], 1)
+        self.assertEqual(model_store.backend.metrics()['models'], 1)
+
+    def test_least_recently_used_terminal_models_are_evicted(self) -> None:
+        model_store = self._make_store(max_models=3)
+        pending = self._add(model_store)
+        first = self._add(model_store, Status.FAILED)
+        second = self._add(model_store, Status.FAILED)
+        # Reading the first model makes the second the least recently used
+        model_store.get(first)
+        self._add(model_store, Status.FAILED)
+        self.assertNotIn(second, model_store)
+        self.assertIn(first, model_store)
+        # Models with work in flight are never evicted, even if that means going over the limit
+        for _ in range(3):
+            self._add(model_store, Status.RUNNING)
+        self.assertIn(pending, model_store)
+        self.assertEqual(len(model_store), 4)
+        self.assertEqual(model_store.backend.metrics()['evicted_total'], 3)
+
+    def test_results_are_spilled_to_disk(self) -> None:
+        results = _results()
+        with tempfile.TemporaryDirectory() as directory:
+            model_store = self._make_store(max_result_bytes=int(results.nbytes * 2.5), spill_path=directory)
+            model_ids = [self._add(model_store, Status.COMPLETED, _results()) for _ in range(3)]
+            metrics = model_store.backend.metrics()
+            self.assertEqual(metrics['spilled_total'], 1)
+            self.assertEqual(metrics['spilled_results'], 1)
+            self.assertLessEqual(metrics['resident_result_bytes'], results.nbytes * 2.5)
+            self.assertTrue(os.path.exists(os.path.join(directory, f'{model_ids[0]}.rset')))
+
+            # The spilled results are read back when needed, without changing the version of the entry
+            version = model_store.versioned(model_ids[1])[1]
+            model, spilled_results, _ = model_store.completed_results(model_ids[0])
+            self.assertEqual(model.status, Status.COMPLETED)
+            self.assertEqual(spilled_results, results)
+            self.assertEqual(model_store.backend.metrics()['reloaded_total'], 1)
+            # Reloading them made room by spilling the least recently used results
+            self.assertFalse(os.path.exists(os.path.join(directory, f'{model_ids[0]}.rset')))
+            self.assertEqual(model_store.versioned(model_ids[1])[1], version)
+            self.assertEqual(model_store.get_results(model_ids[1]), list(results))
+
+            # Deleting a model removes its spilled results
+            del model_store[model_ids[2]]
+            del model_store[model_ids[1]]
+            self.assertEqual(os.listdir(directory), [])
+            self.assertEqual(model_store.backend.metrics()['spilled_result_bytes'], 0)
+
+    def test_from_env(self) -> None:
+        os.environ.update(MODEL_TTL_COMPLETED='3600', MODEL_STORE_MAX_MODELS='10')
+        self.addCleanup(os.environ.pop, 'MODEL_TTL_COMPLETED')
+        self.addCleanup(os.environ.pop, 'MODEL_STORE_MAX_MODELS')
+        policy = RetentionPolicy.from_env()
+        self.assertEqual(policy.ttl(Status.COMPLETED), 3600)
+        self.assertIsNone(policy.ttl(Status.FAILED))
+        self.assertIsNone(policy.ttl(Status.RUNNING))
+        self.assertEqual(policy.max_models, 10)
+        self.assertIsNone(policy.max_result_bytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import json
+import unittest
+import uuid
+
+from app.api import serializers
+from app.api.resources import Model, ResultItem, Status
+from app.store.result_set import ResultSet
+
+
+class TestSerializers(unittest.TestCase):
+
+    def tearDown(self) -> None:
+        serializers.use_serializer(None)
+
+    def test_serializers_agree(self) -> None:
+        model = Model(id=uuid.uuid4(), status=Status.FAILED, errors=[{'code': 'training_failed', 'message': 'Oops ✗'}])
+        results = ResultSet.from_items([ResultItem(cluster=0, occurrences=2, members=['A', 'B'])])
+        encoded = []
+        for name in ('stdlib', 'orjson'):
+            serializers.use_serializer(name)
+            encoded.append((serializers.encode_model(model), serializers.encode_results(results)))
+        for encoded_model, encoded_results in encoded:
+            self.assertEqual(json.loads(encoded_model), model.json())
+            self.assertEqual(json.loads(encoded_results), {
+                'results': {
+                    'cluster_count': 1,
+                    'total_data_points': 2,
+                    'clusters': [{'cluster_label': 0, 'occurrences': 2, 'members': ['A', 'B']}]
+                }
+            })
+
+    def test_clusters_are_encoded_from_the_result_set(self) -> None:
+        items = [ResultItem(cluster=2, occurrences=5, members=['A', 'café', 'B']),
+                 ResultItem(cluster=4, occurrences=1, members=[])]
+        # Members which must be escaped can't be copied straight into the JSON
+        escaped = items + [ResultItem(cluster=5, occurrences=1, members=['say "hi"', 'back\\slash\n'])]
+        for results in (ResultSet.from_items(items), ResultSet.from_items(escaped)):
+            self.assertEqual(json.loads(serializers.encode_results(results))['results']['clusters'],
+                             [item.json() for item in results])
+            self.assertEqual(json.loads(serializers.encode_cluster(results, 0, 1, 2)),
+                             {'cluster_label': 2, 'occurrences': 5, 'members': ['café']})
+            page = json.loads(serializers.encode_results(results, [(1, 0, None)], next_cursor='abc'))
+            self.assertEqual(page, {
+                'results': {'cluster_count': len(results), 'total_data_points': results.total_data_points,
+                            'clusters': [{'cluster_label': 4, 'occurrences': 1, 'members': []}]},
+                'next_cursor': 'abc'
+            })
+
+    def test_unknown_serializer(self) -> None:
+        with self.assertRaises(ValueError):
+            serializers.use_serializer('pickle')
+
+
+if __name__ == '__main__':
+    unittest.main()
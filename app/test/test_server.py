@@ -0,0 +1,40 @@
+import unittest
+from unittest import mock
+
+from app.server import ServerConfig, configure_workers, parse_args
+
+
+class TestServer(unittest.TestCase):
+
+    def test_from_env(self) -> None:
+        environ = {'PORT': '9000', 'WEB_CONCURRENCY': '4', 'KEEP_ALIVE': '', 'LOG_LEVEL': 'warning'}
+        with mock.patch.dict('os.environ', environ, clear=True):
+            config = ServerConfig.from_env()
+        self.assertEqual(config, ServerConfig(port=9000, workers=4, log_level='warning'))
+
+    def test_arguments_override_the_environment(self) -> None:
+        with mock.patch.dict('os.environ', {'PORT': '9000', 'WEB_CONCURRENCY': '4'}, clear=True):
+            config = parse_args(['--workers', '2', '--backlog', '512'])
+        self.assertEqual(config, ServerConfig(port=9000, workers=2, backlog=512))
+
+    def test_single_worker_keeps_the_environment(self) -> None:
+        environ = {}
+        configure_workers(ServerConfig(), environ)
+        self.assertEqual(environ, {})
+
+    def test_workers_share_a_backend(self) -> None:
+        environ = {}
+        with mock.patch('os.cpu_count', return_value=8):
+            configure_workers(ServerConfig(workers=4), environ)
+        self.assertEqual(environ, {'MODEL_STORE_BACKEND': 'sqlite', 'TRAINING_WORKERS': '2'})
+
+        environ = {'MODEL_STORE_BACKEND': 'sqlite', 'TRAINING_WORKERS': '3'}
+        with mock.patch('os.cpu_count', return_value=1):
+            configure_workers(ServerConfig(workers=4), environ)
+        self.assertEqual(environ, {'MODEL_STORE_BACKEND': 'sqlite', 'TRAINING_WORKERS': '3'})
+
+    def test_workers_cannot_use_the_memory_backend(self) -> None:
+        with self.assertRaises(ValueError):
+            configure_workers(ServerConfig(workers=2), {'MODEL_STORE_BACKEND': 'memory'})
+        with self.assertRaises(ValueError):
+            configure_workers(ServerConfig(workers=0), {})
@@ -0,0 +1,160 @@
+import os
+import tempfile
+import unittest
+import uuid
+from dataclasses import replace
+
+from app.api.resources import Model, ResultItem, Status
+from app.store import ModelStore
+from app.store.backends import MemoryBackend, SQLiteBackend
+from app.store.result_set import ResultSet
+from app.store.snapshots import ResultSnapshots
+
+_ITEMS = [
+    ResultItem(cluster=0, occurrences=10, members=['ALPHA', 'BRAVO']),
+    ResultItem(cluster=1, occurrences=2, members=['CHARLIE'])
+]
+
+
+class TestResultSnapshots(unittest.TestCase):
+    _snapshots: ResultSnapshots
+
+    def setUp(self) -> None:
+        self._snapshots = ResultSnapshots(max_open=2)
+
+    def tearDown(self) -> None:
+        self._snapshots.close()
+
+    def test_put_and_get(self) -> None:
+        mapped = self._snapshots.put('a', 3, ResultSet.from_items(_ITEMS))
+        self.assertTrue(mapped.mapped)
+        self.assertEqual(mapped, _ITEMS)
+        self.assertIs(self._snapshots.get('a', 3), mapped)
+        self.assertEqual(self._snapshots.version('a'), 3)
+        # Only the version that was written has a snapshot
+        self.assertIsNone(self._snapshots.get('a', 4))
+        self.assertIsNone(self._snapshots.get('b', 3))
+
+    def test_only_recently_used_snapshots_stay_mapped(self) -> None:
+        for model_id in ('a', 'b', 'c'):
+            self._snapshots.put(model_id, 0, ResultSet.from_items(_ITEMS))
+        self.assertEqual(len(self._snapshots), 2)
+        self.assertIsNone(self._snapshots.version('a'))
+        # A snapshot which is no longer mapped is mapped again from its file
+        self.assertEqual(self._snapshots.get('a', 0), _ITEMS)
+        self.assertEqual(self._snapshots.version('a'), 0)
+        self.assertIsNone(self._snapshots.version('b'))
+
+    def test_discard(self) -> None:
+        self._snapshots.put('a', 0, ResultSet.from_items(_ITEMS))
+        mapped = self._snapshots.put('a', 1, ResultSet.from_items(_ITEMS))
+        self._snapshots.discard('a', 0)
+        self.assertIsNone(self._snapshots.get('a', 0))
+        self.assertIs(self._snapshots.get('a', 1), mapped)
+        self._snapshots.discard('a')
+        self.assertIsNone(self._snapshots.get('a', 1))
+        self.assertFalse(os.path.exists(os.path.join(self._snapshots.directory, 'a')))
+        # Results that were already mapped can still be read
+        self.assertEqual(mapped, _ITEMS)
+
+    def test_temporary_directory_is_removed(self) -> None:
+        self._snapshots.put('a', 0, ResultSet.from_items(_ITEMS))
+        directory = self._snapshots.directory
+        self._snapshots.close()
+        self.assertFalse(os.path.exists(directory))
+
+
+class TestMemoryBackendSnapshots(unittest.TestCase):
+    _model_store: ModelStore
+
+    def setUp(self) -> None:
+        self._model_store = ModelStore(backend=MemoryBackend(snapshots=ResultSnapshots()))
+
+    def tearDown(self) -> None:
+        self._model_store.backend.close()
+
+    def _completed_model(self) -> str:
+        model = Model(id=uuid.uuid4(), status=Status.COMPLETED)
+        self._model_store[str(model.id)] = (model, _ITEMS)
+        return str(model.id)
+
+    def test_completed_results_are_served_from_a_snapshot(self) -> None:
+        model_id = self._completed_model()
+        self.assertGreater(self._model_store.backend.metrics()['resident_result_bytes'], 0)
+        _, version = self._model_store.versioned(model_id)
+        _, results, snapshot_version = self._model_store.completed_results(model_id)
+        self.assertTrue(results.mapped)
+        self.assertEqual(results, _ITEMS)
+        # Snapshotting doesn't change the contents of the entry, so it keeps the same version
+        self.assertEqual(snapshot_version, version)
+        metrics = self._model_store.backend.metrics()
+        self.assertEqual(metrics['resident_result_bytes'], 0)
+        self.assertEqual(metrics['snapshotted_total'], 1)
+        # Later reads use the same snapshot, without writing it again
+        self.assertIs(self._model_store.get_result_set(model_id), results)
+        self.assertEqual(self._model_store.get_results(model_id), _ITEMS)
+        self.assertEqual(self._model_store.backend.metrics()['snapshotted_total'], 1)
+
+    def test_unfinished_models_are_not_snapshotted(self) -> None:
+        model = Model.new_model()
+        self._model_store[str(model.id)] = model
+        self.assertIsNone(self._model_store.get_result_set(str(model.id)))
+        self.assertEqual(self._model_store.backend.metrics()['snapshotted_total'], 0)
+
+    def test_snapshots_are_removed_with_their_models(self) -> None:
+        model_id = self._completed_model()
+        self._model_store.get_result_set(model_id)
+        directory = os.path.join(self._model_store.backend.snapshots.directory, model_id)
+        self.assertTrue(os.path.exists(directory))
+        del self._model_store[model_id]
+        self.assertFalse(os.path.exists(directory))
+        self.assertIsNone(self._model_store.get(model_id))
+
+
+class TestSQLiteBackendSnapshots(unittest.TestCase):
+    _directory: tempfile.TemporaryDirectory
+
+    def setUp(self) -> None:
+        self._directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self._directory.cleanup()
+
+    def _store(self) -> ModelStore:
+        # Every store shares the database and the snapshots, as every worker would
+        path = os.path.join(self._directory.name, 'models.db')
+        return ModelStore(backend=SQLiteBackend(path, snapshots=ResultSnapshots(f'{path}-snapshots')))
+
+    def test_workers_share_snapshots(self) -> None:
+        store, other_store = self._store(), self._store()
+        model = Model(id=uuid.uuid4(), status=Status.COMPLETED)
+        store[str(model.id)] = (model, _ITEMS)
+        results = store.get_result_set(str(model.id))
+        self.assertTrue(results.mapped)
+        self.assertEqual(results, _ITEMS)
+        # Once a store has a snapshot, it is used rather than the results in the database
+        self.assertIs(store.get_result_set(str(model.id)), results)
+        self.assertTrue(store.get(str(model.id))[1].mapped)
+        other_results = other_store.get_result_set(str(model.id))
+        self.assertTrue(other_results.mapped)
+        self.assertEqual(other_results, _ITEMS)
+        store.backend.close()
+        other_store.backend.close()
+
+    def test_replaced_results_are_not_served_from_a_stale_snapshot(self) -> None:
+        store, other_store = self._store(), self._store()
+        model = Model(id=uuid.uuid4(), status=Status.COMPLETED)
+        store[str(model.id)] = (model, _ITEMS)
+        self.assertEqual(store.get_result_set(str(model.id)), _ITEMS)
+        # Another worker replaces the model's results
+        other_store[str(model.id)] = (replace(model), _ITEMS[:1])
+        self.assertEqual(store.get_result_set(str(model.id)), _ITEMS[:1])
+        other_store.delete_many([str(model.id)])
+        self.assertIsNone(store.get(str(model.id)))
+        self.assertEqual(os.listdir(os.path.join(self._directory.name, 'models.db-snapshots')), [])
+        store.backend.close()
+        other_store.backend.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
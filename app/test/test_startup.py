@@ -0,0 +1,28 @@
+import unittest
+
+from app.bench.startup import LAZY_MODULES, budget_ms, fastest, parse_importtime
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_parse_importtime(self) -> None:
+        output = ('import time: self [us] | cumulative | imported package\n'
+                  'import time:       120 |        120 |     _abc\n'
+                  'import time:      1500 |       1620 |   app.main\n')
+        imports = parse_importtime(output)
+        self.assertEqual(list(imports), ['_abc', 'app.main'])
+        self.assertEqual(imports['app.main'].self_us, 1500)
+        self.assertEqual(imports['app.main'].cumulative_us, 1620)
+
+    def test_import_time(self) -> None:
+        result = fastest('app.main')
+        # Training dependencies are only imported by the worker processes
+        for package in LAZY_MODULES:
+            self.assertFalse(result.imported(package), f'Importing the app imported {package}')
+        self.assertLess(result.overhead_ms, budget_ms(),
+                        f'Importing the app took {result.overhead_ms:.0f} ms on top of the framework, the slowest '
+                        f'modules were {[record.module for record in result.slowest(5)]}')
+
+
+if __name__ == '__main__':
+    unittest.main()
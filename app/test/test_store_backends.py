@@ -0,0 +1,138 @@
+import os
+import tempfile
+import unittest
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+
+from app.api.resources import Model, ResultItem, Status
+from app.store import ModelStore
+from app.store.backends import MemoryBackend, SQLiteBackend, StoreBackend
+from app.store.backends.base import listing_key
+
+
+class TestMemoryBackend(unittest.TestCase):
+    _model_store: ModelStore
+
+    def _make_backend(self) -> StoreBackend:
+        return MemoryBackend()
+
+    def setUp(self) -> None:
+        self._model_store = ModelStore(backend=self._make_backend())
+
+    def tearDown(self) -> None:
+        self._model_store.backend.close()
+
+    def test_round_trip(self) -> None:
+        model = Model.new_model()
+        self._model_store[str(model.id)] = model
+        self.assertEqual(self._model_store[str(model.id)], (model, None))
+        # Results and errors should survive being written to the backend
+        model = replace(model, status=Status.COMPLETED)
+        results = [ResultItem(cluster=0, occurrences=3, members=['ABC', 'DEF'])]
+        self._model_store[str(model.id)] = (model, results)
+        self.assertEqual(self._model_store[str(model.id)], (model, results))
+        failed_model = Model(id=Model.new_model().id, status=Status.FAILED,
+                             errors=[{'code': 'data_source_unreachable', 'message': 'Could not reach the source.'}])
+        self._model_store[str(failed_model.id)] = failed_model
+        self.assertEqual(self._model_store[str(failed_model.id)][0], failed_model)
+
+    def test_set_status_is_persisted(self) -> None:
+        model = Model.new_model()
+        self._model_store[str(model.id)] = model
+        self._model_store.set_status(str(model.id), Status.RUNNING)
+        self.assertEqual(self._model_store[str(model.id)][0].status, Status.RUNNING)
+
+    def test_put_many(self) -> None:
+        models = [Model.new_model() for _ in range(50)]
+        self._model_store.put_many(models)
+        self.assertEqual(len(self._model_store), 50)
+        self.assertCountEqual([str(model.id) for model in models], list(self._model_store))
+        # A batch containing an existing ID should be rejected as a whole
+        new_model = Model.new_model()
+        with self.assertRaises(KeyError):
+            self._model_store.put_many([new_model, models[0]])
+        self.assertNotIn(str(new_model.id), self._model_store)
+        self.assertEqual(len(self._model_store), 50)
+
+    def test_delete_many(self) -> None:
+        models = [Model.new_model() for _ in range(10)]
+        self._model_store.put_many(models)
+        # IDs that don't exist should be ignored
+        deleted = self._model_store.delete_many([str(model.id) for model in models[:5]] + [str(Model.new_model().id)])
+        self.assertEqual(deleted, 5)
+        self.assertEqual(len(self._model_store), 5)
+        for model in models[:5]:
+            self.assertNotIn(str(model.id), self._model_store)
+
+    def test_get_many(self) -> None:
+        # More models than fit in a single SQLite lookup
+        models = [Model.new_model() for _ in range(1200)]
+        self._model_store.put_many(models)
+        missing_id = str(Model.new_model().id)
+        entries = self._model_store.get_many([str(model.id) for model in models] + [missing_id])
+        self.assertEqual(len(entries), 1200)
+        self.assertNotIn(missing_id, entries)
+        self.assertEqual(entries[str(models[0].id)], (models[0], None))
+
+    def test_list_models(self) -> None:
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        # Insert the models out of order, the listing should still be ordered by creation time
+        models = [Model(id=Model.new_model().id, created_at=start + timedelta(seconds=idx)) for idx in range(10)]
+        self._model_store.put_many(models[5:])
+        for model in models[:5]:
+            self._model_store[str(model.id)] = model
+        for idx in (1, 4, 7):
+            self._model_store.set_status(str(models[idx].id), Status.RUNNING)
+        self._model_store.set_status(str(models[8].id), Status.FAILED)
+        del self._model_store[str(models[4].id)]
+
+        self.assertEqual([model.id for model in self._model_store.list_models(limit=4)],
+                         [model.id for model in models[:4]])
+        running = self._model_store.list_models([Status.RUNNING])
+        self.assertEqual([model.id for model in running], [models[1].id, models[7].id])
+        self.assertEqual(running[0].status, Status.RUNNING)
+        # Several statuses are merged in creation order
+        listed = self._model_store.list_models([Status.FAILED, Status.RUNNING])
+        self.assertEqual([model.id for model in listed], [models[1].id, models[7].id, models[8].id])
+        # Pages continue after the key of the last model of the previous page
+        page = self._model_store.list_models([Status.PENDING], after=listing_key(models[2]), limit=2)
+        self.assertEqual([model.id for model in page], [models[3].id, models[5].id])
+        page = self._model_store.list_models(created_after=models[6].created_at)
+        self.assertEqual([model.id for model in page], [model.id for model in models[7:]])
+
+    def test_missing_model(self) -> None:
+        model = Model.new_model()
+        self.assertNotIn(str(model.id), self._model_store)
+        self.assertIsNone(self._model_store.get(str(model.id)))
+        with self.assertRaises(KeyError):
+            del self._model_store[str(model.id)]
+
+
+class TestSQLiteBackend(TestMemoryBackend):
+    _directory: tempfile.TemporaryDirectory
+
+    def _make_backend(self) -> StoreBackend:
+        self._directory = tempfile.TemporaryDirectory()
+        return SQLiteBackend(os.path.join(self._directory.name, 'models.db'))
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        self._directory.cleanup()
+
+    def test_stores_share_a_database(self) -> None:
+        # A second store on the same file (e.g. another worker) should see the same models
+        other_store = ModelStore(backend=SQLiteBackend(self._model_store.backend.path))
+        model = Model.new_model()
+        self._model_store[str(model.id)] = model
+        self.assertIn(str(model.id), other_store)
+        other_store.set_status(str(model.id), Status.RUNNING)
+        self.assertEqual(self._model_store[str(model.id)][0].status, Status.RUNNING)
+        other_store.backend.close()
+
+    def test_uses_wal(self) -> None:
+        journal_mode = self._model_store.backend._connection().execute('PRAGMA journal_mode').fetchone()[0]
+        self.assertEqual(journal_mode, 'wal')
+
+
+if __name__ == '__main__':
+    unittest.main()
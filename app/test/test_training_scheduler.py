@@ -0,0 +1,201 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+import httpx
+
+from app.api.rate_limiting import RateLimiter
+from app.api.resources import Model, Status
+from app.main import app
+from app.store import ModelStore
+from app.store.backends import SQLiteBackend
+from app.training import SchedulerClosed, SchedulerFull, TrainingScheduler
+
+_MODEL_CONFIG = {'config': {'data_source': 'https://traces.example.com', 'data_api_key': 'my_example_api_key'}}
+
+
+class TestTrainingScheduler(unittest.IsolatedAsyncioTestCase):
+    _client: httpx.AsyncClient
+    _scheduler: TrainingScheduler
+
+    async def asyncSetUp(self) -> None:
+        app.state.rate_limiter = RateLimiter.from_env()
+        self._scheduler = TrainingScheduler(max_workers=1, max_queued=1)
+        self._scheduler.start()
+        app.state.scheduler = self._scheduler
+        self._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://testserver')
+
+    async def asyncTearDown(self) -> None:
+        await self._client.aclose()
+        await self._scheduler.shutdown()
+        app.state.scheduler = None
+        app.state.model_store = ModelStore()
+
+    async def _wait_for_terminal_status(self, model_id: str) -> str:
+        for _ in range(200):
+            status = (await self._client.get(f'/models/{model_id}')).json()['status']
+            if Status(status).is_terminal:
+                return status
+            await asyncio.sleep(0.05)
+        self.fail(f'Model {model_id} was not trained in time')
+
+    async def test_model_is_trained(self) -> None:
+        response = await self._client.post('/models', json=_MODEL_CONFIG)
+        self.assertEqual(response.status_code, 201)
+        # The model is created as pending, and the scheduler should take it through to completed
+        self.assertEqual(response.json()['status'], 'pending')
+        model_id = response.json()['id']
+        self.assertEqual(await self._wait_for_terminal_status(model_id), 'completed')
+        results = await self._client.get(f'/models/{model_id}/results')
+        self.assertEqual(results.status_code, 200)
+        self.assertIn('cluster_count', results.json()['results'])
+
+    async def test_model_is_refreshed(self) -> None:
+        config = {**_MODEL_CONFIG['config'], 'data_points': 500}
+        model_id = (await self._client.post('/models', json={'config': config})).json()['id']
+        self.assertEqual(await self._wait_for_terminal_status(model_id), 'completed')
+        response = await self._client.post(f'/models/{model_id}:refresh', json={'config': config})
+        self.assertEqual(response.status_code, 201)
+        refreshed_id = response.json()['id']
+        self.assertEqual(await self._wait_for_terminal_status(refreshed_id), 'completed')
+        # The refreshed model carries on from the first model's 500 traces with another 500
+        for model_id, total in ((model_id, 500), (refreshed_id, 1000)):
+            results = await self._client.get(f'/models/{model_id}/results')
+            self.assertEqual(results.json()['results']['total_data_points'], total)
+
+    async def test_full_queue_is_rejected(self) -> None:
+        # Identical configs would share a model, so give each model its own
+        configs = [{'config': {**_MODEL_CONFIG['config'], 'name': f'model-{idx}'}} for idx in range(3)]
+        accepted = [await self._client.post('/models', json=config) for config in configs[:2]]
+        self.assertEqual([response.status_code for response in accepted], [201, 201])
+        # One model is being trained and one is queued, so there is no room for a third
+        response = await self._client.post('/models', json=configs[2])
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+        self.assertEqual(response.json()['errors'][0]['code'], 'training_queue_full')
+        # The rejected model should not be left in the store
+        self.assertEqual(len(app.state.model_store), 2)
+        for model in accepted:
+            self.assertEqual(await self._wait_for_terminal_status(model.json()['id']), 'completed')
+
+    async def test_batch_is_queued_as_a_whole(self) -> None:
+        configs = [_MODEL_CONFIG['config']] * 3
+        # There is only room for two models, so none of the batch should be queued
+        response = await self._client.post('/models:batch', json={'configs': configs})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(len(app.state.model_store), 0)
+        response = await self._client.post('/models:batch', json={'configs': configs[:2]})
+        self.assertEqual(response.status_code, 201)
+        for model in response.json()['models']:
+            self.assertEqual(await self._wait_for_terminal_status(model['id']), 'completed')
+
+    async def test_closed_scheduler_is_unavailable(self) -> None:
+        await self._scheduler.shutdown()
+        response = await self._client.post('/models', json=_MODEL_CONFIG)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(app.state.model_store), 0)
+
+    async def test_submit_is_bounded(self) -> None:
+        model_store = ModelStore()
+        models = [Model.new_model() for _ in range(3)]
+        model_store.put_many(models)
+        self._scheduler.submit(model_store, str(models[0].id), {})
+        self._scheduler.submit(model_store, str(models[1].id), {})
+        with self.assertRaises(SchedulerFull):
+            self._scheduler.submit(model_store, str(models[2].id), {})
+        await self._scheduler.shutdown()
+        with self.assertRaises(SchedulerClosed):
+            self._scheduler.submit(model_store, str(models[2].id), {})
+
+    async def test_terminal_models_are_not_retrained(self) -> None:
+        model_store = ModelStore()
+        model = Model.new_model()
+        model_store[str(model.id)] = model
+        model_store.set_status(str(model.id), Status.FAILED)
+        self._scheduler.submit(model_store, str(model.id), {})
+        await self._scheduler.shutdown()
+        # The scheduler must respect the rule that failed or completed models can't change
+        self.assertEqual(model_store[str(model.id)][0].status, Status.FAILED)
+        self.assertIsNone(model_store[str(model.id)][1])
+
+    async def test_cancelled_models_fail(self) -> None:
+        scheduler = TrainingScheduler(max_workers=1, drain_timeout=0.5)
+        scheduler.start()
+        model_store = ModelStore()
+        running, queued = Model.new_model(), Model.new_model()
+        model_store.put_many([running, queued])
+        scheduler.submit(model_store, str(running.id), {'data_points': 6_000_000, 'clusters': 64})
+        scheduler.submit(model_store, str(queued.id), {})
+        while model_store[str(running.id)][0].status != Status.RUNNING:
+            await asyncio.sleep(0.05)
+        jobs = list(scheduler._jobs)
+        for job in jobs:
+            job.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
+        # Neither model will ever be trained, so neither is left for clients to wait on
+        for model, code in ((running, 'training_failed'), (queued, 'training_unavailable')):
+            model = model_store[str(model.id)][0]
+            self.assertEqual(model.status, Status.FAILED)
+            self.assertEqual(model.errors[0]['code'], code)
+        await scheduler.shutdown()
+
+    async def test_shutdown_is_bounded_by_the_drain_timeout(self) -> None:
+        scheduler = TrainingScheduler(max_workers=1, drain_timeout=0.5)
+        scheduler.start()
+        model_store = ModelStore()
+        model = Model.new_model()
+        model_store[str(model.id)] = model
+        # Far longer to train than the drain timeout
+        scheduler.submit(model_store, str(model.id), {'data_points': 6_000_000, 'clusters': 64})
+        while model_store[str(model.id)][0].status != Status.RUNNING:
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(1)
+        ticks = 0
+
+        async def tick() -> None:
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.05)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        start = asyncio.get_running_loop().time()
+        await scheduler.shutdown()
+        elapsed = asyncio.get_running_loop().time() - start
+        ticker.cancel()
+        self.assertLess(elapsed, scheduler.drain_timeout + 2)
+        # The event loop kept running while the scheduler shut down
+        self.assertGreaterEqual(ticks, elapsed / 0.05 / 2)
+        self.assertEqual(model_store[str(model.id)][0].status, Status.FAILED)
+
+    async def test_shutdown_leaves_no_model_pending(self) -> None:
+        scheduler = TrainingScheduler(max_workers=1, drain_timeout=0.5)
+        scheduler.start()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'models.db')
+            model_store = ModelStore(backend=SQLiteBackend(path))
+            models = [Model.new_model() for _ in range(3)]
+            model_store.put_many(models)
+            scheduler.submit(model_store, str(models[0].id), {'data_points': 6_000_000, 'clusters': 64})
+            for model in models[1:]:
+                scheduler.submit(model_store, str(model.id), {})
+            await scheduler.shutdown()
+            model_store.backend.close()
+            # The models outlive the worker in the database, where no other worker will ever train the queued ones
+            model_store = ModelStore(backend=SQLiteBackend(path))
+            statuses = [model_store[str(model.id)][0].status for model in models]
+            model_store.backend.close()
+        self.assertEqual(statuses, [Status.FAILED] * 3)
+
+    async def test_models_finished_during_the_drain_are_kept(self) -> None:
+        model_store = ModelStore()
+        model = Model.new_model()
+        model_store[str(model.id)] = model
+        self._scheduler.submit(model_store, str(model.id), {'data_points': 500})
+        await self._scheduler.shutdown()
+        self.assertEqual(model_store[str(model.id)][0].status, Status.COMPLETED)
+
+
+if __name__ == '__main__':
+    unittest.main()
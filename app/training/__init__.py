@@ -0,0 +1,7 @@
+from app.training.scheduler import SchedulerClosed, SchedulerFull, TrainingScheduler
+
+__all__ = [
+    'SchedulerClosed',
+    'SchedulerFull',
+    'TrainingScheduler'
+]
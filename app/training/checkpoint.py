@@ -0,0 +1,57 @@
+import json
+import struct
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Header: magic, version, number of centroids, number of features per centroid
+_HEADER = struct.Struct('<4sHQQ')
+_MAGIC = b'TCKP'
+_VERSION = 1
+
+
+@dataclass(frozen=True)
+class TrainingCheckpoint:
+    """What is needed to carry on training a model from where it finished.
+
+    ``centroids`` has a row for each cluster in the model's results, in the same order. ``watermark`` is the ID of the
+    last trace read from ``data_source``, so a refresh only reads the traces which arrived after it. ``seed`` is the
+    seed the model was first trained with, which refreshes of synthetic models keep using.
+    """
+    data_source: str | None
+    watermark: str | None
+    centroids: 'np.ndarray'
+    seed: int
+
+    def to_bytes(self) -> bytes:
+        import numpy as np
+        centroids = np.ascontiguousarray(self.centroids, dtype='<f8')
+        rows, columns = centroids.shape if centroids.ndim == 2 else (0, 0)
+        metadata = {'data_source': self.data_source, 'watermark': self.watermark, 'seed': self.seed}
+        return (_HEADER.pack(_MAGIC, _VERSION, rows, columns) + centroids.tobytes()
+                + json.dumps(metadata, separators=(',', ':')).encode())
+
+    @staticmethod
+    def _shape(data: bytes) -> tuple[int, int]:
+        magic, version, rows, columns = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError('The data is not a serialised TrainingCheckpoint')
+        return rows, columns
+
+    @classmethod
+    def metadata(cls, data: bytes) -> dict[str, Any]:
+        """Reads the data source, watermark and seed of a serialised checkpoint, without decoding its centroids."""
+        rows, columns = cls._shape(data)
+        return json.loads(data[_HEADER.size + rows * columns * 8:])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'TrainingCheckpoint':
+        import numpy as np
+        rows, columns = cls._shape(data)
+        end = _HEADER.size + rows * columns * 8
+        centroids = np.frombuffer(data[_HEADER.size:end], dtype='<f8').reshape(rows, columns).astype(np.float64)
+        metadata = json.loads(data[end:])
+        return cls(data_source=metadata['data_source'], watermark=metadata['watermark'], centroids=centroids,
+                   seed=metadata['seed'])
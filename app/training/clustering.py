@@ -0,0 +1,129 @@
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from app.api.resources.results import ResultItem
+
+
+@dataclass
+class FeatureBatch:
+    """A chunk of traces: one row of ``features`` for each ID in ``ids``."""
+    ids: list[str]
+    features: np.ndarray
+
+    def __post_init__(self) -> None:
+        if len(self.ids) != len(self.features):
+            raise ValueError('A feature batch must have exactly one row of features for each trace ID')
+
+
+@dataclass
+class MiniBatchKMeans:
+    """Streaming k-means which only ever holds a single batch of traces in memory.
+
+    Each batch is assigned to its nearest centroids, and every centroid then moves to the running mean of all the
+    points assigned to it so far (Sculley, 2010). Occurrences and a bounded sample of members are accumulated as the
+    batches are assigned, so the memory used depends on the batch size, ``clusters`` and ``max_members``, but not on
+    the total number of traces. The centroids are seeded from the first batch, so it should be a representative sample.
+    """
+    clusters: int = 8
+    max_members: int = 1000
+    seed: int | None = None
+    centroids: np.ndarray | None = field(default=None, init=False)
+    counts: np.ndarray | None = field(default=None, init=False)
+    members: list[list[str]] = field(default_factory=list, init=False)
+
+    def __post_init__(self) -> None:
+        if self.clusters < 1:
+            raise ValueError('There must be at least one cluster')
+        self._rng = np.random.default_rng(self.seed)
+
+    @classmethod
+    def resume(cls, centroids: np.ndarray, items: Iterable[ResultItem], clusters: int = 8, max_members: int = 1000,
+               seed: int | None = None) -> 'MiniBatchKMeans':
+        """Carries on from a previous model's results and the centroid of each of its clusters.
+
+        Further batches move the centroids and add to the occurrences and members of the clusters, as if they had been
+        part of the original stream of traces. ``clusters`` is only used if the previous model had no clusters.
+        """
+        items = list(items)
+        if len(items) != len(centroids):
+            raise ValueError('There must be exactly one centroid for each cluster')
+        kmeans = cls(clusters=len(items) or clusters, max_members=max_members, seed=seed)
+        if items:
+            kmeans.centroids = np.array(centroids, dtype=np.float64)
+            kmeans.counts = np.array([item.occurrences for item in items], dtype=np.int64)
+            kmeans.members = [list(item.members[:max_members]) for item in items]
+        return kmeans
+
+    @property
+    def cluster_centroids(self) -> np.ndarray:
+        """The centroid of every non-empty cluster, in the same order as ``results``."""
+        if self.counts is None:
+            return np.empty((0, 0))
+        return self.centroids[np.flatnonzero(self.counts)]
+
+    @property
+    def total_data_points(self) -> int:
+        return 0 if self.counts is None else int(self.counts.sum())
+
+    def _initialise(self, features: np.ndarray) -> None:
+        # k-means++ seeding on the first batch. Any centroids that can't be seeded (the batch has fewer distinct points
+        # than there are clusters) are dropped, as they would never have any members.
+        centroids = [features[self._rng.integers(len(features))]]
+        closest = ((features - centroids[0]) ** 2).sum(axis=1)
+        while len(centroids) < self.clusters and (total := closest.sum()) > 0:
+            centroid = features[self._rng.choice(len(features), p=closest / total)]
+            centroids.append(centroid)
+            np.minimum(closest, ((features - centroid) ** 2).sum(axis=1), out=closest)
+        self.centroids = np.array(centroids, dtype=np.float64)
+        self.counts = np.zeros(len(centroids), dtype=np.int64)
+        self.members = [[] for _ in centroids]
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Returns the index of the nearest centroid for each row of ``features``."""
+        # |x - c|^2 = |x|^2 - 2x.c + |c|^2, and |x|^2 is the same for every centroid so it can be dropped
+        distances = (self.centroids ** 2).sum(axis=1) - 2 * features @ self.centroids.T
+        return distances.argmin(axis=1)
+
+    def partial_fit(self, batch: FeatureBatch) -> np.ndarray:
+        """Updates the clusters with a batch of traces, returning the cluster each trace was assigned to."""
+        features = np.asarray(batch.features, dtype=np.float64)
+        if len(features) == 0:
+            return np.empty(0, dtype=np.intp)
+        if self.centroids is None:
+            self._initialise(features)
+        labels = self.predict(features)
+        batch_counts = np.bincount(labels, minlength=len(self.centroids))
+        sums = np.zeros_like(self.centroids)
+        np.add.at(sums, labels, features)
+        self.counts += batch_counts
+        assigned = batch_counts > 0
+        # Moving each centroid by (sum - n * c) / total keeps it at the mean of every point assigned to it so far
+        self.centroids[assigned] += ((sums[assigned] - batch_counts[assigned, None] * self.centroids[assigned])
+                                     / self.counts[assigned, None])
+        self._collect_members(batch.ids, labels)
+        return labels
+
+    def _collect_members(self, ids: list[str], labels: np.ndarray) -> None:
+        for cluster, members in enumerate(self.members):
+            if (room := self.max_members - len(members)) > 0:
+                members.extend(ids[idx] for idx in np.flatnonzero(labels == cluster)[:room])
+
+    def fit(self, batches: Iterable[FeatureBatch]) -> 'MiniBatchKMeans':
+        for batch in batches:
+            self.partial_fit(batch)
+        return self
+
+    def results(self) -> list[ResultItem]:
+        """Returns a ResultItem for every non-empty cluster, labelled sequentially from 0 in order of discovery."""
+        if self.counts is None:
+            return []
+        return [ResultItem(cluster=label, occurrences=int(self.counts[idx]), members=list(self.members[idx]))
+                for label, idx in enumerate(np.flatnonzero(self.counts))]
+
+
+def cluster(batches: Iterable[FeatureBatch], clusters: int = 8, max_members: int = 1000,
+            seed: int | None = None) -> list[ResultItem]:
+    """Clusters a stream of trace feature batches."""
+    return MiniBatchKMeans(clusters=clusters, max_members=max_members, seed=seed).fit(batches).results()
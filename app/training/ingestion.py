@@ -0,0 +1,202 @@
+"""Reads traces from a model's data source.
+
+A data source is a trace query service. ``GET <data_source>?limit=<page size>&cursor=<cursor>``, with the header
+``Authorization: Bearer <data_api_key>``, returns a page of traces as newline delimited JSON with one
+``{"id": "...", "features": [...]}`` object per line. There is a ``Next-Cursor`` header when there are more pages, and
+the cursor is left out when requesting the first page. Traces are returned in the order they arrived, and
+``after=<trace ID>`` asks for only the traces which arrived after that one.
+"""
+import asyncio
+import itertools
+import random
+from collections.abc import AsyncIterator
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import Any
+from urllib.parse import urlsplit
+
+import httpx
+import numpy as np
+
+from app.training.clustering import FeatureBatch
+
+try:
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
+
+# Domains reserved for documentation and testing (RFC 2606), which can never serve real traces
+RESERVED_DOMAINS = ('example', 'invalid', 'test', 'example.com', 'example.net', 'example.org')
+# Responses which mean the data source may succeed if asked again
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+_DONE = object()
+
+
+class IngestionError(Exception):
+    """Traces could not be read from a data source."""
+
+
+def is_reserved(data_source: str) -> bool:
+    host = (urlsplit(data_source).hostname or '').rstrip('.').lower()
+    return any(host == domain or host.endswith(f'.{domain}') for domain in RESERVED_DOMAINS)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    attempts: int = 5
+    backoff: float = 0.5
+    max_backoff: float = 30.0
+
+    def delay(self, attempt: int, rng: random.Random, retry_after: str | None = None) -> float:
+        """How long to wait after ``attempt`` failed attempts: as long as the data source asked for with Retry-After,
+        otherwise exponential backoff with full jitter."""
+        if retry_after is not None:
+            try:
+                return min(self.max_backoff, max(0.0, float(retry_after)))
+            except ValueError:
+                # Retry-After can also be an HTTP date, which is treated as if it were absent
+                pass
+        return rng.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+
+class TraceClient:
+    """Reads traces from one data source, reusing its connections for every model that reads from it."""
+
+    def __init__(self, data_source: str, retry: RetryPolicy = RetryPolicy(), timeout: float = 30.0,
+                 max_connections: int = 4, transport: httpx.AsyncBaseTransport | None = None) -> None:
+        self.data_source = data_source
+        self.retry = retry
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._client = httpx.AsyncClient(timeout=timeout, limits=limits, transport=transport)
+        self._rng = random.Random()
+
+    def _parse(self, line: str) -> tuple[str, list[float]]:
+        try:
+            trace = _loads(line)
+            return str(trace['id']), trace['features']
+        except (ValueError, KeyError, TypeError) as exc:
+            raise IngestionError(f'{self.data_source} returned a trace which is not valid: {exc!r}') from None
+
+    async def traces(self, api_key: str, page_size: int = 1000,
+                     after: str | None = None) -> AsyncIterator[tuple[str, list[float]]]:
+        """Yields the ID and features of every trace (or every trace after ``after``), parsing each page as it arrives.
+
+        Requests that fail, or are rejected with one of RETRY_STATUSES, are retried. If a page fails part way through,
+        the traces that were already yielded from it are skipped when it is requested again.
+        """
+        headers = {'Authorization': f'Bearer {api_key}', 'Accept': 'application/x-ndjson'}
+        params: dict[str, Any] = {'limit': page_size} if after is None else {'limit': page_size, 'after': after}
+        while True:
+            yielded = 0
+            for attempt in itertools.count(1):
+                retry_after = None
+                try:
+                    async with self._client.stream('GET', self.data_source, params=params,
+                                                   headers=headers) as response:
+                        if response.status_code in RETRY_STATUSES:
+                            retry_after = response.headers.get('Retry-After')
+                            error = f'it responded with {response.status_code}'
+                        elif not response.is_success:
+                            raise IngestionError(f'{self.data_source} responded with {response.status_code}')
+                        else:
+                            position = 0
+                            async for line in response.aiter_lines():
+                                if not line.strip():
+                                    continue
+                                position += 1
+                                if position > yielded:
+                                    yield self._parse(line)
+                                    yielded += 1
+                            break
+                except httpx.TransportError as exc:
+                    error = repr(exc)
+                if attempt >= self.retry.attempts:
+                    raise IngestionError(f'Could not read traces from {self.data_source} after {attempt} attempts, '
+                                         f'{error}')
+                await asyncio.sleep(self.retry.delay(attempt, self._rng, retry_after))
+            if (cursor := response.headers.get('Next-Cursor')) is None:
+                return
+            params['cursor'] = cursor
+
+    async def batches(self, api_key: str, batch_size: int = 10_000, limit: int | None = None, page_size: int = 1000,
+                      after: str | None = None) -> AsyncIterator[FeatureBatch]:
+        """Yields the traces in batches of ``batch_size`` (the last may be smaller), reading at most ``limit`` traces.
+
+        Only the batch being filled and the line being parsed are held in memory, however many traces there are.
+        """
+        if limit is not None:
+            if limit <= 0:
+                return
+            page_size = min(page_size, limit)
+        ids: list[str] = []
+        features: np.ndarray | None = None
+        total = 0
+        async with aclosing(self.traces(api_key, page_size, after)) as traces:
+            async for trace_id, row in traces:
+                try:
+                    if features is None:
+                        # Every trace must have as many features as the first one
+                        features = np.empty((batch_size, len(row)), dtype=np.float64)
+                    # Check the length explicitly, as numpy would broadcast a single feature across the whole row
+                    if len(row) != features.shape[1]:
+                        raise ValueError()
+                    features[len(ids)] = row
+                except (ValueError, TypeError):
+                    raise IngestionError(f'Trace {trace_id} from {self.data_source} does not have the same number of '
+                                         f'numeric features as the traces before it') from None
+                ids.append(trace_id)
+                total += 1
+                if len(ids) == batch_size:
+                    yield FeatureBatch(ids=ids, features=features)
+                    ids, features = [], np.empty_like(features)
+                if total == limit:
+                    break
+        if ids:
+            yield FeatureBatch(ids=ids, features=features[:len(ids)])
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+class ClientPool:
+    """A TraceClient for each data source, created the first time the data source is used."""
+
+    def __init__(self, **options: Any) -> None:
+        self._options = options
+        self._clients: dict[str, TraceClient] = {}
+
+    def get(self, data_source: str) -> TraceClient:
+        if (client := self._clients.get(data_source)) is None:
+            client = self._clients[data_source] = TraceClient(data_source, **self._options)
+        return client
+
+    async def aclose(self) -> None:
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.aclose()
+
+
+async def prefetch(batches: AsyncIterator[FeatureBatch], depth: int = 2) -> AsyncIterator[FeatureBatch]:
+    """Reads up to ``depth`` batches ahead in the background, so the next batch is downloaded while the caller works
+    on the current one."""
+    queue: asyncio.Queue[Any] = asyncio.Queue(maxsize=depth)
+
+    async def produce() -> None:
+        try:
+            async with aclosing(batches):
+                async for batch in batches:
+                    await queue.put(batch)
+        except Exception as exc:
+            await queue.put(exc)
+        else:
+            await queue.put(_DONE)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (item := await queue.get()) is not _DONE:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
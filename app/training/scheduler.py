@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from collections.abc import Callable, Coroutine
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any
+
+from app.api.errors import TrainingFailed, TrainingUnavailable
+from app.api.resources.status import Status
+from app.metrics import TRAINING_DURATION
+from app.store.model_store import ModelStore
+from app.store.result_set import ResultSet
+from app.training.worker import initialise_worker, refresh, train
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulerFull(Exception):
+    """Raised when the training queue is full and a model cannot be accepted."""
+
+
+class SchedulerClosed(Exception):
+    """Raised when a model is submitted to a scheduler that has been shut down."""
+
+
+@dataclass
+class TrainingScheduler:
+    """Trains pending models in a pool of worker processes.
+
+    Models stay pending until a worker is free, then move to running and finally to completed or failed. At most
+    ``max_workers`` models are trained at once and at most ``max_queued`` more may wait for a worker. Once the queue is
+    full, submit raises SchedulerFull so that callers can push back on clients instead of queueing without bound.
+    """
+    max_workers: int = field(default_factory=lambda: os.cpu_count() or 1)
+    max_queued: int = 100
+    drain_timeout: float = 30.0
+    _executor: Executor | None = field(default=None, init=False, repr=False)
+    _slots: asyncio.Semaphore | None = field(default=None, init=False, repr=False)
+    _jobs: set[asyncio.Task] = field(default_factory=set, init=False, repr=False)
+    _closed: bool = field(default=False, init=False)
+
+    @classmethod
+    def from_env(cls) -> 'TrainingScheduler':
+        """Configure a scheduler using the TRAINING_WORKERS, TRAINING_QUEUE_SIZE and TRAINING_DRAIN_TIMEOUT
+        environment variables."""
+        return cls(max_workers=int(os.getenv('TRAINING_WORKERS', os.cpu_count() or 1)),
+                   max_queued=int(os.getenv('TRAINING_QUEUE_SIZE', 100)),
+                   drain_timeout=float(os.getenv('TRAINING_DRAIN_TIMEOUT', 30)))
+
+    @property
+    def in_flight(self) -> int:
+        """The number of models which are either queued or being trained."""
+        return len(self._jobs)
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None and not self._closed
+
+    def start(self) -> None:
+        # Spawn rather than fork, as forking a process with an event loop and open connections is not safe
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=initialise_worker,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._closed = False
+
+    async def shutdown(self) -> None:
+        """Stop accepting models and wait up to ``drain_timeout`` seconds for queued and running models to finish.
+
+        Models which are still queued or being trained after that are marked as failed, so that clients watching them
+        aren't left waiting on a model that will never be trained, and the worker processes are terminated, so shutting
+        down takes little longer than the timeout.
+        """
+        self._closed = True
+        unfinished: set[asyncio.Task] = set()
+        if self._jobs:
+            _, unfinished = await asyncio.wait(self._jobs, timeout=self.drain_timeout)
+            for job in unfinished:
+                job.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+        await self._stop_workers(terminate=bool(unfinished))
+
+    async def _stop_workers(self, terminate: bool) -> None:
+        executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        # The executor forgets its processes when it is shut down
+        processes = list((getattr(executor, '_processes', None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        if terminate:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+        # Joining the processes blocks, so it happens in a thread to keep the event loop responsive
+        await asyncio.to_thread(lambda: [process.join() for process in processes])
+
+    async def __aenter__(self) -> 'TrainingScheduler':
+        self.start()
+        return self
+
+    async def __aexit__(self, *_: Any) -> None:
+        await self.shutdown()
+
+    def submit(self, model_store: ModelStore, model_id: str, config: dict[str, Any]) -> None:
+        """Queue a pending model for training."""
+        self.submit_many(model_store, [(model_id, config)])
+
+    def submit_many(self, model_store: ModelStore, models: list[tuple[str, dict[str, Any]]]) -> None:
+        """Queue several pending models for training. Either every model is queued, or none of them are."""
+        self._check_capacity(len(models))
+        for model_id, config in models:
+            self._queue(self._train(model_store, model_id, train, config))
+
+    def submit_refresh(self, model_store: ModelStore, model_id: str, config: dict[str, Any], base: ResultSet) -> None:
+        """Queue a pending model to be trained by carrying on from the results of a previous model."""
+        self._check_capacity(1)
+        self._queue(self._train(model_store, model_id, refresh, config, base))
+
+    def _check_capacity(self, count: int) -> None:
+        if not self.running:
+            raise SchedulerClosed()
+        if self.in_flight + count > self.max_workers + self.max_queued:
+            raise SchedulerFull()
+
+    def _queue(self, coroutine: Coroutine[Any, Any, None]) -> None:
+        job = asyncio.create_task(coroutine)
+        self._jobs.add(job)
+        job.add_done_callback(self._jobs.discard)
+
+    async def _train(self, model_store: ModelStore, model_id: str, function: Callable[..., ResultSet],
+                     *args: Any) -> None:
+        future: asyncio.Future[ResultSet] | None = None
+        try:
+            async with self._slots:
+                try:
+                    await model_store.aio.set_status(model_id, Status.RUNNING)
+                except (KeyError, ValueError):
+                    # The model was deleted or finished by someone else while it was queued
+                    return
+                start = time.perf_counter()
+                future = asyncio.get_running_loop().run_in_executor(self._executor, function, model_id, *args)
+                try:
+                    results = await future
+                except Exception as exc:
+                    logger.exception('Training model %s failed', model_id)
+                    TRAINING_DURATION.labels(Status.FAILED.value).observe(time.perf_counter() - start)
+                    await self._finish(model_store, model_id, Status.FAILED, errors=[TrainingFailed(str(exc)).json()])
+                else:
+                    TRAINING_DURATION.labels(Status.COMPLETED.value).observe(time.perf_counter() - start)
+                    await self._finish(model_store, model_id, Status.COMPLETED, results=results)
+        except asyncio.CancelledError:
+            if future is not None and future.done() and not future.cancelled() and future.exception() is None:
+                # The results came back just as the drain ran out, so they are kept
+                await self._finish(model_store, model_id, Status.COMPLETED, results=future.result())
+            else:
+                # Models which were still queued or being trained fail, so nobody waits for a model that won't finish
+                error = TrainingUnavailable() if future is None else \
+                    TrainingFailed('the service shut down before training finished.')
+                await self._finish(model_store, model_id, Status.FAILED, errors=[error.json()])
+            raise
+
+    @staticmethod
+    async def _finish(model_store: ModelStore, model_id: str, status: Status, **kwargs: Any) -> None:
+        try:
+            await model_store.aio.set_status(model_id, status, **kwargs)
+        except (KeyError, ValueError):
+            # The model was deleted, or finished by someone else, while it was being trained
+            pass
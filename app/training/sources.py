@@ -0,0 +1,27 @@
+from collections.abc import Iterator
+
+import numpy as np
+
+from app.training.clustering import FeatureBatch
+
+
+def synthetic_traces(total: int, batch_size: int = 10_000, dimensions: int = 8, centres: int = 5,
+                     seed: int | None = None, start: int = 0) -> Iterator[FeatureBatch]:
+    """Generates ``total`` traces drawn from ``centres`` Gaussian blobs, ``batch_size`` traces at a time.
+
+    The traces are numbered from ``start``, so that more traces can be drawn from the same blobs later on.
+    """
+    rng = np.random.default_rng(seed)
+    blob_centres = rng.uniform(-10, 10, size=(centres, dimensions))
+    if start and seed is not None:
+        # Later traces come from the same blobs, but must not repeat the earlier ones
+        rng = np.random.default_rng([seed, start])
+    for first in range(start, start + total, batch_size):
+        size = min(batch_size, start + total - first)
+        features = blob_centres[rng.integers(centres, size=size)] + rng.standard_normal((size, dimensions))
+        yield FeatureBatch(ids=[f'T{idx:09d}' for idx in range(first, first + size)], features=features)
+
+
+def synthetic_position(trace_id: str | None) -> int:
+    """The number of synthetic traces up to and including ``trace_id``."""
+    return 0 if trace_id is None else int(trace_id.removeprefix('T')) + 1
@@ -0,0 +1,112 @@
+"""Functions which run inside the training worker processes.
+
+Everything here must be importable and picklable on its own, as it is called from a separate process. The API process
+imports this module to refer to these functions, so numpy and httpx are only imported when a model is trained.
+"""
+import asyncio
+import atexit
+import random
+import uuid
+from collections.abc import AsyncIterator, Iterable
+from contextlib import aclosing
+from typing import TYPE_CHECKING, Any
+
+from app.store.result_set import ResultSet
+from app.training.checkpoint import TrainingCheckpoint
+
+if TYPE_CHECKING:
+    from app.training.clustering import FeatureBatch, MiniBatchKMeans
+    from app.training.ingestion import ClientPool
+
+# Each worker process reads traces on its own event loop, with one pool of connections per data source that is shared
+# by every model the process trains
+_loop: asyncio.AbstractEventLoop | None = None
+_clients: 'ClientPool | None' = None
+
+
+def initialise_worker() -> None:
+    # Make sure workers don't all start from the same random state
+    random.seed()
+
+
+def _client_pool() -> 'ClientPool':
+    global _clients
+    if _clients is None:
+        from app.training.ingestion import ClientPool
+        _clients = ClientPool()
+    return _clients
+
+
+def _close() -> None:
+    if _loop is not None and not _loop.is_closed():
+        if _clients is not None:
+            _loop.run_until_complete(_clients.aclose())
+        _loop.close()
+
+
+def _run(coroutine: Any) -> Any:
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+        atexit.register(_close)
+    return _loop.run_until_complete(coroutine)
+
+
+def _fit_synthetic(kmeans: 'MiniBatchKMeans', batches: Iterable['FeatureBatch'],
+                   watermark: str | None) -> str | None:
+    for batch in batches:
+        kmeans.partial_fit(batch)
+        watermark = batch.ids[-1]
+    return watermark
+
+
+async def _fit_data_source(kmeans: 'MiniBatchKMeans', batches: AsyncIterator['FeatureBatch'],
+                           watermark: str | None) -> str | None:
+    from app.training.ingestion import prefetch
+    async with aclosing(prefetch(batches)) as batches:
+        async for batch in batches:
+            # numpy releases the GIL, so the next batch is downloaded while this one is clustered
+            await asyncio.to_thread(kmeans.partial_fit, batch)
+            watermark = batch.ids[-1]
+    return watermark
+
+
+def _fit(kmeans: 'MiniBatchKMeans', config: dict[str, Any], seed: int, watermark: str | None = None) -> ResultSet:
+    """Clusters the traces after ``watermark`` in the model's data source, reading at most ``data_points`` traces.
+
+    Models without a data source, or whose data source is a reserved example domain, are built from ``data_points``
+    synthetic traces instead.
+    """
+    from app.training.ingestion import is_reserved
+    from app.training.sources import synthetic_position, synthetic_traces
+    data_source = config.get('data_source')
+    if data_source is None or is_reserved(str(data_source)):
+        batches = synthetic_traces(total=int(config.get('data_points', 10_000)), seed=seed,
+                                   start=synthetic_position(watermark))
+        watermark = _fit_synthetic(kmeans, batches, watermark)
+    else:
+        limit = None if (data_points := config.get('data_points')) is None else int(data_points)
+        batches = _client_pool().get(str(data_source)).batches(str(config.get('data_api_key', '')), limit=limit,
+                                                               after=watermark)
+        watermark = _run(_fit_data_source(kmeans, batches, watermark))
+    checkpoint = TrainingCheckpoint(data_source=None if data_source is None else str(data_source),
+                                    watermark=watermark, centroids=kmeans.cluster_centroids, seed=seed)
+    # Results are sent back to the API process in their compact form, which is much cheaper to pickle
+    return ResultSet.from_items(kmeans.results(), checkpoint=checkpoint.to_bytes())
+
+
+def train(model_id: str, config: dict[str, Any]) -> ResultSet:
+    """Builds the clusters for a model from the traces in its data source."""
+    from app.training.clustering import MiniBatchKMeans
+    seed = uuid.UUID(model_id).int & 0xFFFFFFFF
+    return _fit(MiniBatchKMeans(clusters=int(config.get('clusters', 8)), seed=seed), config, seed)
+
+
+def refresh(model_id: str, config: dict[str, Any], base: ResultSet) -> ResultSet:
+    """Builds the clusters for a model by carrying on from the results of a previous model, so that only the traces
+    which arrived after the previous model was built are read."""
+    from app.training.clustering import MiniBatchKMeans
+    checkpoint = TrainingCheckpoint.from_bytes(base.checkpoint)
+    kmeans = MiniBatchKMeans.resume(checkpoint.centroids, base, clusters=int(config.get('clusters', 8)),
+                                    seed=checkpoint.seed)
+    return _fit(kmeans, config, checkpoint.seed, checkpoint.watermark)